@@ -1,19 +1,24 @@
 import os
-from flask import Flask
-from flask.ext.sqlalchemy import SQLAlchemy
+import threading
 
-app = Flask(__name__)
+from flask import Flask, current_app, got_request_exception
+from werkzeug.local import LocalProxy
 
-@app.route('/')
-def hello_world():
-    return 'This is a microservice for reservations created by Diego Leon, Jehiel Sanchez, Milton Espinel and Mateo Salazar'
+from reservationservice.app.database import ReservationSQLAlchemy
+from reservationservice.app.metrics import init_metrics
+from reservationservice.app.replicas import set_read_primary_cookie
+
+# The only SQLAlchemy instance (and so the only engine and pool) of the process, bound to the app by create_app
+db = ReservationSQLAlchemy()
 
-app.config.from_object('reservationservice.default_config')
+_app = None
+_app_lock = threading.Lock()
 
-db = SQLAlchemy(app)
+
+def hello_world():
+    return 'This is a microservice for reservations created by Diego Leon, Jehiel Sanchez, Milton Espinel and Mateo Salazar'
 
 
-@app.teardown_appcontext
 def shutdown_session(exception=None):
     """
     Perform session close and rollback after every request is completed
@@ -37,3 +42,102 @@ def shutdown_session(exception=None):
     # This prevents error such as:
     # - (sqlalchemy.exc.InvalidRequestError) Can't reconnect until invalid transaction is rolled back
     db.session.remove()
+
+
+def init_rollbar():
+    """
+    Send the exceptions of the requests to rollbar out of Development environments. It runs before the first
+    request, so the workers that do not report never import rollbar
+    """
+
+    environment = os.environ.get('ENVIRONMENT')
+    if environment == None or environment == 'Development':
+        return
+
+    import rollbar
+    import rollbar.contrib.flask
+
+    rollbar.init(
+        # access token for the demo app: https://rollbar.com/demo
+        current_app.config['ROLLBAR_API_KEY'],
+        # environment name
+        environment,
+        # server root directory, makes tracebacks prettier
+        root=os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+        # flask already sets up logging
+        allow_logging_basic_config=False)
+
+    # send exceptions from `app` to rollbar, using flask's signal system.
+    got_request_exception.connect(rollbar.contrib.flask.report_exception, current_app._get_current_object())
+
+
+def warm_hot_events():
+    """
+    Load the reservations of the events of RS_HOT_EVENT_IDS in the in-memory index before the first request.
+    If the load fails their lookups go to the database until PUT /admin/hot_events/<event_id> loads them
+    """
+
+    event_ids = current_app.config['RS_HOT_EVENT_IDS']
+    if not event_ids:
+        return
+
+    from reservationservice.app.controllers.hotindex import HotEventController
+
+    if HotEventController().warm_events(event_ids) is None:
+        print "Error loading the reservations of the hot events {0}".format(event_ids)
+
+
+def create_app(config=None):
+    """
+    Build the application: config, database, metrics and the blueprint of the API.
+    The modules of the resources (and their controllers, managers and schemas) are imported here,
+    not when the package is imported
+    :param config: dict, optional settings overriding default_config. Ie {'SQLALCHEMY_POOL_SIZE': 20}
+    :returns Flask application
+    """
+
+    from reservationservice.app.api import api_blueprint
+
+    app = Flask(__name__)
+    app.config.from_object('reservationservice.default_config')
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    init_metrics(app)
+
+    app.add_url_rule('/', 'hello_world', hello_world)
+    app.register_blueprint(api_blueprint)
+
+    app.after_request(set_read_primary_cookie)
+    app.teardown_appcontext(shutdown_session)
+    app.before_first_request(init_rollbar)
+    app.before_first_request(warm_hot_events)
+
+    return app
+
+
+def get_app(config=None):
+    """
+    Get the default application of the process, it is built on first use
+    :param config: dict, settings of create_app when the application is built. Ie {'SQLALCHEMY_POOL_SIZE': 20}
+    :returns Flask application
+    :raises ValueError when the application was already built with other values of config
+    """
+
+    global _app
+
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app(config)
+
+    # Engines and limiters may already be built from the config, changing it now would be ignored
+    if config and any(_app.config.get(key) != value for key, value in config.iteritems()):
+        raise ValueError('The application was already built without the config {0}'.format(config))
+
+    return _app
+
+
+# Default application of the process, built on its first use (see wsgi.py)
+app = LocalProxy(get_app)
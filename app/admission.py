@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Admission control of the API: token buckets by client and by event for POST /reservation and a limit of
+requests in flight, so overload is answered with 429/503 and Retry-After instead of queueing on the db pool.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context, jsonify, request
+
+from reservationservice.app.extensions import get_app_extension
+from reservationservice.app.metrics import registry
+
+# Operational endpoints stay available when the service is overloaded. Long polls of the changes feed wait
+# without a connection of the pool, they would hold a slot for nothing
+UNLIMITED_ENDPOINTS = ('api.metrics', 'api.admin_pool', 'api.reservation_changes')
+
+RATE_LIMITER_EXTENSION = 'rs_rate_limiter'
+CONCURRENCY_LIMITER_EXTENSION = 'rs_concurrency_limiter'
+
+RATE_LIMITED = registry.counter(
+    'rs_rate_limited_total', 'Requests rejected with 429 by rate limit', ('scope',))
+ADMISSION_REJECTED = registry.counter(
+    'rs_admission_rejected_total', 'Requests rejected with 503 by the limit of requests in flight')
+
+_rate_limiter_lock = threading.Lock()
+_concurrency_limiter_lock = threading.Lock()
+
+
+def retry_later(status, retry_after, message):
+    """
+    Build the rejection of a request that can be retried. It is returned by the before request hook instead of
+    raised, so shedding load does not log an error by request
+    :param status: Int, 429 or 503
+    :param retry_after: Float, seconds until the request can be admitted. Ie 0.4
+    :param message: String, message of the response
+    """
+
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(int(math.ceil(retry_after)) or 1)
+    return response
+
+
+def refill(tokens, stamp, now, rate, burst, cost):
+    """
+    Refill a token bucket up to now and take cost tokens from it when there are enough
+    :param tokens: Float, tokens of the bucket at stamp, None for a new bucket
+    :param stamp: Float, seconds of the last refill
+    :param now: Float, current seconds
+    :param rate: Float, tokens added by second. Ie 10
+    :param burst: Int, max tokens of the bucket. Ie 20
+    :param cost: Int, tokens taken. Ie 1
+    :returns tuple with the tokens left and the seconds to wait until cost tokens are available, 0 when taken
+    """
+
+    if tokens is None:
+        tokens = float(burst)
+    else:
+        tokens = min(float(burst), tokens + max(now - stamp, 0) * rate)
+
+    if tokens >= cost:
+        return tokens - cost, 0.0
+
+    return tokens, (cost - tokens) / rate
+
+
+def take(buckets, now, cost):
+    """
+    Refill token buckets up to now and take cost tokens from each one only when all of them have enough
+    :param buckets: List of tuples with the tokens, stamp, rate and burst of each bucket, tokens None for a new one
+    :param now: Float, current seconds
+    :param cost: Int, tokens taken from each bucket. Ie 1
+    :returns tuple with the list of tokens left and the list of seconds to wait of each bucket, all 0 when taken
+    """
+
+    refilled = [refill(tokens, stamp, now, rate, burst, cost) for tokens, stamp, rate, burst in buckets]
+    waits = [wait for _, wait in refilled]
+
+    if any(waits):
+        # A rejected request takes nothing, the buckets with enough tokens get their cost back
+        return [tokens if wait else tokens + cost for tokens, wait in refilled], waits
+
+    return [tokens for tokens, _ in refilled], waits
+
+
+class MemoryBucketStore(object):
+    """
+    In-process token buckets. Each process of the service keeps its own buckets, so the limits are by process
+    """
+
+    def __init__(self, max_size=100000, clock=time.time):
+        """
+        :param max_size: Int, max number of buckets, the least recently used are dropped. Ie 100000
+        :param clock: Function returning the current seconds
+        """
+
+        self.max_size = max_size
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def consume(self, key, rate, burst, cost=1):
+        """
+        Take cost tokens from the bucket of key
+        :param key: String, bucket. Ie 'client:10.0.0.1'
+        :returns Float, 0 when the tokens were taken, else seconds until they are available
+        """
+
+        return self.consume_all([(key, rate, burst)], cost)[0]
+
+    def consume_all(self, buckets, cost=1):
+        """
+        Take cost tokens from every bucket, or from none of them when one has not enough
+        :param buckets: List of tuples with the key, rate and burst of each bucket. Ie [('client:10.0.0.1', 5, 10)]
+        :returns list with the seconds until the tokens of each bucket are available, all 0 when they were taken
+        """
+
+        with self.lock:
+            now = self.clock()
+            states = [self.buckets.pop(key, (None, None)) + (rate, burst) for key, rate, burst in buckets]
+            tokens, waits = take(states, now, cost)
+
+            # Reinserting the keys moves them to the most recently used end, a dropped bucket starts full again
+            for (key, _, _), left in zip(buckets, tokens):
+                self.buckets[key] = (left, now)
+            while len(self.buckets) > self.max_size:
+                self.buckets.popitem(last=False)
+
+        return waits
+
+
+class RedisBucketStore(object):
+    """
+    Token buckets shared by all the processes of the service stored in Redis.
+    Each bucket is a hash refilled in a WATCH/MULTI transaction, retried when another process changes it,
+    and timed with the clock of the Redis server.
+    """
+
+    def __init__(self, client, prefix='rs-rate:'):
+        """
+        :param client: redis.StrictRedis compatible client
+        :param prefix: String, prefix of every key written in Redis. Ie 'rs-rate:'
+        """
+
+        self.client = client
+        self.prefix = prefix
+
+    def consume(self, key, rate, burst, cost=1):
+        """
+        Take cost tokens from the bucket of key
+        :param key: String, bucket. Ie 'client:10.0.0.1'
+        :returns Float, 0 when the tokens were taken, else seconds until they are available
+        """
+
+        return self.consume_all([(key, rate, burst)], cost)[0]
+
+    def consume_all(self, buckets, cost=1):
+        """
+        Take cost tokens from every bucket, or from none of them when one has not enough. The buckets are watched
+        in one transaction, so they are refilled and taken at once
+        :param buckets: List of tuples with the key, rate and burst of each bucket. Ie [('client:10.0.0.1', 5, 10)]
+        :returns list with the seconds until the tokens of each bucket are available, all 0 when they were taken
+        """
+
+        names = [self.prefix + key for key, _, _ in buckets]
+
+        def take_tokens(pipeline):
+            states = []
+            for name, (_, rate, burst) in zip(names, buckets):
+                tokens, stamp = pipeline.hmget(name, 'tokens', 'stamp')
+                states.append((None if tokens is None else float(tokens), None if stamp is None else float(stamp),
+                               rate, burst))
+
+            seconds, microseconds = pipeline.time()
+            now = seconds + microseconds / 1000000.0
+            tokens, waits = take(states, now, cost)
+
+            pipeline.multi()
+            for name, (_, rate, burst), left in zip(names, buckets, tokens):
+                pipeline.hmset(name, {'tokens': repr(left), 'stamp': repr(now)})
+                # A bucket untouched until it is full again is the same as a new one
+                pipeline.expire(name, int(math.ceil(burst / float(rate))) + 1)
+            return waits
+
+        try:
+            return self.client.transaction(take_tokens, *names, value_from_callable=True)
+        except Exception, e:
+            # An unavailable store must not reject reservations, the limit of requests in flight still protects the db
+            print "Error consuming rate limits {0}. Detail error {1}".format(
+                ', '.join(key for key, _, _ in buckets), e)
+            return [0.0] * len(buckets)
+
+
+class NullRateLimiter(object):
+    """
+    Rate limiter used when rate limits are disabled, every request is admitted
+    """
+
+    def check(self, client_id, event_id=None):
+        return None
+
+
+class RateLimiter(object):
+    """
+    Token buckets of the reservations made by each client and for each event
+    """
+
+    def __init__(self, store, client_rate, client_burst, event_rate, event_burst):
+        """
+        :param store: MemoryBucketStore or RedisBucketStore
+        :param client_rate: Float, reservations by second of a client. Ie 5
+        :param client_burst: Int, reservations a client can make at once. Ie 10
+        :param event_rate: Float, reservations by second of an event from all the clients. Ie 200
+        :param event_burst: Int, reservations of an event that can be made at once. Ie 400
+        """
+
+        self.store = store
+        self.limits = {
+            'client': (client_rate, client_burst),
+            'event': (event_rate, event_burst)
+        }
+
+    def check(self, client_id, event_id=None):
+        """
+        Take a token of the client and one of the event. Both buckets are checked before taking either, so a
+        request rejected by the event does not spend a token of the client
+        :param client_id: String, client of the request. Ie '10.0.0.1'
+        :param event_id: Int, event of the reservation or None when it is not known
+        :returns tuple with the scope of the exhausted bucket and the seconds to wait. Ie ('client', 0.2),
+            or None when the request is admitted
+        """
+
+        buckets = [('client', client_id)]
+        if event_id is not None:
+            buckets.append(('event', event_id))
+
+        waits = self.store.consume_all(
+            [('{0}:{1}'.format(scope, key),) + self.limits[scope] for scope, key in buckets])
+
+        for (scope, _), wait in zip(buckets, waits):
+            if wait:
+                return scope, wait
+
+        return None
+
+
+class ConcurrencyLimiter(object):
+    """
+    Limit of requests in flight of the process. Requests wait up to timeout seconds for a slot, so the db pool
+    is never waited for and the latency of the admitted requests stays bounded
+    """
+
+    def __init__(self, limit, timeout=0.1):
+        """
+        :param limit: Int, max requests in flight, 0 disables the limit. Ie 20
+        :param timeout: Float, max seconds a request waits for a slot. Ie 0.1
+        """
+
+        self.limit = limit
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to timeout seconds
+        :returns Boolean, False when there was not a free slot in time
+        """
+
+        if not self.limit:
+            return True
+
+        deadline = time.time() + self.timeout
+
+        with self.condition:
+            while self.in_flight >= self.limit:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self.condition.wait(remaining)
+
+            self.in_flight += 1
+            self.admitted += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def release(self):
+        if not self.limit:
+            return
+
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def stats(self):
+        """
+        :returns dict. Ie {'limit': 20, 'in_flight': 3, 'max_in_flight': 20, 'admitted': 1200, 'rejected': 15}
+        """
+
+        with self.condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+def build_rate_limiter(config):
+    """
+    Build the rate limiter set up in config
+    :param config: Dict, application config with RS_RATE_LIMIT_* values
+    :returns NullRateLimiter or RateLimiter with a MemoryBucketStore or a RedisBucketStore
+    """
+
+    backend = config.get('RS_RATE_LIMIT_BACKEND', 'none')
+
+    if backend == 'memory':
+        store = MemoryBucketStore()
+    elif backend == 'redis':
+        import redis
+        store = RedisBucketStore(redis.StrictRedis.from_url(config['RS_RATE_LIMIT_REDIS_URL']))
+    else:
+        return NullRateLimiter()
+
+    return RateLimiter(
+        store,
+        config['RS_RATE_LIMIT_CLIENT_RATE'], config['RS_RATE_LIMIT_CLIENT_BURST'],
+        config['RS_RATE_LIMIT_EVENT_RATE'], config['RS_RATE_LIMIT_EVENT_BURST']
+    )
+
+
+def build_concurrency_limiter(config):
+    """
+    Build the limit of requests in flight set up in config, by default the connections of the db pool
+    :param config: Dict, application config with RS_MAX_CONCURRENT_REQUESTS and RS_ADMISSION_TIMEOUT_MS
+    :returns ConcurrencyLimiter
+    """
+
+    limit = config.get('RS_MAX_CONCURRENT_REQUESTS')
+    if limit is None:
+        limit = config['SQLALCHEMY_POOL_SIZE'] + config['SQLALCHEMY_MAX_OVERFLOW']
+
+    return ConcurrencyLimiter(limit, config['RS_ADMISSION_TIMEOUT_MS'] / 1000.0)
+
+
+def get_rate_limiter():
+    """
+    Get the rate limiter shared by all requests of the application, it is built on first use from the app config
+    :returns NullRateLimiter or RateLimiter, NullRateLimiter when there is not an application context
+    """
+
+    if not has_app_context():
+        return NullRateLimiter()
+
+    return get_app_extension(RATE_LIMITER_EXTENSION, _rate_limiter_lock, lambda app: build_rate_limiter(app.config))
+
+
+def get_concurrency_limiter():
+    """
+    Get the limit of requests in flight of the application, it is built on first use from the app config
+    :returns ConcurrencyLimiter, disabled when there is not an application context
+    """
+
+    if not has_app_context():
+        return ConcurrencyLimiter(0)
+
+    return get_app_extension(
+        CONCURRENCY_LIMITER_EXTENSION, _concurrency_limiter_lock, lambda app: build_concurrency_limiter(app.config))
+
+
+def client_id():
+    """
+    Get the client of the request: the value of the RS_RATE_LIMIT_CLIENT_HEADER header when it is set up
+    (an API key, or X-Forwarded-For behind a proxy), else the remote address. The header must be set by the
+    proxy in front of the service, a header passed through from the client lets it choose its own bucket
+    """
+
+    header = current_app.config.get('RS_RATE_LIMIT_CLIENT_HEADER')
+    if header and request.headers.get(header):
+        # Our proxy appends the address it was connected from to X-Forwarded-For, the addresses before it are
+        # sent by the client and can be forged
+        return request.headers[header].split(',')[-1].strip()
+
+    return request.remote_addr or 'unknown'
+
+
+def request_event_id():
+    """
+    Get the event of the reservation posted, None when the body is not valid (it is rejected later with 400)
+    """
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+
+    try:
+        return int(data.get('event_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def admit_request():
+    """
+    Check the rate limits of POST /reservation and take a slot of requests in flight before the request runs
+    :returns None when the request is admitted, else a 429 response when a rate limit is exhausted or a 503 one
+        when there is not a free slot
+    """
+
+    if request.endpoint in UNLIMITED_ENDPOINTS:
+        return
+
+    # Rate limits are checked first: they do not wait, so a flooding client never takes a slot
+    if request.endpoint == 'api.reservation' and request.method == 'POST':
+        exhausted = get_rate_limiter().check(client_id(), request_event_id())
+        if exhausted is not None:
+            scope, wait = exhausted
+            RATE_LIMITED.inc(scope=scope)
+            return retry_later(429, wait, 'Too many reservations by {0}, retry in {1:.1f}s'.format(scope, wait))
+
+    limiter = get_concurrency_limiter()
+    if not limiter.acquire():
+        ADMISSION_REJECTED.inc()
+        return retry_later(503, 1, 'The service is overloaded, retry later')
+
+    g.admission_limiter = limiter
+
+
+def release_request(exception=None):
+    """
+    Release the slot of the request, streamed responses keep it until their request context is closed
+    """
+
+    limiter = g.pop('admission_limiter', None)
+    if limiter is not None:
+        limiter.release()
@@ -1,11 +1,24 @@
 #!flask/bin/python
 
+from flask import Blueprint
 from flask_restful import Api
 
-from reservationservice.app import app
-from reservationservice.app.resources.reservation import ReservationAPI
+from reservationservice.app.admission import admit_request, release_request
+from reservationservice.app.resources.admin import HotEventAPI, HotEventsAPI, MetricsAPI, PoolStatsAPI
+from reservationservice.app.resources.capacity import EventCapacityAPI
+from reservationservice.app.resources.change import ReservationChangesAPI
+from reservationservice.app.resources.reservation import (
+    EventReservationAPI, ReservationAPI, ReservationBatchAPI, ReservationBulkAPI, ReservationCountAPI,
+    ReservationExportAPI, ReservationItemAPI, ReservationStatusAPI
+)
+
+# Registered on the application by create_app, endpoints are named 'api.<endpoint>'
+api_blueprint = Blueprint('api', __name__)
+
+api_blueprint.before_request(admit_request)
+api_blueprint.teardown_request(release_request)
 
-userservice_api = Api(app)
+userservice_api = Api(api_blueprint)
 
 userservice_api.add_resource(
     ReservationAPI,
@@ -13,5 +26,81 @@ userservice_api.add_resource(
     endpoint='reservation'
 )
 
+userservice_api.add_resource(
+    ReservationBulkAPI,
+    '/reservation/bulk',
+    endpoint='reservation_bulk'
+)
+
+userservice_api.add_resource(
+    ReservationBatchAPI,
+    '/reservation/batch',
+    endpoint='reservation_batch'
+)
+
+userservice_api.add_resource(
+    ReservationCountAPI,
+    '/reservation/count',
+    endpoint='reservation_count'
+)
+
+userservice_api.add_resource(
+    ReservationExportAPI,
+    '/reservation/export',
+    endpoint='reservation_export'
+)
+
+userservice_api.add_resource(
+    ReservationChangesAPI,
+    '/reservation/changes',
+    endpoint='reservation_changes'
+)
+
+userservice_api.add_resource(
+    ReservationStatusAPI,
+    '/reservation/status/<string:reservation_id>',
+    endpoint='reservation_status'
+)
+
+userservice_api.add_resource(
+    ReservationItemAPI,
+    '/reservation/<string:reservation_id>',
+    endpoint='reservation_item'
+)
+
+userservice_api.add_resource(
+    EventCapacityAPI,
+    '/event/<int:event_id>/capacity',
+    endpoint='event_capacity'
+)
+
+userservice_api.add_resource(
+    EventReservationAPI,
+    '/event/<int:event_id>/reservation/<int:user_id>',
+    endpoint='event_reservation'
+)
+
+userservice_api.add_resource(
+    PoolStatsAPI,
+    '/admin/pool',
+    endpoint='admin_pool'
+)
+userservice_api.add_resource(
+    HotEventsAPI,
+    '/admin/hot_events',
+    endpoint='admin_hot_events'
+)
+userservice_api.add_resource(
+    HotEventAPI,
+    '/admin/hot_events/<int:event_id>',
+    endpoint='admin_hot_event'
+)
+userservice_api.add_resource(
+    MetricsAPI,
+    '/metrics',
+    endpoint='metrics'
+)
+
 if __name__ == '__main__':
+    from reservationservice.app import app
     app.run()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cPickle as pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import has_app_context
+
+from reservationservice.app.extensions import get_app_extension
+
+CACHE_KEY_PREFIX = 'reservation'
+ALL_TAG = 'all'
+CACHE_EXTENSION = 'rs_reservation_cache'
+
+_reservation_cache_lock = threading.Lock()
+
+
+def cache_key(operation, filters):
+    """
+    Build the cache key of a read from its normalized filters
+    :param operation: String, name of the cached read. Ie 'select'
+    :param filters: Dictionary, filters of the read. Ie {'user_id': 24, 'event_id': 45}
+    :returns String key. Ie 'reservation:select:event_id=45&user_id=24'
+    """
+
+    normalized = '&'.join('{0}={1}'.format(key, filters[key]) for key in sorted(filters) if filters[key] is not None)
+    return '{0}:{1}:{2}'.format(CACHE_KEY_PREFIX, operation, normalized)
+
+
+def cache_tags(filters):
+    """
+    Get the tags used to invalidate the reads done with filters
+    :param filters: Dictionary, filters of the read. Ie {'user_id': 24, 'event_id': 45}
+    :returns list of tags. Ie ['user:24', 'event:45']
+    """
+
+    tags = []
+    if filters.get('id') is not None:
+        tags.append('id:{0}'.format(filters['id']))
+    if filters.get('user_id') is not None:
+        tags.append('user:{0}'.format(filters['user_id']))
+    if filters.get('event_id') is not None:
+        tags.append('event:{0}'.format(filters['event_id']))
+
+    return tags or [ALL_TAG]
+
+
+def reservation_tags(user_id=None, event_id=None, reservation_id=None):
+    """
+    Get the tags that must be invalidated when a reservation is written
+    :param user_id: Int, user of the reservation. Ie 24
+    :param event_id: Int, event of the reservation. Ie 45
+    :param reservation_id: String, id of the reservation when it is updated. Ie '2h-34-jh-34'
+    :returns list of tags. Ie ['all', 'user:24', 'event:45']
+    """
+
+    tags = [ALL_TAG]
+    if reservation_id is not None:
+        tags.append('id:{0}'.format(reservation_id))
+    if user_id is not None:
+        tags.append('user:{0}'.format(user_id))
+    if event_id is not None:
+        tags.append('event:{0}'.format(event_id))
+
+    return tags
+
+
+class CacheStats(object):
+    """
+    Thread safe hit, miss, eviction and invalidation counters of a cache
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def increment(self, counter, value=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+class NullCache(object):
+    """
+    Cache backend used when the cache is disabled, every read is a miss
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+
+class LRUCache(object):
+    """
+    In-process cache backend with least recently used eviction and ttl expiration.
+    Values are shared between threads so they must not be modified after set.
+    """
+
+    def __init__(self, max_size=10000, ttl=30):
+        """
+        :param max_size: Int, max number of keys. Ie 10000
+        :param ttl: Int, seconds a key is valid. Ie 30
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.tags = {}
+        self.stats = CacheStats()
+
+    def get(self, key):
+        """
+        Get the value of key
+        :param key: String, cache key. Ie 'reservation:select:user_id=24'
+        :returns the cached value or None if key is missing or expired
+        """
+
+        with self.lock:
+            item = self.items.pop(key, None)
+
+            if item is None or item[1] < time.time():
+                if item is not None:
+                    self._forget(key, item[2])
+                self.stats.increment('misses')
+                return None
+
+            # Reinserting the key moves it to the most recently used end
+            self.items[key] = item
+            self.stats.increment('hits')
+            return item[0]
+
+    def set(self, key, value, tags):
+        """
+        Set the value of key
+        :param key: String, cache key. Ie 'reservation:select:user_id=24'
+        :param value: cached value
+        :param tags: List, tags that invalidate the key. Ie ['user:24']
+        """
+
+        with self.lock:
+            old_item = self.items.pop(key, None)
+            if old_item is not None:
+                self._forget(key, old_item[2])
+
+            self.items[key] = (value, time.time() + self.ttl, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+
+            while len(self.items) > self.max_size:
+                evicted_key, evicted_item = self.items.popitem(last=False)
+                self._forget(evicted_key, evicted_item[2])
+                self.stats.increment('evictions')
+
+    def invalidate(self, tags):
+        """
+        Delete all keys with any of the tags
+        :param tags: List, tags to invalidate. Ie ['user:24', 'event:45']
+        """
+
+        with self.lock:
+            for tag in tags:
+                for key in self.tags.pop(tag, ()):
+                    item = self.items.pop(key, None)
+                    if item is not None:
+                        self._forget(key, item[2])
+                        self.stats.increment('invalidations')
+
+    def _forget(self, key, tags):
+        """
+        Remove key from the index of its tags, the lock must be held
+        """
+
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCache(object):
+    """
+    Cache backend shared between processes stored in Redis.
+    Each tag is a Redis set with the keys to delete when the tag is invalidated.
+    """
+
+    def __init__(self, client, ttl=30, prefix='rs-cache:'):
+        """
+        :param client: redis.StrictRedis compatible client
+        :param ttl: Int, seconds a key is valid. Ie 30
+        :param prefix: String, prefix of every key written in Redis. Ie 'rs-cache:'
+        """
+
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception, e:
+            # An unavailable cache must not break reads, they go to the db
+            print "Error getting cache key {0}. Detail error {1}".format(key, e)
+            value = None
+
+        if value is None:
+            self.stats.increment('misses')
+            return None
+
+        self.stats.increment('hits')
+        return pickle.loads(value)
+
+    def set(self, key, value, tags):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.setex(self.prefix + key, self.ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+        for tag in tags:
+            pipeline.sadd(self.prefix + 'tag:' + tag, self.prefix + key)
+            # Tag sets live longer than their keys so they never miss a key that is still valid
+            pipeline.expire(self.prefix + 'tag:' + tag, self.ttl * 2)
+
+        try:
+            pipeline.execute()
+        except Exception, e:
+            print "Error setting cache key {0}. Detail error {1}".format(key, e)
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            try:
+                keys = list(self.client.smembers(tag_key))
+                deleted = self.client.delete(tag_key, *keys)
+            except Exception, e:
+                # Writes are already committed, their stale reads expire with the ttl
+                print "Error invalidating cache tag {0}. Detail error {1}".format(tag, e)
+                continue
+
+            self.stats.increment('invalidations', max(deleted - 1, 0))
+
+
+def build_cache(config):
+    """
+    Build the cache backend set up in config
+    :param config: Dict, application config with RS_CACHE_* values
+    :returns NullCache, LRUCache or RedisCache
+    """
+
+    backend = config.get('RS_CACHE_BACKEND', 'none')
+
+    if backend == 'memory':
+        return LRUCache(max_size=config['RS_CACHE_MAX_SIZE'], ttl=config['RS_CACHE_TTL'])
+
+    if backend == 'redis':
+        import redis
+        return RedisCache(redis.StrictRedis.from_url(config['RS_CACHE_REDIS_URL']), ttl=config['RS_CACHE_TTL'])
+
+    return NullCache()
+
+
+def get_reservation_cache():
+    """
+    Get the cache shared by all requests of the application, it is built on first use from the app config
+    :returns cache backend, NullCache when there is not an application context
+    """
+
+    if not has_app_context():
+        return NullCache()
+
+    return get_app_extension(CACHE_EXTENSION, _reservation_cache_lock, lambda app: build_cache(app.config))
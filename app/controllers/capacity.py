@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from reservationservice.app.managers.capacity import EventCapacityManager
+from reservationservice.app.metrics import timed
+
+
+class EventCapacityController(object):
+    """
+    Contain methods to access to data related to EventCapacity Model.
+    It does not keep request state so one instance can serve all the requests of the process.
+    """
+
+    def __init__(self):
+        self.manager = EventCapacityManager()
+
+    @timed('controller')
+    def get_capacity(self, event_id):
+        """
+        Get the capacity of the event
+        :param event_id: Int, event id. Ie 45
+        :returns dict item or None on error. Ie {'event_id': 45, 'capacity': 500, 'remaining': 20}
+        :raises EventCapacityNotFoundError when the event has unlimited capacity
+        """
+
+        return self.to_dict(self.manager.get(event_id))
+
+    @timed('controller')
+    def set_capacity(self, event_id, capacity):
+        """
+        Set the capacity of the event
+        :param event_id: Int, event id. Ie 45
+        :param capacity: Int, total seats of the event. Ie 500
+        :returns dict item or None on error. Ie {'event_id': 45, 'capacity': 500, 'remaining': 500}
+        """
+
+        return self.to_dict(self.manager.set_capacity(event_id, capacity))
+
+    def to_dict(self, event_capacity):
+        if event_capacity is None:
+            return None
+
+        return {
+            'event_id': event_capacity.event_id,
+            'capacity': event_capacity.capacity,
+            'remaining': event_capacity.remaining
+        }
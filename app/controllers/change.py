@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+from reservationservice.app.feed import decode_offset, encode_offset, get_reservation_feed
+from reservationservice.app.managers.change import ReservationChangeManager
+from reservationservice.app.metrics import timed
+
+
+class ReservationChangeController(object):
+    """
+    Contain methods to access to the feed of reservation changes.
+    It does not keep request state so one instance can serve all the requests of the process.
+    """
+
+    def __init__(self):
+        self.manager = ReservationChangeManager()
+
+    @timed('controller')
+    def poll_changes(self, offset, limit, wait, poll_interval):
+        """
+        Get the changes after offset, waiting up to wait seconds for new ones when there are none.
+        The poll is woken up by the commits of the process (and of the other processes on Postgres), and reads
+        again every poll_interval seconds in case a notification was lost
+        :param offset: String, next_offset of a previous response or None from the oldest change kept
+        :param limit: Int, max changes. Ie 100
+        :param wait: Float, max seconds to wait for changes, 0 answers at once. Ie 30
+        :param poll_interval: Float, max seconds between reads while waiting. Ie 1
+        :returns tuple with the list of changes and the offset to resume from, None on error.
+            Ie ([{'offset': 'ODEyM3wxMDAzNDU=', 'type': 'created', 'reservation_id': '2h-34-jh-34', ...}], 'ODEyM3wxMDAzNDU=')
+        :raises ValueError when the offset is malformed
+        """
+
+        position = decode_offset(offset)
+        feed = get_reservation_feed()
+        deadline = time.time() + wait
+
+        while True:
+            # Read before the select, so a commit during the select makes the wait return at once
+            sequence = feed.sequence
+            changes = self.manager.select(position, limit)
+            if changes is None:
+                return None
+
+            remaining = deadline - time.time()
+            if changes or remaining <= 0:
+                break
+
+            self.manager.listen(feed)
+            feed.wait(sequence, min(remaining, poll_interval))
+
+        data = [self.to_dict(change) for change in changes]
+        return data, data[-1]['offset'] if data else offset
+
+    def to_dict(self, change):
+        return {
+            'offset': encode_offset((change.tx_id, change.id)),
+            'type': change.type,
+            'reservation_id': change.reservation_id,
+            'user_id': change.user_id,
+            'event_id': change.event_id,
+            'version': change.version,
+            'create_date': change.create_date.isoformat()
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from reservationservice.app.hotindex import get_hot_event_index
+from reservationservice.app.managers.change import ReservationChangeManager
+from reservationservice.app.managers.reservation import ReservationManager
+from reservationservice.app.metrics import timed
+
+# Changes of the feed read by each query of a refresh
+REFRESH_PAGE_SIZE = 1000
+
+
+class HotEventController(object):
+    """
+    Contain methods to access to the in-memory index of the reservations of hot events.
+    It does not keep request state so one instance can serve all the requests of the process.
+    """
+
+    def __init__(self):
+        self.manager = ReservationManager()
+        self.change_manager = ReservationChangeManager()
+
+    @timed('controller')
+    def warm_events(self, event_ids):
+        """
+        Load the reservations of events in the index, events already loaded are read again
+        :param event_ids: List, event ids. Ie [45, 46]
+        :returns list of the stats of the events or None on error. Ie [{'event_id': 45, 'reservations': 1000, 'bytes': 4056}]
+        """
+
+        index = get_hot_event_index()
+
+        # Refreshes would apply the changes read while an event is loaded to the index without it
+        with index.refresh_lock:
+            offset = self.load_events(index, event_ids)
+            if offset is None:
+                return None
+
+            # Changes after the oldest offset are applied again to every event, applying them twice is harmless
+            if index.offset is None:
+                index.seek(offset)
+
+        return [event for event in index.stats()['events'] if event['event_id'] in event_ids]
+
+    def drop_event(self, event_id):
+        """
+        Remove an event from the index, its lookups go back to the database
+        :param event_id: Int, event id. Ie 45
+        """
+
+        get_hot_event_index().drop(event_id)
+
+    def stats(self):
+        """
+        Get the reservations and memory of each event of the index
+        :returns dict. Ie {'events': [{'event_id': 45, 'reservations': 1000, 'bytes': 4056}], 'reservations': 1000, 'bytes': 4056}
+        """
+
+        return get_hot_event_index().stats()
+
+    def contains(self, event_id, user_id):
+        """
+        :returns Boolean, True if user_id has a reservation of the event, None if the event is not hot
+        """
+
+        index = get_hot_event_index()
+        if not index.is_hot(event_id):
+            return None
+
+        self.refresh(index)
+        return index.contains(event_id, user_id)
+
+    def counts(self, event_ids):
+        """
+        Get the reservations of the hot events of event_ids
+        :param event_ids: List, event ids. Ie [45, 46]
+        :returns dict with the count of each hot event, events not hot are left out. Ie {45: 1000}
+        """
+
+        index = get_hot_event_index()
+        if not any(index.is_hot(event_id) for event_id in event_ids):
+            return {}
+
+        self.refresh(index)
+        counts = dict((event_id, index.count(event_id)) for event_id in event_ids)
+        return dict((event_id, count) for event_id, count in counts.iteritems() if count is not None)
+
+    def refresh(self, index):
+        """
+        Apply the changes of the feed written since the last refresh, at most once every max lag of the index.
+        A lookup never waits for the refresh of another request, it is served with the index as it is. On error
+        the index is kept and the next lookup tries again
+        :param index: HotEventIndex
+        """
+
+        if not index.needs_refresh() or not index.refresh_lock.acquire(False):
+            return
+
+        try:
+            while True:
+                changes = self.change_manager.select(index.offset, REFRESH_PAGE_SIZE)
+                if changes is None:
+                    return
+
+                if changes and index.apply(changes, (changes[-1].tx_id, changes[-1].id)):
+                    # Updates do not carry the previous event and user of the reservation
+                    offset = self.load_events(index, index.hot_events())
+                    if offset is None:
+                        return
+                    index.seek(offset)
+
+                if len(changes) < REFRESH_PAGE_SIZE:
+                    break
+
+            index.mark_refreshed()
+
+        finally:
+            index.refresh_lock.release()
+
+    def load_events(self, index, event_ids):
+        """
+        Read the users of events and load them in index, the caller holds the refresh lock of the index
+        :returns Tuple, offset of the last change of the feed read before the users, None on error
+        """
+
+        offset = self.change_manager.last_offset()
+        if offset is None:
+            return None
+
+        for event_id in event_ids:
+            user_ids = self.manager.select_event_user_ids(event_id)
+            if user_ids is None:
+                return None
+            index.load(event_id, user_ids)
+
+        return offset
@@ -1,12 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import hashlib
+import threading
+
+from flask import json
+
+from reservationservice.app.exceptions import ReservationNotFoundError
+from reservationservice.app.export import export_rows
+from reservationservice.app.ids import is_valid_id
+from reservationservice.app.cache import cache_key
+from reservationservice.app.controllers.hotindex import HotEventController
+from reservationservice.app.managers.counter import COUNTER_KINDS, ReservationCounterManager
 from reservationservice.app.managers.reservation import ReservationManager
-from reservationservice.app.schemas import ReservationShema
+from reservationservice.app.metrics import serialize, timed
+from reservationservice.app.pagination import decode_cursor, encode_cursor
+from reservationservice.app.replicas import mark_write
+from reservationservice.app.models import ReservationRow
+from reservationservice.app.schemas import RESERVATION_DETAIL_FIELDS, ReservationShema, dump_reservations
+from reservationservice.app.writebehind import COMMITTED, QUEUED, get_queued_status, get_write_behind_queue
 
 class ReservationController(object):
     """
-    Contain methods to access to data related to Reservation Model
+    Contain methods to access to data related to Reservation Model.
+    It does not keep request state so one instance can serve all the requests of the process.
     """
 
     def __init__(self):
@@ -16,20 +33,53 @@ class ReservationController(object):
         :param auto_commit: Boolean, auto commit (Transactions auto_commit = False)
         """
         self.manager = ReservationManager()
-        reservation_fields = ['id', 'user_id', 'event_id', 'create_date']
-        self.schema_one = ReservationShema(many=False, only=reservation_fields)
-        self.schema_many = ReservationShema(many=True, only=reservation_fields)
+        self.counter_manager = ReservationCounterManager()
+        self.hot_events = HotEventController()
+        # marshmallow schemas keep the errors of the last dump, so each thread gets its own ones
+        self.schemas = threading.local()
+
+    @property
+    def schema_one(self):
+        """
+        Schema to serialize one reservation, built once per thread
+        """
+        if not hasattr(self.schemas, 'one'):
+            self.schemas.one = ReservationShema(many=False, only=RESERVATION_DETAIL_FIELDS)
+        return self.schemas.one
 
+    @timed('controller')
     def get_reservation(self, reservation_id):
         """
         Get reservation by id
-        :param reservation_id: Int, reservation id. Ie 45
-        :returns dict item with reservation item
+        :param reservation_id: String, reservation id. Ie '2h-34-jh-34'
+        :returns dict item with reservation item, None if it does not exist or is cancelled
         """
 
+        if not is_valid_id(reservation_id):
+            return None
+
         reservation = self.manager.get({'id': reservation_id})
+        if reservation is None:
+            return None
+
         return self.schema_one.dump(reservation).data
 
+    @timed('controller')
+    def has_reservation(self, event_id, user_id):
+        """
+        Check if a user has reserved an event, hot events are answered by the in-memory index
+        :param event_id: Int, event id. Ie 45
+        :param user_id: Int, user id. Ie 34
+        :returns Boolean
+        """
+
+        reserved = self.hot_events.contains(event_id, user_id)
+        if reserved is not None:
+            return reserved
+
+        return self.manager.get({'event_id': event_id, 'user_id': user_id}) is not None
+
+    @timed('controller')
     def select_reservation(self, data):
         """
         Get reservation by id
@@ -37,14 +87,273 @@ class ReservationController(object):
         :returns list of items match with filters data
         """
 
-        reservations = self.manager.select(data)
-        return self.schema_many.dump(reservations).data
+        reservations = self.manager.select(data, projection=True)
+        return serialize('select_reservation', dump_reservations, reservations)
+
+    @timed('controller')
+    def select_reservation_page(self, data, limit, cursor=None, versions=None):
+        """
+        Get a page of reservations by filters
+        :param data: Dict, data to get reservations. Ie {'user_id': 24, 'event_id': 45}
+        :param limit: Int, max number of reservations in the page. Ie 100
+        :param cursor: String, next_cursor returned by the previous page. Ie 'MjAxOS0wNC0wMXwyaC0zNC1qaC0zNA=='
+        :param versions: Dict, counter versions of the ETag sent with the page (see counter_versions)
+        :returns tuple with the list of items match with filters data and the cursor of the next page
+        :raises ValueError when the cursor is malformed
+        """
+
+        reservations, next_cursor = self.manager.select_page(
+            data, limit, decode_cursor(cursor), projection=True, versions=versions)
+        return serialize('select_reservation_page', dump_reservations, reservations), encode_cursor(next_cursor)
+
+    @timed('controller')
+    def counter_versions(self, data):
+        """
+        Get the versions of the counters of the user and event of data, read on the primary
+        :param data: Dict, data to get reservations. Ie {'user_id': 24}
+        :returns dict, None when data has not user_id nor event_id. Ie {('user_id', 24): 7}
+        """
+
+        keys = [(kind, data[kind]) for kind in COUNTER_KINDS if data.get(kind) is not None]
+        if not keys:
+            return None
+
+        return self.counter_manager.get_versions(keys)
+
+    @timed('controller')
+    def reservations_etag(self, data, limit=None, cursor=None, versions=None):
+        """
+        Get the ETag of a page of reservations from the versions of the counters of its user and event,
+        without reading the reservations. It must be taken before the page is read, so a write done
+        in between changes the ETag of the next request instead of hiding the new data. The page sent
+        with the ETag must be read with the same versions (see select_reservation_page) or an old page
+        from the cache or a lagging replica would get the newest ETag.
+        :param data: Dict, data to get reservations. Ie {'user_id': 24}
+        :param limit: Int, max number of reservations in the page. Ie 100
+        :param cursor: String, cursor of the page. Ie 'MjAxOS0wNC0wMXwyaC0zNC1qaC0zNA=='
+        :param versions: Dict, counter versions already read with counter_versions, read here when not sent
+        :returns String ETag, None when data has not user_id nor event_id. Ie '9a0364b9e99bb480dd25e1f0284c8555'
+        """
+
+        keys = [(kind, data[kind]) for kind in COUNTER_KINDS if data.get(kind) is not None]
+        if not keys:
+            return None
+
+        if versions is None:
+            versions = self.counter_manager.get_versions(keys)
+        page_key = cache_key('page', dict(data, limit=limit, cursor=cursor))
+        version_key = ','.join('{0}={1}'.format(kind, versions[(kind, key_id)]) for kind, key_id in keys)
+
+        return hashlib.md5(page_key + '|' + version_key).hexdigest()
+
+    @timed('controller')
+    def select_reservations_by_keys(self, user_ids=None, event_ids=None, group_by='user_id', chunk_size=1000):
+        """
+        Get the reservations of many users and/or events in one call
+        :param user_ids: List, users of the reservations. Ie [10, 11, 12]
+        :param event_ids: List, events of the reservations. Ie [45]
+        :param group_by: String, 'user_id' or 'event_id'
+        :param chunk_size: Int, max number of keys of each query. Ie 1000
+        :returns dict with the list of items of each key. Ie {'10': [{'id': ..., 'user_id': 10, ...}], '11': []}
+        """
+
+        grouped = self.manager.select_by_keys(user_ids, event_ids, group_by, chunk_size)
+        return dict(
+            (str(key), serialize('select_reservations_by_keys', dump_reservations, reservations))
+            for key, reservations in grouped.iteritems()
+        )
+
+    @timed('controller')
+    def count_reservations(self, kind, key_ids):
+        """
+        Get the number of reservations of many users or events
+        :param kind: String, 'user_id' or 'event_id'
+        :param key_ids: List, user or event ids. Ie [45, 46]
+        :returns list of dicts or None on error. Ie [{'event_id': 45, 'count': 120}, {'event_id': 46, 'count': 0}]
+        """
+
+        # Hot events are counted by the in-memory index, the others by their counters
+        counts = self.hot_events.counts(key_ids) if kind == 'event_id' else {}
+        missing_ids = [key_id for key_id in key_ids if key_id not in counts]
+
+        if missing_ids:
+            stored_counts = self.counter_manager.get_counts(kind, missing_ids)
+            if stored_counts is None:
+                return None
+            counts.update(stored_counts)
+
+        return [{kind: key_id, 'count': counts[key_id]} for key_id in key_ids]
+
+    def stream_reservations(self, data, chunk_size):
+        """
+        Serialize all reservations by filters as chunks of a json document {'data': [...]}
+        :param data: Dict, data to get reservations. Ie {'event_id': 45}
+        :param chunk_size: Int, number of reservations fetched and serialized at once. Ie 1000
+        :returns generator of json strings
+        """
+
+        yield '{"data": ['
+
+        chunk = []
+        separator = ''
+        for reservation in self.manager.stream(data, chunk_size, projection=True):
+            chunk.append(reservation)
+
+            if len(chunk) == chunk_size:
+                yield separator + json.dumps(serialize('stream_reservations', dump_reservations, chunk))[1:-1]
+                separator = ', '
+                chunk = []
+
+        if chunk:
+            yield separator + json.dumps(serialize('stream_reservations', dump_reservations, chunk))[1:-1]
+
+        yield ']}'
+
+    def export_reservations(self, data, export_format, chunk_size, compress=False):
+        """
+        Serialize all reservations by filters for analytics pulls, rows are read from a server side cursor
+        and serialized chunk by chunk so memory use does not grow with the export
+        :param data: Dict, data to get reservations. Ie {'event_id': 45}
+        :param export_format: String, 'ndjson', 'csv' or 'arrow'
+        :param chunk_size: Int, number of reservations fetched and serialized at once. Ie 10000
+        :param compress: Boolean, gzip the output
+        :returns generator of strings
+        """
+
+        return export_rows(self.manager.stream(data, chunk_size, projection=True), export_format, chunk_size, compress)
 
-    def create_reservation(self, data):
+    @timed('controller')
+    def create_reservation(self, data, idempotency_key=None):
         """
         create reservation item
         :param data: Dictionary with the data to create. Ie {'user_id': 34, 'event_id': 45}
+        :param idempotency_key: String, key sent by the client to identify retries. Ie '6f1c0b7e-3c0e-4d8a'
+        :returns dict item with the created reservation, None on error
+        """
+
+        reservation = self.manager.create(data, idempotency_key)
+        if reservation is None:
+            return None
+
+        return self.schema_one.dump(reservation).data
+
+    @timed('controller')
+    def enqueue_reservation(self, data):
+        """
+        Accept a reservation that is written later by the write-behind queue
+        :param data: Dictionary with the data to create. Ie {'user_id': 34, 'event_id': 45}
+        :returns dict item with the reservation that will be written and its status
+        """
+
+        row = get_write_behind_queue().submit(data)
+        mark_write()
+        reservation = dump_reservations([ReservationRow(**row)])[0]
+        reservation['status'] = QUEUED
+        return reservation
+
+    @timed('controller')
+    def reservation_status(self, reservation_id):
+        """
+        Get if a reservation accepted by the write-behind queue is queued, committed or rejected
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :returns dict or None if the reservation is not known. Ie {'id': '2h-34-jh-34', 'status': 'committed'}
+        """
+
+        if not is_valid_id(reservation_id):
+            return None
+
+        status = get_queued_status(reservation_id)
+        if status is not None:
+            return status
+
+        # Reservations accepted by other processes, or whose status was forgotten, are found in the database
+        if reservation_id in self.manager.get_existing_ids([reservation_id]):
+            return {'id': reservation_id, 'status': COMMITTED}
+
+        return None
+
+    @timed('controller')
+    def update_reservation(self, reservation_id, version, data):
+        """
+        Update the user or the event of a reservation
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :param version: Int, version of the reservation read by the client. Ie 3
+        :param data: Dictionary with the values to change. Ie {'event_id': 46}
+        :returns dict item with the updated reservation, None on error
+        :raises ReservationError when the reservation does not exist, was changed or can not take the new values
         """
 
-        reservation = self.manager.create(data)
+        if not is_valid_id(reservation_id):
+            raise ReservationNotFoundError(reservation_id)
+
+        reservation = self.manager.update(reservation_id, version, data)
+        if reservation is None:
+            return None
+
         return self.schema_one.dump(reservation).data
+
+    @timed('controller')
+    def cancel_reservation(self, reservation_id, version):
+        """
+        Cancel a reservation
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :param version: Int, version of the reservation read by the client. Ie 3
+        :returns dict item with the cancelled reservation, None on error
+        :raises ReservationError when the reservation does not exist or was changed
+        """
+
+        if not is_valid_id(reservation_id):
+            raise ReservationNotFoundError(reservation_id)
+
+        reservation = self.manager.cancel(reservation_id, version)
+        if reservation is None:
+            return None
+
+        return self.schema_one.dump(reservation).data
+
+    @timed('controller')
+    def bulk_update_reservations(self, items):
+        """
+        Update many reservations at once
+        :param items: List of dictionaries with id, version and the values to change. Ie [{'id': '2h-34-jh-34', 'version': 3, 'event_id': 46}]
+        :returns dict with the updated items and the errors of the rejected ones by index in items
+        """
+
+        reservations, errors = self.manager.bulk_update(items)
+        return {'data': [self.schema_one.dump(reservation).data for reservation in reservations], 'errors': errors}
+
+    @timed('controller')
+    def bulk_cancel_reservations(self, items):
+        """
+        Cancel many reservations at once
+        :param items: List of dictionaries with id and version. Ie [{'id': '2h-34-jh-34', 'version': 3}]
+        :returns dict with the cancelled items and the errors of the rejected ones by index in items
+        """
+
+        reservations, errors = self.manager.bulk_cancel(items)
+        return {'data': [self.schema_one.dump(reservation).data for reservation in reservations], 'errors': errors}
+
+    @timed('controller')
+    def cancel_event_reservations(self, event_id):
+        """
+        Cancel all the reservations of an event
+        :param event_id: Int, event id. Ie 45
+        :returns dict with the number of cancelled reservations, None on error. Ie {'event_id': 45, 'cancelled': 1200}
+        """
+
+        cancelled = self.manager.cancel_event(event_id)
+        if cancelled is None:
+            return None
+
+        return {'event_id': event_id, 'cancelled': cancelled}
+
+    @timed('controller')
+    def bulk_create_reservations(self, items):
+        """
+        create many reservation items at once
+        :param items: List of dictionaries with the data to create. Ie [{'user_id': 34, 'event_id': 45}]
+        :returns dict with the created items and the errors of the rejected ones by index in items
+        """
+
+        reservations, errors = self.manager.bulk_create(items)
+        return {'data': dump_reservations(reservations), 'errors': errors}
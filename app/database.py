@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+POOL_OPTIONS = ('pool_size', 'pool_timeout', 'pool_recycle', 'max_overflow')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long checkouts wait for a free connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _do_get(self):
+        start = time.time()
+
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.time() - start
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+
+    def stats(self):
+        """
+        Get the live statistics of the pool
+        :returns dict. Ie {'size': 10, 'checked_out': 3, 'overflow': -7, ...}
+        """
+
+        with self.stats_lock:
+            return {
+                'size': self.size(),
+                'checked_in': self.checkedin(),
+                'checked_out': self.checkedout(),
+                'overflow': self.overflow(),
+                'max_overflow': self._max_overflow,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time_total': self.wait_time,
+                'wait_time_max': self.max_wait_time,
+                'wait_time_mean': self.wait_time / self.checkouts if self.checkouts else 0.0
+            }
+
+
+def ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """
+    Check a connection is alive before handing it out of the pool, a DisconnectionError
+    makes the pool discard it and retry the checkout with a new connection
+    """
+
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    except Exception:
+        raise exc.DisconnectionError()
+    finally:
+        cursor.close()
+
+
+def pool_stats(engine):
+    """
+    Get the statistics of the pool of engine
+    :param engine: sqlalchemy Engine
+    :returns dict with the stats, only the class name when the pool is not instrumented
+    """
+
+    stats = {'pool': engine.pool.__class__.__name__}
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        stats.update(engine.pool.stats())
+
+    return stats
+
+
+class ReservationSQLAlchemy(SQLAlchemy):
+    """
+    SQLAlchemy extension with the pool of the service set up from the app config:
+    SQLALCHEMY_POOL_SIZE, SQLALCHEMY_MAX_OVERFLOW, SQLALCHEMY_POOL_RECYCLE, SQLALCHEMY_POOL_TIMEOUT,
+    RS_DB_POOL_PRE_PING and RS_DB_STATEMENT_TIMEOUT
+    """
+
+    def apply_driver_hacks(self, app, info, options):
+        if info.drivername.startswith('postgresql'):
+            options['poolclass'] = InstrumentedQueuePool
+
+            statement_timeout = app.config.get('RS_DB_STATEMENT_TIMEOUT')
+            if statement_timeout:
+                options.setdefault('connect_args', {})['options'] = '-c statement_timeout={0}'.format(statement_timeout)
+
+        elif info.drivername == 'sqlite':
+            # sqlite connections can not be shared between threads, they do not use a queue pool
+            for option in POOL_OPTIONS:
+                options.pop(option, None)
+
+        super(ReservationSQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+    def get_engine(self, app, bind=None):
+        engine = super(ReservationSQLAlchemy, self).get_engine(app, bind)
+
+        # Pool listeners are kept when the pool is recreated, so the flag lives in the engine
+        if app.config.get('RS_DB_POOL_PRE_PING') and not getattr(engine, 'pre_ping', False):
+            with self._engine_lock:
+                if not getattr(engine, 'pre_ping', False):
+                    event.listen(engine.pool, 'checkout', ping_connection)
+                    engine.pre_ping = True
+
+        return engine
+
+    def create_replica_engine(self, app, uri):
+        """
+        Create the engine of a read replica with the same pool options as the primary one
+        :param app: Flask application
+        :param uri: String, database URI of the replica. Ie 'postgresql://reader@replica1/reservationservice'
+        """
+
+        info = make_url(uri)
+        options = {'convert_unicode': True}
+        self.apply_pool_defaults(app, options)
+        self.apply_driver_hacks(app, info, options)
+        engine = create_engine(info, **options)
+
+        if app.config.get('RS_DB_POOL_PRE_PING'):
+            event.listen(engine.pool, 'checkout', ping_connection)
+
+        return engine
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+class ReservationError(Exception):
+    """
+    Base error of the reservation operations that the client can act on
+    """
+
+
+class EventSoldOutError(ReservationError):
+    """
+    The event has not remaining capacity for the reservation
+    """
+
+    def __init__(self, event_id):
+        super(EventSoldOutError, self).__init__("Event {0} is sold out".format(event_id))
+        self.event_id = event_id
+
+
+class ReservationNotFoundError(ReservationError):
+    """
+    The reservation does not exist or is cancelled
+    """
+
+    def __init__(self, reservation_id):
+        super(ReservationNotFoundError, self).__init__("Reservation {0} does not exist".format(reservation_id))
+        self.reservation_id = reservation_id
+
+
+class ReservationVersionError(ReservationError):
+    """
+    The reservation was changed after the client read the version it sent
+    """
+
+    def __init__(self, reservation_id, version):
+        super(ReservationVersionError, self).__init__(
+            "Reservation {0} was changed, its current version is {1}".format(reservation_id, version))
+        self.reservation_id = reservation_id
+        self.version = version
+
+
+class ReservationExistsError(ReservationError):
+    """
+    The user already has a reservation of the event
+    """
+
+    def __init__(self, user_id, event_id):
+        super(ReservationExistsError, self).__init__(
+            "User {0} already has a reservation of event {1}".format(user_id, event_id))
+        self.user_id = user_id
+        self.event_id = event_id
+
+
+class EventCapacityNotFoundError(ReservationError):
+    """
+    The event has not a capacity row, its capacity is unlimited
+    """
+
+    def __init__(self, event_id):
+        super(EventCapacityNotFoundError, self).__init__("Event {0} has unlimited capacity".format(event_id))
+        self.event_id = event_id
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import pkgutil
+import zlib
+from cStringIO import StringIO
+from datetime import datetime
+from itertools import islice
+
+# Imported on the first arrow export, it takes longer to import than the rest of the service
+pyarrow = None
+
+EXPORT_FIELDS = ('id', 'user_id', 'event_id', 'create_date')
+
+# Mimetype of each export format
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+NDJSON_LINE = '{{"id": {0}, "user_id": {1}, "event_id": {2}, "create_date": "{3}"}}\n'
+
+
+def as_date(value):
+    """
+    create_date is a timestamp in the Postgres table, exports have only its day
+    """
+
+    return value.date() if isinstance(value, datetime) else value
+
+
+def export_formats():
+    """
+    Get the available export formats, arrow needs the optional pyarrow package
+    :returns tuple. Ie ('csv', 'ndjson')
+    """
+
+    arrow = pkgutil.find_loader('pyarrow') is not None
+    return tuple(sorted(name for name in MIMETYPES if name != 'arrow' or arrow))
+
+
+def load_pyarrow():
+    global pyarrow
+
+    if pyarrow is None:
+        import pyarrow as module
+        pyarrow = module
+
+    return pyarrow
+
+
+def chunked(rows, chunk_size):
+    """
+    Group an iterable of rows in lists of chunk_size rows
+    """
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ndjson_chunks(chunks):
+    for chunk in chunks:
+        yield ''.join(
+            NDJSON_LINE.format(json.dumps(row.id), row.user_id, row.event_id, as_date(row.create_date).isoformat())
+            for row in chunk
+        )
+
+
+def csv_chunks(chunks):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for chunk in chunks:
+        writer.writerows((row.id, row.user_id, row.event_id, as_date(row.create_date).isoformat()) for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # The header of an export without rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class ChunkSink(object):
+    """
+    File-like object keeping what pyarrow writes until it is taken
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def arrow_chunks(chunks):
+    """
+    Serialize the chunks as an Arrow IPC stream with one record batch by chunk
+    """
+
+    load_pyarrow()
+    schema = pyarrow.schema([
+        pyarrow.field('id', pyarrow.string()),
+        pyarrow.field('user_id', pyarrow.int32()),
+        pyarrow.field('event_id', pyarrow.int32()),
+        pyarrow.field('create_date', pyarrow.date32())
+    ])
+
+    sink = ChunkSink()
+    writer = pyarrow.RecordBatchStreamWriter(pyarrow.PythonFile(sink, mode='w'), schema)
+
+    for chunk in chunks:
+        ids, user_ids, event_ids, create_dates = zip(*chunk)
+        columns = (ids, user_ids, event_ids, [as_date(create_date) for create_date in create_dates])
+        batch = pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], list(EXPORT_FIELDS))
+        writer.write_batch(batch)
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+WRITERS = {
+    'ndjson': ndjson_chunks,
+    'csv': csv_chunks,
+    'arrow': arrow_chunks
+}
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compress a stream of chunks as one gzip member without holding it in memory
+    :param chunks: Iterable of strings
+    :param level: Int, zlib compression level. Ie 6
+    """
+
+    # wbits 16 + MAX_WBITS writes the gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def export_rows(rows, export_format, chunk_size, compress=False):
+    """
+    Serialize rows in export_format chunk by chunk
+    :param rows: Iterable of ReservationRow items, it is consumed lazily
+    :param export_format: String, one of export_formats(). Ie 'ndjson'
+    :param chunk_size: Int, rows serialized at once. Ie 10000
+    :param compress: Boolean, gzip the output
+    :returns generator of strings
+    """
+
+    chunks = WRITERS[export_format](chunked(rows, chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Objects built from the config of an application (cache, replicas, admission limiters, hot index, write-behind
+queue) are stored in its app.extensions, so each application of the process gets the ones of its own config.
+"""
+
+from flask import current_app
+
+
+def get_app_extension(name, lock, build):
+    """
+    Get the object of the current application stored under name, it is built on first use
+    :param name: String, key in app.extensions. Ie 'rs_reservation_cache'
+    :param lock: threading.Lock, serializes the builds so concurrent first uses share one object
+    :param build: Function receiving the Flask application and returning the object
+    :returns the object of the current application
+    """
+
+    app = current_app._get_current_object()
+    extension = app.extensions.get(name)
+
+    if extension is None:
+        with lock:
+            extension = app.extensions.get(name)
+            if extension is None:
+                extension = app.extensions[name] = build(app)
+
+    return extension
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Wake-up of the long polls of GET /reservation/changes. Writers notify the feed of their process after they
+commit changes, and on Postgres they also send NOTIFY reservation_changes in their transaction so a listener
+thread wakes up the long polls of every other process.
+"""
+
+import base64
+import select
+import threading
+import time
+
+NOTIFY_CHANNEL = 'reservation_changes'
+OFFSET_SEPARATOR = '|'
+
+# Types of the changes of the feed
+CHANGE_CREATED = 'created'
+CHANGE_UPDATED = 'updated'
+CHANGE_CANCELLED = 'cancelled'
+
+_reservation_feed = None
+_reservation_feed_lock = threading.Lock()
+
+
+def encode_offset(offset):
+    """
+    Build the opaque string sent to the consumers as the offset of a change
+    :param offset: Tuple, (tx_id, id) of a change. Ie (8123, 100345)
+    :returns String with the encoded offset or None when offset is empty
+    """
+
+    if not offset:
+        return None
+
+    tx_id, change_id = offset
+    return base64.urlsafe_b64encode(OFFSET_SEPARATOR.join([str(tx_id or 0), str(change_id)]))
+
+
+def decode_offset(offset):
+    """
+    Get the (tx_id, id) tuple from an offset sent by a consumer
+    :param offset: String, offset returned in a previous response. Ie 'ODEyM3wxMDAzNDU='
+    :returns Tuple (tx_id, id) or None when offset is empty
+    :raises ValueError when the offset is malformed
+    """
+
+    if not offset:
+        return None
+
+    try:
+        tx_id, change_id = base64.urlsafe_b64decode(str(offset)).split(OFFSET_SEPARATOR, 1)
+        return int(tx_id), int(change_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid offset {0}".format(offset))
+
+
+class ReservationFeed(object):
+    """
+    Sequence of the commits of changes seen by the process, long polls wait for it to move
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.listener = None
+        self.listener_lock = threading.Lock()
+
+    def notify(self):
+        """
+        Wake up the long polls, called after a commit with changes
+        """
+
+        with self.condition:
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def wait(self, sequence, timeout):
+        """
+        Wait until there are commits after sequence or timeout seconds pass
+        :param sequence: Int, sequence read before the last poll of the changes
+        :param timeout: Float, max seconds to wait. Ie 1
+        :returns Int, current sequence
+        """
+
+        with self.condition:
+            if self.sequence == sequence and timeout > 0:
+                self.condition.wait(timeout)
+            return self.sequence
+
+    def listen(self, engine, retry_interval=5):
+        """
+        Start the thread listening to the NOTIFY of the other processes, only on Postgres. It is started by the
+        first long poll, processes without consumers do not hold its connection
+        :param engine: Engine of the primary database
+        :param retry_interval: Int, seconds before listening again after an error. Ie 5
+        """
+
+        if engine.dialect.name != 'postgresql' or self.listener is not None:
+            return
+
+        with self.listener_lock:
+            if self.listener is None:
+                listener = threading.Thread(target=self.run_listener, args=(engine, retry_interval))
+                listener.daemon = True
+                listener.start()
+                self.listener = listener
+
+    def run_listener(self, engine, retry_interval):
+        while True:
+            dbapi_connection = None
+            try:
+                # The connection is detached from the pool, it is never given to a request
+                connection = engine.raw_connection()
+                connection.detach()
+                dbapi_connection = connection.connection
+                dbapi_connection.set_isolation_level(0)
+                dbapi_connection.cursor().execute('LISTEN {0}'.format(NOTIFY_CHANNEL))
+
+                while True:
+                    if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                        continue
+
+                    dbapi_connection.poll()
+                    if dbapi_connection.notifies:
+                        del dbapi_connection.notifies[:]
+                        self.notify()
+
+            except Exception, e:
+                print "Error listening to {0}. Detail error {1}".format(NOTIFY_CHANNEL, e)
+                if dbapi_connection is not None:
+                    try:
+                        dbapi_connection.close()
+                    except Exception:
+                        pass
+                # Long polls still see the changes of the other processes on their periodic polls
+                time.sleep(retry_interval)
+
+
+def get_reservation_feed():
+    """
+    Get the feed shared by all requests of the process, it is built on first use
+    :returns ReservationFeed
+    """
+
+    global _reservation_feed
+
+    if _reservation_feed is None:
+        with _reservation_feed_lock:
+            if _reservation_feed is None:
+                _reservation_feed = ReservationFeed()
+
+    return _reservation_feed
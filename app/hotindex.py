@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+In-memory index of the reservations of the events on sale. Each hot event keeps the sorted user ids of its
+reservations in an array of C ints (4 bytes by reservation), so membership checks are a binary search and counts
+a length, without a query. Writes of the process are applied when they commit, and the changes of the other
+processes are read from the change feed at most every RS_HOT_INDEX_MAX_LAG_MS (see HotEventController).
+"""
+
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from flask import has_app_context
+
+from reservationservice.app.extensions import get_app_extension
+from reservationservice.app.feed import CHANGE_CANCELLED, CHANGE_CREATED
+
+USER_IDS_TYPECODE = 'i'
+HOT_EVENT_INDEX_EXTENSION = 'rs_hot_event_index'
+
+_hot_event_index_lock = threading.Lock()
+
+
+class HotEventIndex(object):
+    """
+    Thread safe sorted arrays of user ids by event id, only for the events loaded with load
+    """
+
+    def __init__(self, max_lag=1.0, clock=time.time):
+        """
+        :param max_lag: Float, max seconds between reads of the change feed. Ie 1
+        :param clock: Function returning the current time in seconds
+        """
+
+        self.lock = threading.Lock()
+        self.events = {}
+        # (tx_id, id) of the last change of the feed applied, None until the first event is loaded
+        self.offset = None
+        self.max_lag = max_lag
+        self.clock = clock
+        self.refreshed = 0
+        self.refresh_lock = threading.Lock()
+
+    def hot_events(self):
+        with self.lock:
+            return sorted(self.events)
+
+    def is_hot(self, event_id):
+        with self.lock:
+            return event_id in self.events
+
+    def load(self, event_id, user_ids):
+        """
+        Replace the users of an event with the reservations read from the database
+        :param event_id: Int, event id. Ie 45
+        :param user_ids: Iterable of the user ids of its reservations, sorted and distinct. Ie [10, 34, 35]
+        """
+
+        users = array(USER_IDS_TYPECODE, user_ids)
+
+        with self.lock:
+            self.events[event_id] = users
+
+    def seek(self, offset):
+        """
+        :param offset: Tuple, (tx_id, id) of the change of the feed after which the next changes are applied
+        """
+
+        with self.lock:
+            self.offset = offset
+
+    def drop(self, event_id):
+        with self.lock:
+            self.events.pop(event_id, None)
+
+    def add(self, event_id, user_id):
+        """
+        Add the reservation of user_id, ignored if the event is not hot
+        """
+
+        with self.lock:
+            users = self.events.get(event_id)
+            if users is None:
+                return
+
+            position = bisect_left(users, user_id)
+            if position == len(users) or users[position] != user_id:
+                users.insert(position, user_id)
+
+    def remove(self, event_id, user_id):
+        """
+        Remove the reservation of user_id, ignored if the event is not hot
+        """
+
+        with self.lock:
+            users = self.events.get(event_id)
+            if users is None:
+                return
+
+            position = bisect_left(users, user_id)
+            if position < len(users) and users[position] == user_id:
+                users.pop(position)
+
+    def apply(self, changes, offset):
+        """
+        Apply changes read from the feed in their order
+        :param changes: List of items with type, user_id and event_id
+        :param offset: Tuple, (tx_id, id) of the last change
+        :returns Boolean, True when there are updates: they do not carry the previous event and user of the
+            reservation, so the hot events have to be loaded again
+        """
+
+        updated = False
+        for change in changes:
+            if change.type == CHANGE_CREATED:
+                self.add(change.event_id, change.user_id)
+            elif change.type == CHANGE_CANCELLED:
+                self.remove(change.event_id, change.user_id)
+            else:
+                updated = True
+
+        self.seek(offset)
+        return updated
+
+    def contains(self, event_id, user_id):
+        """
+        :returns Boolean, True if user_id has a reservation of the event, None if the event is not hot
+        """
+
+        with self.lock:
+            users = self.events.get(event_id)
+            if users is None:
+                return None
+
+            position = bisect_left(users, user_id)
+            return position < len(users) and users[position] == user_id
+
+    def count(self, event_id):
+        """
+        :returns Int, reservations of the event or None if the event is not hot
+        """
+
+        with self.lock:
+            users = self.events.get(event_id)
+            return len(users) if users is not None else None
+
+    def needs_refresh(self):
+        return self.clock() - self.refreshed >= self.max_lag
+
+    def mark_refreshed(self):
+        self.refreshed = self.clock()
+
+    def expire(self):
+        """
+        Read the change feed on the next lookup, called after the updates and cancellations of the process
+        """
+
+        self.refreshed = 0
+
+    def stats(self):
+        """
+        :returns dict with the reservations and bytes used by each hot event and in total.
+            Ie {'events': [{'event_id': 45, 'reservations': 1000, 'bytes': 4056}], 'reservations': 1000, 'bytes': 4056}
+        """
+
+        with self.lock:
+            events = [
+                {'event_id': event_id, 'reservations': len(users), 'bytes': sys.getsizeof(users)}
+                for event_id, users in sorted(self.events.iteritems())
+            ]
+
+        return {
+            'events': events,
+            'reservations': sum(event['reservations'] for event in events),
+            'bytes': sum(event['bytes'] for event in events)
+        }
+
+
+def get_hot_event_index():
+    """
+    Get the index shared by all requests of the application, it is built on first use from the app config
+    :returns HotEventIndex, an empty one without hot events when there is not an application context
+    """
+
+    if not has_app_context():
+        return HotEventIndex()
+
+    return get_app_extension(
+        HOT_EVENT_INDEX_EXTENSION, _hot_event_index_lock,
+        lambda app: HotEventIndex(max_lag=app.config['RS_HOT_INDEX_MAX_LAG_MS'] / 1000.0))
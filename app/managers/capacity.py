@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+
+from reservationservice.app.exceptions import EventCapacityNotFoundError
+from reservationservice.app.metrics import MANAGER_ERRORS, timed
+from reservationservice.app.models import EventCapacity, ReservationCounter
+from reservationservice.app import db
+
+
+class EventCapacityManager(object):
+    """
+    Contain methods to access to the capacity of the events.
+    Events without a capacity row have unlimited capacity.
+
+    Seats are taken with a conditional UPDATE of the event row, so concurrent reservations of
+    the same event wait only for the row lock of that event during their (short) transaction
+    and never read a stale remaining value.
+
+    Reservations of events without a capacity row lock the counter row of the event before they are
+    admitted as unlimited, and set_capacity locks it before it counts the reservations. A reservation
+    is then either counted by set_capacity or sees the capacity it set.
+    """
+
+    def __init__(self, auto_commit=True):
+        """
+        :param auto_commit: Boolean, auto commit (Transactions auto_commit = False)
+        """
+
+        self.auto_commit = auto_commit
+        self.db_session = db.session
+
+    def allocate(self, event_id, quantity=1):
+        """
+        Take quantity seats of the event if all of them are available, it does not commit
+        :param event_id: Int, event id. Ie 45
+        :param quantity: Int, seats to take. Ie 1
+        :returns Boolean, True if the seats were taken or the event has unlimited capacity
+        """
+
+        if self.take(event_id, quantity):
+            return True
+
+        # Only reached when the event is sold out or has not a capacity row, a capacity set meanwhile is
+        # committed once the counter is locked
+        self.lock_event_counter(event_id)
+        if self.capacity_query(event_id).count() == 0:
+            return True
+
+        return self.take(event_id, quantity)
+
+    def take(self, event_id, quantity):
+        """
+        :returns Boolean, True if quantity seats of the event were available and taken
+        """
+
+        return bool(self.capacity_query(event_id)
+                    .filter(EventCapacity.remaining >= quantity)
+                    .update({EventCapacity.remaining: EventCapacity.remaining - quantity}, synchronize_session=False))
+
+    def allocate_up_to(self, event_id, quantity):
+        """
+        Take as many seats of the event as available up to quantity, it does not commit
+        :param event_id: Int, event id. Ie 45
+        :param quantity: Int, seats wanted. Ie 30
+        :returns Int, seats taken
+        """
+
+        capacity = self.capacity_query(event_id).with_for_update().first()
+        if capacity is None:
+            self.lock_event_counter(event_id)
+            capacity = self.capacity_query(event_id).with_for_update().first()
+
+        if capacity is None:
+            return quantity
+
+        taken = min(quantity, capacity.remaining)
+        if taken:
+            self.capacity_query(event_id)\
+                .update({EventCapacity.remaining: EventCapacity.remaining - taken}, synchronize_session=False)
+
+        return taken
+
+    def release(self, event_id, quantity=1):
+        """
+        Give back quantity seats of the event, it does not commit
+        :param event_id: Int, event id. Ie 45
+        :param quantity: Int, seats to give back. Ie 1
+        """
+
+        if not quantity:
+            return
+
+        self.capacity_query(event_id).update(
+            {EventCapacity.remaining: case(
+                [(EventCapacity.remaining + quantity > EventCapacity.capacity, EventCapacity.capacity)],
+                else_=EventCapacity.remaining + quantity
+            )},
+            synchronize_session=False
+        )
+
+    def capacity_query(self, event_id):
+        return self.db_session.query(EventCapacity).filter(EventCapacity.event_id == event_id)
+
+    def lock_event_counter(self, event_id):
+        """
+        Lock the counter row of the event until the end of the transaction, it is inserted empty when the event
+        has not reservations yet so there is always a row to lock
+        :param event_id: Int, event id. Ie 45
+        """
+
+        counter = self.db_session.query(ReservationCounter.count).filter_by(kind='event_id', key_id=event_id)
+        if counter.with_for_update().first() is not None:
+            return
+
+        try:
+            with self.db_session.begin_nested():
+                # Version 0 is the version of an event without a counter, ETags of the event do not change
+                self.db_session.execute(ReservationCounter.__table__.insert().values(
+                    kind='event_id', key_id=event_id, count=0, version=0))
+        except IntegrityError:
+            # A concurrent transaction inserted it first, wait for it to end
+            counter.with_for_update().first()
+
+    @timed('manager')
+    def get(self, event_id):
+        """
+        Get the capacity of the event
+        :param event_id: Int, event id. Ie 45
+        :returns EventCapacity item or None on error
+        :raises EventCapacityNotFoundError when the event has unlimited capacity
+        """
+        try:
+            event_capacity = self.capacity_query(event_id).first()
+
+        except Exception, e:
+            error_message = "Error getting capacity of event {0}. Detail error {1}".format(event_id, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='get_capacity')
+            return None
+
+        if event_capacity is None:
+            raise EventCapacityNotFoundError(event_id)
+
+        return event_capacity
+
+    @timed('manager')
+    def set_capacity(self, event_id, capacity):
+        """
+        Set the capacity of the event, the remaining seats are the capacity minus the current reservations
+        :param event_id: Int, event id. Ie 45
+        :param capacity: Int, total seats of the event. Ie 500
+        :returns EventCapacity item
+        """
+        try:
+            event_capacity = self.capacity_query(event_id).with_for_update().first()
+
+            if event_capacity is None:
+                event_capacity = EventCapacity(event_id=event_id, capacity=capacity, remaining=capacity)
+                try:
+                    with self.db_session.begin_nested():
+                        self.db_session.add(event_capacity)
+                except IntegrityError:
+                    # A concurrent request set the capacity first
+                    event_capacity = self.capacity_query(event_id).with_for_update().one()
+
+            # Reservations admitted as unlimited before the capacity was set hold this lock until they commit
+            self.lock_event_counter(event_id)
+            reserved = self.db_session.query(ReservationCounter.count)\
+                .filter_by(kind='event_id', key_id=event_id)\
+                .scalar() or 0
+
+            event_capacity.capacity = capacity
+            event_capacity.remaining = max(capacity - reserved, 0)
+            self.db_session.flush()
+
+            if self.auto_commit:
+                self.db_session.commit()
+
+            return event_capacity
+
+        except Exception, e:
+            error_message = "Error setting capacity {0} of event {1}. Detail error {2}".format(capacity, event_id, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='set_capacity')
+            self.db_session.rollback()
+            return None
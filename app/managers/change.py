@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+
+from sqlalchemy import func, literal, literal_column, null, select, text, tuple_
+
+from reservationservice.app.feed import NOTIFY_CHANNEL
+from reservationservice.app.metrics import MANAGER_ERRORS, timed
+from reservationservice.app.models import Reservation, ReservationChange
+from reservationservice.app import db
+
+# Columns of the feed reads, rows are read without ORM hydration
+CHANGE_COLUMNS = [
+    ReservationChange.tx_id, ReservationChange.id, ReservationChange.type, ReservationChange.reservation_id,
+    ReservationChange.user_id, ReservationChange.event_id, ReservationChange.version, ReservationChange.create_date
+]
+
+
+class ReservationChangeManager(object):
+    """
+    Contain methods to access to the outbox of reservation changes.
+    Changes are written in the transaction of the reservation writes, so the feed never misses nor invents one.
+    On Postgres ids are taken when a change is written, not when it commits, so a transaction can commit a change
+    with a lower id after another one was read. Changes are read in (tx_id, id) order and only those of transactions
+    older than every running one, a consumer resuming from an offset never skips a late commit.
+    """
+
+    def __init__(self, auto_commit=True):
+        """
+        :param auto_commit: Boolean, auto commit (Transactions auto_commit = False)
+        """
+
+        self.auto_commit = auto_commit
+        self.db_session = db.session
+
+    def is_postgresql(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def record(self, change_type, condition):
+        """
+        Write a change of each reservation matching condition with its current values, it does not commit
+        :param change_type: String, 'created', 'updated' or 'cancelled'
+        :param condition: SQLAlchemy filter of the changed reservations. Ie Reservation.id.in_(['2h-34-jh-34'])
+        :returns Int, number of changes written
+        """
+
+        postgresql = self.is_postgresql()
+        changes = select([
+            literal_column('txid_current()') if postgresql else null(),
+            literal(change_type),
+            Reservation.id,
+            Reservation.user_id,
+            Reservation.event_id,
+            Reservation.version,
+            literal(datetime.utcnow(), db.DateTime)
+        ]).where(condition).order_by(Reservation.id)
+
+        recorded = self.db_session.execute(ReservationChange.__table__.insert().from_select(
+            ['tx_id', 'type', 'reservation_id', 'user_id', 'event_id', 'version', 'create_date'], changes
+        )).rowcount
+
+        if recorded and postgresql:
+            # Delivered on commit to the listeners of every process, repeated notifies of a transaction are merged
+            self.db_session.execute(text('NOTIFY {0}'.format(NOTIFY_CHANNEL)))
+
+        return recorded
+
+    @timed('manager')
+    def select(self, offset=None, limit=100):
+        """
+        Get the committed changes after offset in the order they are served
+        :param offset: Tuple, (tx_id, id) of the last change read or None from the start. Ie (8123, 100345)
+        :param limit: Int, max changes. Ie 100
+        :returns list of tuples with the CHANGE_COLUMNS values or None on error
+        """
+
+        try:
+            query = self.db_session.query(*CHANGE_COLUMNS)
+
+            if self.is_postgresql():
+                query = query.filter(
+                    ReservationChange.tx_id < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+                if offset:
+                    query = query.filter(tuple_(ReservationChange.tx_id, ReservationChange.id) > tuple_(*offset))
+                query = query.order_by(ReservationChange.tx_id, ReservationChange.id)
+            else:
+                if offset:
+                    query = query.filter(ReservationChange.id > offset[1])
+                query = query.order_by(ReservationChange.id)
+
+            changes = query.limit(limit).all()
+
+            # Long polls read many times, the connection goes back to the pool while they wait
+            self.db_session.rollback()
+            return changes
+
+        except Exception, e:
+            error_message = "Error selecting reservation changes after {0}. Detail error {1}".format(offset, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='select_changes')
+            self.db_session.rollback()
+            return None
+
+    def last_offset(self):
+        """
+        Get the offset of the last change served, readers starting from it only get the changes written after
+        :returns Tuple, (tx_id, id) of the change or (0, 0) when there are none, None on error
+        """
+
+        try:
+            query = self.db_session.query(ReservationChange.tx_id, ReservationChange.id)
+
+            if self.is_postgresql():
+                query = query.filter(
+                    ReservationChange.tx_id < func.txid_snapshot_xmin(func.txid_current_snapshot()))\
+                    .order_by(ReservationChange.tx_id.desc(), ReservationChange.id.desc())
+            else:
+                query = query.order_by(ReservationChange.id.desc())
+
+            last = query.first()
+            return tuple(last) if last else (0, 0)
+
+        except Exception, e:
+            error_message = "Error getting the last reservation change. Detail error {0}".format(e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='last_change_offset')
+            self.db_session.rollback()
+            return None
+
+    def purge(self, older_than):
+        """
+        Delete the changes written before older_than
+        :param older_than: Datetime, changes written before are deleted. Ie datetime(2019, 4, 1)
+        :returns Int, number of changes deleted
+        """
+
+        deleted = self.db_session.query(ReservationChange)\
+            .filter(ReservationChange.create_date < older_than)\
+            .delete(synchronize_session=False)
+
+        if self.auto_commit:
+            self.db_session.commit()
+
+        return deleted
+
+    def listen(self, feed):
+        """
+        Start the listener of the NOTIFY of the other processes of feed on the primary database
+        :param feed: ReservationFeed
+        """
+
+        feed.listen(db.engine)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from sqlalchemy import func, literal, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from reservationservice.app.metrics import MANAGER_ERRORS, timed
+from reservationservice.app.models import Reservation, ReservationCounter
+from reservationservice.app import db
+
+COUNTER_KINDS = ('user_id', 'event_id')
+
+
+class ReservationCounterManager(object):
+    """
+    Contain methods to access to the reservation counts by user and by event.
+    Counts are updated in the transaction of the reservation writes, so they never drift from them,
+    and each update bumps the version of the counter.
+    """
+
+    def __init__(self, auto_commit=True):
+        """
+        :param auto_commit: Boolean, auto commit (Transactions auto_commit = False)
+        """
+
+        self.auto_commit = auto_commit
+        self.db_session = db.session
+
+    def increment(self, reservations, amount=1):
+        """
+        Add amount to the counts of the users and events of reservations, it does not commit
+        :param reservations: List of dicts or items with user_id and event_id. Ie [{'user_id': 34, 'event_id': 45}]
+        :param amount: Int, value added to each reservation. Ie -1 for cancellations
+        """
+
+        self.apply([(reservation, amount) for reservation in reservations])
+
+    def apply(self, changes):
+        """
+        Add the amount of each reservation to the counts of its user and event, it does not commit
+        :param changes: List of (reservation, amount), reservations are dicts or items with user_id and event_id.
+            Ie [({'user_id': 34, 'event_id': 45}, -1), ({'user_id': 34, 'event_id': 46}, 1)]
+        """
+
+        amounts = defaultdict(int)
+        for reservation, amount in changes:
+            for kind in COUNTER_KINDS:
+                key_id = reservation[kind] if isinstance(reservation, dict) else getattr(reservation, kind)
+                amounts[(kind, key_id)] += amount
+
+        # Same lock order in every transaction to avoid deadlocks between concurrent writes
+        for (kind, key_id), key_amount in sorted(amounts.items()):
+            self.add(kind, key_id, key_amount)
+
+    def add(self, kind, key_id, amount):
+        """
+        Add amount to one count and bump its version with a single UPDATE, the row is inserted the first time
+        :param kind: String, 'user_id' or 'event_id'
+        :param key_id: Int, user or event id. Ie 45
+        :param amount: Int, value added. Ie 1
+        """
+
+        values = {ReservationCounter.count: ReservationCounter.count + amount,
+                  ReservationCounter.version: ReservationCounter.version + 1}
+
+        updated = self.counter_query(kind, key_id).update(values, synchronize_session=False)
+
+        if updated:
+            return
+
+        try:
+            with self.db_session.begin_nested():
+                self.db_session.add(ReservationCounter(kind=kind, key_id=key_id, count=amount, version=1))
+        except IntegrityError:
+            # A concurrent transaction inserted the row first
+            self.counter_query(kind, key_id).update(values, synchronize_session=False)
+
+    def subtract_event(self, event_id, cancelled, update_date):
+        """
+        Take the reservations of event_id cancelled at update_date out of the counts with one UPDATE
+        for the event and one for all its users, it does not commit
+        :param event_id: Int, event id. Ie 45
+        :param cancelled: Int, number of cancelled reservations. Ie 12000
+        :param update_date: Datetime, stamp of the cancelled reservations
+        """
+
+        self.add('event_id', event_id, -cancelled)
+
+        cancelled_reservations = self.db_session.query(Reservation.user_id)\
+            .filter(Reservation.event_id == event_id, Reservation.cancelled.is_(True),
+                    Reservation.update_date == update_date)
+        cancelled_by_user = self.db_session.query(func.count(Reservation.id))\
+            .filter(Reservation.event_id == event_id, Reservation.cancelled.is_(True),
+                    Reservation.update_date == update_date, Reservation.user_id == ReservationCounter.key_id)\
+            .as_scalar()
+
+        self.db_session.query(ReservationCounter)\
+            .filter(ReservationCounter.kind == 'user_id',
+                    ReservationCounter.key_id.in_(cancelled_reservations.subquery()))\
+            .update({ReservationCounter.count: ReservationCounter.count - cancelled_by_user,
+                     ReservationCounter.version: ReservationCounter.version + 1},
+                    synchronize_session=False)
+
+    def counter_query(self, kind, key_id):
+        return self.db_session.query(ReservationCounter).filter_by(kind=kind, key_id=key_id)
+
+    @timed('manager')
+    def get_counts(self, kind, key_ids):
+        """
+        Get the counts of many users or events
+        :param kind: String, 'user_id' or 'event_id'
+        :param key_ids: List, user or event ids. Ie [45, 46]
+        :returns dict with the count of each key, 0 for keys without reservations. Ie {45: 120, 46: 0}
+        """
+        counts = dict((key_id, 0) for key_id in key_ids)
+
+        try:
+            counters = self.db_session.query(ReservationCounter.key_id, ReservationCounter.count)\
+                .filter(ReservationCounter.kind == kind, ReservationCounter.key_id.in_(key_ids))
+
+            counts.update(counters)
+            return counts
+
+        except Exception, e:
+            error_message = "Error getting {0} counts of {1}. Detail error {2}".format(kind, key_ids, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='get_counts')
+            return None
+
+    def get_versions(self, keys, session=None):
+        """
+        Get the versions of the counters of users and events with one indexed lookup
+        :param keys: List of (kind, key_id). Ie [('user_id', 24), ('event_id', 45)]
+        :param session: Session of the query, the primary one by default. Ie the session of a replica read
+        :returns dict with the version of each key, 0 for keys without reservations. Ie {('user_id', 24): 7}
+        """
+        versions = dict((key, 0) for key in keys)
+
+        counters = (session or self.db_session).query(ReservationCounter.kind, ReservationCounter.key_id, ReservationCounter.version)\
+            .filter(tuple_(ReservationCounter.kind, ReservationCounter.key_id).in_(keys))
+
+        for kind, key_id, version in counters:
+            versions[(kind, key_id)] = version
+
+        return versions
+
+    def rebuild(self):
+        """
+        Recompute all counts from the not cancelled reservations. Counter rows are updated in place and all
+        versions are bumped, so a version never goes back to a value that identified other reservations
+        :returns dict with the number of counters of each kind. Ie {'user_id': 1000, 'event_id': 30}
+        """
+        rebuilt = {}
+
+        for kind in COUNTER_KINDS:
+            column = getattr(Reservation, kind)
+            counters = self.db_session.query(ReservationCounter).filter(ReservationCounter.kind == kind)
+
+            current_count = self.db_session.query(func.count(Reservation.id))\
+                .filter(column == ReservationCounter.key_id, Reservation.cancelled.is_(False))\
+                .as_scalar()
+            counters.update(
+                {ReservationCounter.count: current_count, ReservationCounter.version: ReservationCounter.version + 1},
+                synchronize_session=False
+            )
+
+            existing_keys = self.db_session.query(ReservationCounter.key_id).filter(ReservationCounter.kind == kind)
+            missing_counts = self.db_session.query(literal(kind), column, func.count(), literal(1))\
+                .filter(~column.in_(existing_keys.subquery()), Reservation.cancelled.is_(False))\
+                .group_by(column)
+
+            insert = ReservationCounter.__table__.insert()\
+                .from_select(['kind', 'key_id', 'count', 'version'], missing_counts.statement)
+            self.db_session.execute(insert)
+
+            rebuilt[kind] = counters.count()
+
+        if self.auto_commit:
+            self.db_session.commit()
+
+        return rebuilt
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from sqlalchemy import text
+
+from reservationservice.app import db
+
+PARENT_TABLE = 'reservations'
+DEFAULT_PARTITION = 'reservations_default'
+PARTITION_PREFIX = 'reservations_p'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    """
+    :param month: Date, first day of a month. Ie date(2026, 11, 1)
+    :param months: Int, months to add, negative to subtract. Ie 3
+    :returns Date, first day of the resulting month. Ie date(2027, 2, 1)
+    """
+
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return '{0}{1:%Y%m}'.format(PARTITION_PREFIX, month)
+
+
+def partition_month(name):
+    """
+    :param name: String, name of a monthly partition. Ie 'reservations_p202611'
+    :returns Date, first day of its month or None if it is not a monthly partition
+    """
+
+    suffix = name[len(PARTITION_PREFIX):]
+    if not name.startswith(PARTITION_PREFIX) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+class ReservationPartitionManager(object):
+    """
+    Maintenance of the monthly range partitions of the reservations table (Postgres only).
+    Partitions are created ahead of time so inserts never land in the default partition,
+    and partitions older than the retention are detached and moved to the archive schema.
+    """
+
+    def __init__(self):
+        self.db_session = db.session
+
+    def list_partitions(self):
+        """
+        Get the monthly partitions attached to the reservations table
+        :returns list of (month, name) sorted by month. Ie [(date(2026, 10, 1), 'reservations_p202610')]
+        """
+
+        names = self.db_session.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+        ), {'parent': PARENT_TABLE}).fetchall()
+
+        return sorted((partition_month(name), name) for name, in names if partition_month(name) is not None)
+
+    def create_partitions(self, months_ahead, today=None):
+        """
+        Create the partitions of the current month and of the next months_ahead months that do not exist.
+        Rows of those months already stored in the default partition are moved to the new partition.
+        :param months_ahead: Int, future months to create. Ie 3
+        :param today: Date, reference day, today by default
+        :returns list of the names of the created partitions
+        """
+
+        current_month = month_start(today or date.today())
+        existing = set(name for _, name in self.list_partitions())
+        created = []
+
+        for offset in xrange(months_ahead + 1):
+            month = add_months(current_month, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+
+            self.create_partition(month, name)
+            self.db_session.commit()
+            created.append(name)
+
+        return created
+
+    def create_partition(self, month, name):
+        """
+        Create the partition detached, fill it with the rows of its month stored in the default
+        partition and attach it, so the attach never fails because the default partition has them
+        """
+
+        bounds = {'start': month, 'end': add_months(month, 1)}
+
+        self.db_session.execute(
+            'CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name, PARENT_TABLE))
+        self.db_session.execute(text(
+            'INSERT INTO {0} SELECT * FROM {1} WHERE create_date >= :start AND create_date < :end'
+            .format(name, DEFAULT_PARTITION)
+        ), bounds)
+        self.db_session.execute(text(
+            'DELETE FROM {0} WHERE create_date >= :start AND create_date < :end'.format(DEFAULT_PARTITION)
+        ), bounds)
+        self.db_session.execute(
+            "ALTER TABLE {0} ATTACH PARTITION {1} FOR VALUES FROM ('{2:%Y-%m-%d}') TO ('{3:%Y-%m-%d}')"
+            .format(PARENT_TABLE, name, bounds['start'], bounds['end'])
+        )
+
+    def archive_partitions(self, retention_months, archive_schema, today=None):
+        """
+        Detach the partitions of the months before the retention window and move them to archive_schema.
+        Their not cancelled reservations leave the user and event counts, and their (user_id, event_id)
+        pairs can be reserved again.
+        :param retention_months: Int, months kept attached including the current one. Ie 24
+        :param archive_schema: String, schema of the detached partitions. Ie 'reservations_archive'
+        :param today: Date, reference day, today by default
+        :returns list of the names of the archived partitions
+        """
+
+        oldest_month = add_months(month_start(today or date.today()), 1 - retention_months)
+        archived = []
+
+        for month, name in self.list_partitions():
+            if month >= oldest_month:
+                break
+
+            self.archive_partition(name, archive_schema)
+            self.db_session.commit()
+            archived.append(name)
+
+        return archived
+
+    def archive_partition(self, name, archive_schema):
+        self.db_session.execute('ALTER TABLE {0} DETACH PARTITION {1}'.format(PARENT_TABLE, name))
+
+        for kind in ('user_id', 'event_id'):
+            self.db_session.execute(
+                "UPDATE reservation_counters SET count = reservation_counters.count - archived.count, "
+                "version = reservation_counters.version + 1 "
+                "FROM (SELECT {0} AS key_id, count(*) AS count FROM {1} WHERE NOT cancelled GROUP BY {0}) archived "
+                "WHERE reservation_counters.kind = '{0}' AND reservation_counters.key_id = archived.key_id"
+                .format(kind, name)
+            )
+
+        self.db_session.execute(
+            'DELETE FROM reservation_pairs USING {0} archived '
+            'WHERE reservation_pairs.user_id = archived.user_id AND reservation_pairs.event_id = archived.event_id'
+            .format(name)
+        )
+
+        self.db_session.execute('CREATE SCHEMA IF NOT EXISTS {0}'.format(archive_schema))
+        self.db_session.execute('ALTER TABLE {0} SET SCHEMA {1}'.format(name, archive_schema))
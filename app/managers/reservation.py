@@ -1,32 +1,122 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from reservationservice.app.models import Reservation
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import Date, and_, cast, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from reservationservice.app.cache import cache_key, cache_tags, get_reservation_cache, reservation_tags
+from reservationservice.app.exceptions import (
+    EventSoldOutError, ReservationError, ReservationExistsError, ReservationNotFoundError, ReservationVersionError
+)
+from reservationservice.app.ids import is_valid_id, uuid7
+from reservationservice.app.feed import CHANGE_CANCELLED, CHANGE_CREATED, CHANGE_UPDATED, get_reservation_feed
+from reservationservice.app.hotindex import get_hot_event_index
+from reservationservice.app.managers.capacity import EventCapacityManager
+from reservationservice.app.managers.change import ReservationChangeManager
+from reservationservice.app.managers.counter import ReservationCounterManager
+from reservationservice.app.metrics import MANAGER_ERRORS, timed
+from reservationservice.app.models import IdempotencyKey, Reservation, ReservationRow
+from reservationservice.app.replicas import get_replica_router, mark_write
 from reservationservice.app import db
 
+# Columns of list reads, in the order of ReservationRow fields
+LIST_COLUMNS = [getattr(Reservation, field) for field in ReservationRow._fields]
+
+# Filters of a create_date range, both days included, the other filters are equalities
+DATE_RANGE_FILTERS = ('create_date_from', 'create_date_to')
+
+# Error of the items of a bulk creation that failed because of the database, they can be retried
+BULK_ERROR_MESSAGE = 'Error creating reservation'
+
+
+def day_start(day):
+    """
+    :param day: Date, day of a create_date filter. Ie date(2019, 4, 1)
+    :returns Datetime, midnight of the day, create_date is a timestamp
+    """
+
+    return datetime.combine(day, time())
+
+
 class ReservationManager(object):
     """
     Contain methods to access to data related to Reservation Model
     """
 
-    def __init__(self, auto_commit=True):
+    def __init__(self, auto_commit=True, cache=None, replicas=None):
         """
         Autocommit and db session defaul values.
         For manage transactions auto_commit should be equal = False
         :param auto_commit: Boolean, auto commit (Transactions auto_commit = False)
+        :param cache: cache backend of get and select reads, the process cache set up in RS_CACHE_BACKEND by default
+        :param replicas: ReplicaRouter of get and select reads, the process router set up in RS_DB_REPLICA_URIS by default
         """
 
         self.auto_commit = auto_commit
         self.db_session = db.session
+        self._cache = cache
+        self._replicas = replicas
+        self.counters = ReservationCounterManager(auto_commit=False)
+        self.capacities = EventCapacityManager(auto_commit=False)
+        self.changes = ReservationChangeManager(auto_commit=False)
+
+    @property
+    def cache(self):
+        """
+        Cache backend of reads, resolved on use so long-lived managers can be built before the app is set up
+        """
+
+        return self._cache if self._cache is not None else get_reservation_cache()
+
+    @property
+    def replicas(self):
+        """
+        Router of reads to the read replicas, resolved on use like the cache
+        """
+
+        return self._replicas if self._replicas is not None else get_replica_router()
 
+    def read(self, read, primary=False):
+        """
+        Run read(session) on a read replica. Managers in a transaction (auto_commit = False) read from the primary
+        to see their own writes.
+        :param primary: Boolean, force the primary. Ie reads that must be as new as the counters of an ETag
+        """
+
+        return self.replicas.read(read, self.db_session, primary=primary or not self.auto_commit)
+
+    def get_cached(self, key):
+        """
+        Get a cached read, clients pinned to the primary after a write skip the cache because a lagging
+        replica may have cached the rows they have just changed
+        """
+
+        if self.replicas.pinned():
+            return None
+
+        return self.cache.get(key)
+
+    @timed('manager')
     def get(self, filters):
         """
         Get first reservation match with filters
         :param filters: Dictionary, filters of itme wants to get. Ie {'id': '2h-34-jh-34'}
         :returns Reservation item object that mathc with the filters
         """
+        key = cache_key('get', filters)
+        cached_row = self.get_cached(key)
+        if cached_row is not None:
+            # An empty row is a cached "not found"
+            return Reservation(**cached_row) if cached_row else None
+
         try:
-            reservation =  self.db_session.query(Reservation).filter_by(**filters).first()
+            reservation = self.read(
+                lambda session: session.query(Reservation).filter_by(cancelled=False, **filters).first())
+            self.cache.set(key, self.to_row(reservation) if reservation else {}, cache_tags(filters))
+
             if not reservation:
                 return None
 
@@ -35,47 +125,958 @@ class ReservationManager(object):
         except Exception, e:
             error_message = "Error getting reservation by filters {0}. Detail error {1}".format(filters, e.message)
             print error_message
+            MANAGER_ERRORS.inc(operation='get')
             return None
 
-    def create(self, data):
+    @timed('manager')
+    def create(self, data, idempotency_key=None):
         """
-        create reservation item
+        create reservation item. Retries with the same idempotency key or the same (user_id, event_id)
+        get the reservation already created without writing it again
         :param data: Dictionary with the data to create. Ie {'user_id': 34, 'event_id': 45}
+        :param idempotency_key: String, key sent by the client to identify retries. Ie '6f1c0b7e-3c0e-4d8a'
+        :raises EventSoldOutError when the event has not remaining capacity
         """
         try:
+            if idempotency_key:
+                reservation = self.get_by_idempotency_key(idempotency_key)
+                if reservation:
+                    return reservation
+
             attributes_to_create = ('user_id', 'event_id')
             create_dict = {}
 
             for attribute in attributes_to_create:
                 create_dict[attribute] = data[attribute]
 
-            reservation = Reservation(**create_dict)
+            reservation, created = self.insert_or_get(create_dict)
+            if created:
+                # The seat is taken after the insert so retries of an existing reservation never need one
+                if not self.capacities.allocate(reservation.event_id):
+                    raise EventSoldOutError(reservation.event_id)
+
+                self.counters.increment([reservation])
+                self.changes.record(CHANGE_CREATED, Reservation.id == reservation.id)
 
-            self.db_session.add(reservation)
-            self.db_session.flush()
+            if idempotency_key:
+                self.save_idempotency_key(idempotency_key, reservation.id)
 
             if self.auto_commit:
                 self.db_session.commit()
 
+            if created:
+                # A reactivated reservation keeps its id, reads of the id cached it as cancelled
+                self.invalidate_rows(
+                    [{'id': reservation.id, 'user_id': reservation.user_id, 'event_id': reservation.event_id}])
+                mark_write()
+                get_reservation_feed().notify()
+                self.index_created([reservation])
+
             return reservation
 
+        except EventSoldOutError:
+            self.db_session.rollback()
+            raise
+
         except Exception, e:
             error_message = "Error creating reservation by data {0}. Detail error {1}".format(data, e.message)
             print error_message
+            MANAGER_ERRORS.inc(operation='create')
+            self.db_session.rollback()
+            return None
+
+    def insert_or_get(self, create_dict):
+        """
+        Insert a reservation unless its (user_id, event_id) already exists
+        :param create_dict: Dictionary with the data to create. Ie {'user_id': 34, 'event_id': 45}
+        :returns tuple with the Reservation item and True if it was inserted or reactivated
+        """
+        reservation = self.db_session.query(Reservation).filter_by(**create_dict).first()
+        if reservation and reservation.cancelled:
+            return reservation, self.reactivate(reservation)
+        if reservation:
+            return reservation, False
+
+        reservation = Reservation(**create_dict)
+
+        try:
+            with self.db_session.begin_nested():
+                self.db_session.add(reservation)
+        except IntegrityError:
+            # A concurrent request inserted the same (user_id, event_id) after our check
+            return self.db_session.query(Reservation).filter_by(**create_dict).one(), False
+
+        return reservation, True
+
+    def reactivate(self, reservation):
+        """
+        Book again a cancelled reservation, it keeps its id so the (user_id, event_id) pair stays unique
+        :param reservation: Reservation item, cancelled
+        :returns Boolean, False if a concurrent request changed it first
+        """
+        reactivated = self.versioned_query(reservation.id, reservation.version)\
+            .filter(Reservation.cancelled.is_(True))\
+            .update(self.change_values(cancelled=False), synchronize_session=False)
+
+        self.db_session.expire(reservation)
+        return bool(reactivated)
+
+    def versioned_query(self, reservation_id, version):
+        """
+        Query of the reservation only while it has the version read by the client, an UPDATE
+        through it changes no row if a concurrent write changed the reservation first
+        """
+        return self.db_session.query(Reservation)\
+            .filter(Reservation.id == reservation_id, Reservation.version == version)
+
+    def change_values(self, **values):
+        """
+        Values of an UPDATE of reservations with the version bumped and update_date stamped
+        :param values: Columns changed. Ie {'cancelled': True}
+        """
+        values.setdefault('update_date', datetime.utcnow())
+        values['version'] = Reservation.version + 1
+        return values
+
+    def get_by_idempotency_key(self, idempotency_key):
+        """
+        Get the reservation created by the first request sent with idempotency_key
+        :param idempotency_key: String, key sent by the client to identify retries. Ie '6f1c0b7e-3c0e-4d8a'
+        :returns Reservation item or None if the key was not used
+        """
+        return self.db_session.query(Reservation)\
+            .join(IdempotencyKey, IdempotencyKey.reservation_id == Reservation.id)\
+            .filter(IdempotencyKey.key == idempotency_key)\
+            .first()
+
+    def save_idempotency_key(self, idempotency_key, reservation_id):
+        """
+        Save the reservation created by the request sent with idempotency_key
+        :param idempotency_key: String, key sent by the client to identify retries. Ie '6f1c0b7e-3c0e-4d8a'
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        """
+        try:
+            with self.db_session.begin_nested():
+                self.db_session.add(IdempotencyKey(key=idempotency_key, reservation_id=reservation_id))
+        except IntegrityError:
+            # A concurrent retry saved the key first
+            pass
+
+    def purge_idempotency_keys(self, older_than):
+        """
+        Delete the idempotency keys created before older_than
+        :param older_than: Datetime, keys created before are deleted. Ie datetime(2019, 4, 1)
+        :returns Int, number of keys deleted
+        """
+        deleted = self.db_session.query(IdempotencyKey)\
+            .filter(IdempotencyKey.create_date < older_than)\
+            .delete(synchronize_session=False)
+
+        if self.auto_commit:
+            self.db_session.commit()
+
+        return deleted
+
+    @timed('manager')
+    def bulk_create(self, items, preassigned=False):
+        """
+        create many reservation items with a single multi-row insert and a single commit
+        :param items: List of dictionaries with the data to create. Ie [{'user_id': 34, 'event_id': 45}]
+        :param preassigned: Boolean, items already have their id and create_date (reservations accepted by the
+            write-behind queue), they are not generated
+        :returns tuple with the list of created Reservation items and the list of errors of rejected items.
+            Ie [{'index': 3, 'message': 'user_id is required and must be an integer'}]
+        """
+        rows, errors = self.validate_bulk_items(items, preassigned)
+
+        if not rows:
+            return [], errors
+
+        try:
+            rows, cancelled_ids = self.exclude_existing_rows(rows, errors, reactivate=not preassigned)
+            rows, seats = self.allocate_rows(rows, errors)
+            if not rows:
+                self.db_session.rollback()
+                errors.sort(key=lambda error: error['index'])
+                return [], errors
+
+            reactivated_rows = [(index, row) for index, row in rows if row['id'] in cancelled_ids]
+            new_rows = [(index, row) for index, row in rows if row['id'] not in cancelled_ids]
+            self.reactivate_rows([row['id'] for _, row in reactivated_rows])
+
+            try:
+                if new_rows:
+                    with self.db_session.begin_nested():
+                        self.db_session.execute(Reservation.__table__.insert().values([row for _, row in new_rows]))
+            except IntegrityError:
+                # A concurrent request created some of the pairs after our check, insert the rows one by one
+                new_rows = self.insert_rows_one_by_one(new_rows, errors)
+                rows = sorted(reactivated_rows + new_rows, key=lambda item: item[0])
+                self.release_unused_seats(rows, seats)
+
+            self.counters.increment([row for _, row in rows])
+            if rows:
+                self.changes.record(CHANGE_CREATED, Reservation.id.in_([row['id'] for _, row in rows]))
+
+            if self.auto_commit:
+                self.db_session.commit()
+
+            self.invalidate_rows([row for _, row in rows])
+            if rows:
+                mark_write()
+                get_reservation_feed().notify()
+                self.index_created([row for _, row in rows])
+
+            errors.sort(key=lambda error: error['index'])
+            return [Reservation(**row) for _, row in rows], errors
+
+        except Exception, e:
+            error_message = "Error creating reservations by data {0}. Detail error {1}".format(items, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='bulk_create')
+            self.db_session.rollback()
+            errors.extend({'index': index, 'message': BULK_ERROR_MESSAGE} for index, _ in rows)
+            errors.sort(key=lambda error: error['index'])
+            return [], errors
+
+    def validate_bulk_items(self, items, preassigned=False):
+        """
+        Build the rows to insert from the items of a bulk creation
+        :param items: List of dictionaries with the data to create. Ie [{'user_id': 34, 'event_id': 45}]
+        :param preassigned: Boolean, use the id and create_date of the items
+        :returns tuple with the list of (index, row) to insert and the list of errors of invalid items
+        """
+        rows, errors = [], []
+        pairs = set()
+        create_date = datetime.utcnow()
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'message': 'item must be an object'})
+                continue
+
+            invalid_attributes = [
+                attribute for attribute in ('user_id', 'event_id')
+                if isinstance(item.get(attribute), bool) or not isinstance(item.get(attribute), (int, long))
+            ]
+            if invalid_attributes:
+                message = '{0} is required and must be an integer'.format(', '.join(invalid_attributes))
+                errors.append({'index': index, 'message': message})
+                continue
+
+            pair = (item['user_id'], item['event_id'])
+            if pair in pairs:
+                errors.append({'index': index, 'message': 'reservation is duplicated in the batch'})
+                continue
+
+            pairs.add(pair)
+            rows.append((index, {
+                'id': item['id'] if preassigned else uuid7(),
+                'user_id': item['user_id'],
+                'event_id': item['event_id'],
+                'create_date': item['create_date'] if preassigned else create_date
+            }))
+
+        return rows, errors
+
+    def exclude_existing_rows(self, rows, errors, reactivate=True):
+        """
+        Remove the rows whose (user_id, event_id) reservation already exists. Rows of a cancelled reservation
+        take its id and create_date to book it again
+        :param rows: List of (index, row) to insert
+        :param errors: List, errors of the bulk creation, an error is added for each existing reservation
+        :param reactivate: Boolean, book cancelled reservations again instead of rejecting their rows
+        :returns tuple with the list of (index, row) to write and the set of ids of the cancelled reservations
+        """
+        pairs = [(row['user_id'], row['event_id']) for _, row in rows]
+        existing = dict(
+            ((user_id, event_id), (reservation_id, create_date, cancelled))
+            for user_id, event_id, reservation_id, create_date, cancelled in
+            self.db_session.query(Reservation.user_id, Reservation.event_id, Reservation.id,
+                                  Reservation.create_date, Reservation.cancelled)
+            .filter(tuple_(Reservation.user_id, Reservation.event_id).in_(pairs))
+        )
+
+        new_rows, cancelled_ids = [], set()
+        for index, row in rows:
+            pair = (row['user_id'], row['event_id'])
+            if pair not in existing:
+                new_rows.append((index, row))
+                continue
+
+            reservation_id, create_date, cancelled = existing[pair]
+            if cancelled and reactivate:
+                new_rows.append((index, dict(row, id=reservation_id, create_date=create_date)))
+                cancelled_ids.add(reservation_id)
+            else:
+                errors.append({'index': index, 'message': 'reservation already exists'})
+
+        return new_rows, cancelled_ids
+
+    def reactivate_rows(self, reservation_ids):
+        """
+        Book again cancelled reservations with a single UPDATE
+        :param reservation_ids: List, ids of cancelled reservations. Ie ['2h-34-jh-34']
+        """
+        if not reservation_ids:
+            return
+
+        reactivated = self.db_session.query(Reservation)\
+            .filter(Reservation.id.in_(reservation_ids), Reservation.cancelled.is_(True))\
+            .update(self.change_values(cancelled=False), synchronize_session=False)
+
+        if reactivated != len(reservation_ids):
+            # A concurrent request booked or changed them first, the whole batch can be retried
+            raise ReservationError('Cancelled reservations changed while they were booked again')
+
+    def allocate_rows(self, rows, errors):
+        """
+        Take the seats of the rows of each event, rows beyond the remaining capacity of their event are rejected
+        :param rows: List of (index, row) to insert
+        :param errors: List, errors of the bulk creation, an error is added for each rejected row
+        :returns tuple with the list of (index, row) to insert and the dict of seats taken by event_id
+        """
+        rows_by_event = defaultdict(list)
+        for index, row in rows:
+            rows_by_event[row['event_id']].append((index, row))
+
+        allocated_rows, seats = [], {}
+
+        # Same lock order in every transaction to avoid deadlocks between concurrent writes
+        for event_id in sorted(rows_by_event):
+            event_rows = rows_by_event[event_id]
+            seats[event_id] = self.capacities.allocate_up_to(event_id, len(event_rows))
+
+            allocated_rows.extend(event_rows[:seats[event_id]])
+            errors.extend({'index': index, 'message': 'event is sold out'} for index, _ in event_rows[seats[event_id]:])
+
+        allocated_rows.sort(key=lambda item: item[0])
+        return allocated_rows, seats
+
+    def release_unused_seats(self, rows, seats):
+        """
+        Give back the seats taken for rows that were not inserted
+        :param rows: List of (index, row) inserted
+        :param seats: Dict, seats taken by event_id. Ie {45: 3}
+        """
+        inserted = defaultdict(int)
+        for _, row in rows:
+            inserted[row['event_id']] += 1
+
+        for event_id in sorted(seats):
+            self.capacities.release(event_id, seats[event_id] - inserted[event_id])
+
+    def get_existing_ids(self, reservation_ids):
+        """
+        Get which of the reservation ids are stored, reads the database without the cache
+        :param reservation_ids: List, reservation ids. Ie ['2h-34-jh-34', '2h-34-jh-35']
+        :returns set of the stored ids. Ie set(['2h-34-jh-34'])
+        """
+        if not reservation_ids:
+            return set()
+
+        return set(
+            reservation_id for reservation_id, in
+            self.db_session.query(Reservation.id).filter(Reservation.id.in_(reservation_ids))
+        )
+
+    def insert_rows_one_by_one(self, rows, errors):
+        """
+        Insert each row in its own savepoint so a conflicting row does not abort the others
+        :param rows: List of (index, row) to insert
+        :param errors: List, errors of the bulk creation, an error is added for each conflicting row
+        :returns list of (index, row) inserted
+        """
+        inserted_rows = []
+
+        for index, row in rows:
+            try:
+                with self.db_session.begin_nested():
+                    self.db_session.execute(Reservation.__table__.insert().values(row))
+                inserted_rows.append((index, row))
+            except IntegrityError:
+                errors.append({'index': index, 'message': 'reservation already exists'})
+
+        return inserted_rows
+
+    @timed('manager')
+    def update(self, reservation_id, version, data):
+        """
+        Change the user or the event of a reservation if it was not changed since the client read version.
+        The write is one UPDATE conditioned on the version, no row is locked between the read and the write.
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :param version: Int, version of the reservation read by the client. Ie 3
+        :param data: Dictionary with the values to change. Ie {'event_id': 46}
+        :returns updated Reservation item, None on error
+        :raises ReservationNotFoundError, ReservationVersionError, ReservationExistsError or EventSoldOutError
+        """
+        try:
+            reservation, rows = self.apply_update(reservation_id, version, data)
+            return self.finish_change(reservation, rows)
+
+        except ReservationError:
+            self.db_session.rollback()
+            raise
+
+        except Exception, e:
+            error_message = "Error updating reservation {0} by data {1}. Detail error {2}".format(reservation_id, data, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='update')
+            self.db_session.rollback()
+            return None
+
+    @timed('manager')
+    def cancel(self, reservation_id, version):
+        """
+        Cancel a reservation if it was not changed since the client read version. The reservation is kept
+        with cancelled set and update_date stamped, its seat goes back to the event
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :param version: Int, version of the reservation read by the client. Ie 3
+        :returns cancelled Reservation item, None on error
+        :raises ReservationNotFoundError or ReservationVersionError
+        """
+        try:
+            reservation, rows = self.apply_cancel(reservation_id, version)
+            return self.finish_change(reservation, rows)
+
+        except ReservationError:
+            self.db_session.rollback()
+            raise
+
+        except Exception, e:
+            error_message = "Error cancelling reservation {0}. Detail error {1}".format(reservation_id, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='cancel')
+            self.db_session.rollback()
+            return None
+
+    @timed('manager')
+    def bulk_update(self, items):
+        """
+        Update many reservations in a single transaction, each one with its own version check
+        :param items: List of dictionaries with id, version and the values to change. Ie [{'id': '2h-34-jh-34', 'version': 3, 'event_id': 46}]
+        :returns tuple with the list of updated Reservation items and the list of errors of rejected items
+        """
+        return self.bulk_change(
+            items, lambda item: self.apply_update(item['id'], item['version'], item), 'bulk_update')
+
+    @timed('manager')
+    def bulk_cancel(self, items):
+        """
+        Cancel many reservations in a single transaction, each one with its own version check
+        :param items: List of dictionaries with id and version. Ie [{'id': '2h-34-jh-34', 'version': 3}]
+        :returns tuple with the list of cancelled Reservation items and the list of errors of rejected items
+        """
+        return self.bulk_change(items, lambda item: self.apply_cancel(item['id'], item['version']), 'bulk_cancel')
+
+    def bulk_change(self, items, apply, operation):
+        """
+        Apply a change to each valid item in its own savepoint, so a rejected item does not abort the others
+        :param items: List of dictionaries with id and version
+        :param apply: Function applying the change of an item, returns the Reservation item and the changed rows
+        :param operation: String, name of the operation in the errors metric. Ie 'bulk_cancel'
+        :returns tuple with the list of changed Reservation items and the list of errors of rejected items
+        """
+        reservations, changed_rows, errors = [], [], []
+
+        try:
+            for index, item in enumerate(items):
+                message = self.validate_change_item(item)
+                if message:
+                    errors.append({'index': index, 'message': message})
+                    continue
+
+                try:
+                    with self.db_session.begin_nested():
+                        reservation, rows = apply(item)
+                except ReservationError, e:
+                    errors.append({'index': index, 'message': str(e)})
+                    continue
+
+                reservations.append(reservation)
+                changed_rows.extend(rows)
+
+            if self.auto_commit:
+                self.db_session.commit()
+
+            self.invalidate_rows(changed_rows)
+            if changed_rows:
+                mark_write()
+                get_reservation_feed().notify()
+                get_hot_event_index().expire()
+
+            return reservations, errors
+
+        except Exception, e:
+            error_message = "Error changing reservations by data {0}. Detail error {1}".format(items, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation=operation)
+            self.db_session.rollback()
+            rejected = set(error['index'] for error in errors)
+            errors.extend({'index': index, 'message': BULK_ERROR_MESSAGE}
+                          for index in xrange(len(items)) if index not in rejected)
+            errors.sort(key=lambda error: error['index'])
+            return [], errors
+
+    def validate_change_item(self, item):
+        """
+        Check the item of a bulk update or cancellation
+        :returns String, error message or None if the item is valid
+        """
+        if not isinstance(item, dict):
+            return 'item must be an object'
+        if not isinstance(item.get('id'), basestring) or not is_valid_id(item['id']):
+            return 'id must be a reservation id'
+        if isinstance(item.get('version'), bool) or not isinstance(item.get('version'), (int, long)):
+            return 'version is required and must be an integer'
+
+        invalid_attributes = [
+            attribute for attribute in ('user_id', 'event_id')
+            if attribute in item and (isinstance(item[attribute], bool) or not isinstance(item[attribute], (int, long)))
+        ]
+        if invalid_attributes:
+            return '{0} must be an integer'.format(', '.join(invalid_attributes))
+
+        return None
+
+    def apply_update(self, reservation_id, version, data):
+        """
+        Write the update of a reservation with its seats and counts, it does not commit
+        :returns tuple with the Reservation item and the rows whose cached reads are invalidated
+        """
+        reservation = self.get_for_change(reservation_id, version)
+        previous = {'id': reservation.id, 'user_id': reservation.user_id, 'event_id': reservation.event_id}
+        current = dict((key, data.get(key, value)) for key, value in previous.iteritems() if key != 'id')
+        current['id'] = reservation.id
+
+        if current == previous:
+            return reservation, []
+
+        if current['event_id'] != previous['event_id']:
+            # Seats of both events in the same lock order in every transaction
+            for event_id in sorted([previous['event_id'], current['event_id']]):
+                if event_id == previous['event_id']:
+                    self.capacities.release(event_id)
+                elif not self.capacities.allocate(event_id):
+                    raise EventSoldOutError(event_id)
+
+        try:
+            with self.db_session.begin_nested():
+                updated = self.versioned_query(reservation_id, version)\
+                    .filter(Reservation.cancelled.is_(False))\
+                    .update(self.change_values(user_id=current['user_id'], event_id=current['event_id']),
+                            synchronize_session=False)
+        except IntegrityError:
+            raise ReservationExistsError(current['user_id'], current['event_id'])
+
+        if not updated:
+            self.raise_change_error(reservation_id)
+
+        # The count of a key that does not change still gets a new version, its reservations changed
+        self.counters.apply([(previous, -1), (current, 1)])
+        self.changes.record(CHANGE_UPDATED, Reservation.id == reservation_id)
+
+        self.db_session.expire(reservation)
+        return reservation, [previous, current]
+
+    def apply_cancel(self, reservation_id, version):
+        """
+        Write the cancellation of a reservation with its seat and counts, it does not commit
+        :returns tuple with the Reservation item and the rows whose cached reads are invalidated
+        """
+        reservation = self.get_for_change(reservation_id, version)
+        row = {'id': reservation.id, 'user_id': reservation.user_id, 'event_id': reservation.event_id}
+
+        updated = self.versioned_query(reservation_id, version)\
+            .filter(Reservation.cancelled.is_(False))\
+            .update(self.change_values(cancelled=True), synchronize_session=False)
+
+        if not updated:
+            self.raise_change_error(reservation_id)
+
+        self.capacities.release(row['event_id'])
+        self.counters.increment([row], -1)
+        self.changes.record(CHANGE_CANCELLED, Reservation.id == reservation_id)
+
+        self.db_session.expire(reservation)
+        return reservation, [row]
+
+    def get_for_change(self, reservation_id, version):
+        """
+        Get the reservation to update or cancel without locking it
+        :raises ReservationNotFoundError if it does not exist or is cancelled, ReservationVersionError if
+            version is not its current version
+        """
+        reservation = self.db_session.query(Reservation).filter_by(id=reservation_id, cancelled=False).first()
+
+        if reservation is None:
+            raise ReservationNotFoundError(reservation_id)
+        if reservation.version != version:
+            raise ReservationVersionError(reservation_id, reservation.version)
+
+        return reservation
+
+    def raise_change_error(self, reservation_id):
+        """
+        Raise the error of a conditional UPDATE that changed no row because of a concurrent write
+        """
+        current_version = self.db_session.query(Reservation.version)\
+            .filter(Reservation.id == reservation_id, Reservation.cancelled.is_(False))\
+            .scalar()
+
+        if current_version is None:
+            raise ReservationNotFoundError(reservation_id)
+
+        raise ReservationVersionError(reservation_id, current_version)
+
+    def finish_change(self, reservation, rows):
+        """
+        Commit a change of one reservation and invalidate the cached reads of its rows
+        :returns the Reservation item
+        """
+        if self.auto_commit:
+            self.db_session.commit()
+
+        if rows:
+            self.invalidate_rows(rows)
+            mark_write()
+            get_reservation_feed().notify()
+            get_hot_event_index().expire()
+
+        return reservation
+
+    @timed('manager')
+    def cancel_event(self, event_id):
+        """
+        Cancel all the reservations of a cancelled event. Reservations, counts and seats are changed with a few
+        set-based statements whatever the number of reservations, rows are never written one by one
+        :param event_id: Int, event id. Ie 45
+        :returns Int, number of cancelled reservations, None on error
+        """
+        try:
+            # The stamp identifies the rows cancelled by this statement in the following ones
+            update_date = datetime.utcnow()
+            cancelled = self.db_session.query(Reservation)\
+                .filter(Reservation.event_id == event_id, Reservation.cancelled.is_(False))\
+                .update(self.change_values(cancelled=True, update_date=update_date), synchronize_session=False)
+
+            rows = []
+            if cancelled:
+                self.capacities.release(event_id, cancelled)
+                self.counters.subtract_event(event_id, cancelled, update_date)
+                self.changes.record(CHANGE_CANCELLED, and_(
+                    Reservation.event_id == event_id, Reservation.update_date == update_date))
+
+                rows = [
+                    {'id': reservation_id, 'user_id': user_id, 'event_id': event_id}
+                    for reservation_id, user_id in self.db_session.query(Reservation.id, Reservation.user_id)
+                    .filter(Reservation.event_id == event_id, Reservation.update_date == update_date)
+                ]
+
+            if self.auto_commit:
+                self.db_session.commit()
+
+            if rows:
+                self.invalidate_rows(rows)
+                mark_write()
+                get_reservation_feed().notify()
+                get_hot_event_index().expire()
+
+            return cancelled
+
+        except Exception, e:
+            error_message = "Error cancelling reservations of event {0}. Detail error {1}".format(event_id, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='cancel_event')
+            self.db_session.rollback()
+            return None
+
+    @timed('manager')
+    def select_event_user_ids(self, event_id):
+        """
+        Get the users with a reservation of the event, read from the primary so they include every change
+        of the feed already read
+        :param event_id: Int, event id. Ie 45
+        :returns list of user ids sorted or None on error. Ie [10, 34, 35]
+        """
+        try:
+            return [
+                user_id for user_id, in self.db_session.query(Reservation.user_id)
+                .filter(Reservation.event_id == event_id, Reservation.cancelled.is_(False))
+                .order_by(Reservation.user_id)
+            ]
+
+        except Exception, e:
+            error_message = "Error getting users of event {0}. Detail error {1}".format(event_id, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='select_event_user_ids')
+            self.db_session.rollback()
             return None
 
-    def select(self, filters):
+    @timed('manager')
+    def select(self, filters, projection=False):
         """
         Get all reservation match with filters
         :param filters: Dictionary, filters of itme wants to get. Ie {'use_id': '45'}
+        :param projection: Boolean, return read-only ReservationRow items with LIST_COLUMNS instead of Reservation items
         :returns list with Reservation item object that mathc with the filters
         """
+        key = cache_key('select_rows' if projection else 'select', filters)
+        cached_rows = self.get_cached(key)
+        if cached_rows is not None:
+            return self.from_cache(cached_rows, projection)
+
         try:
-            reservations =  self.db_session.query(Reservation).filter_by(**filters).all()
+            reservations = self.read(
+                lambda session: self.fetch(self.build_query(filters, projection, session), projection))
+            self.cache.set(key, self.to_cache(reservations, projection), cache_tags(filters))
 
             return reservations
 
         except Exception, e:
             error_message = "Error getting reservations by filters {0}. Detail error {1}".format(filters, e.message)
             print error_message
+            MANAGER_ERRORS.inc(operation='select')
             return []
+
+    @timed('manager')
+    def select_page(self, filters, limit, cursor=None, projection=False, versions=None):
+        """
+        Get a page of reservations match with filters ordered by (create_date, id)
+        :param filters: Dictionary, filters of itme wants to get. Ie {'event_id': 45}
+        :param limit: Int, max number of reservations in the page. Ie 100
+        :param cursor: Tuple, (create_date, id) of the last reservation of the previous page
+        :param projection: Boolean, return read-only ReservationRow items with LIST_COLUMNS instead of Reservation items
+        :param versions: Dict, versions of the counters read on the primary for the ETag of the page. The page is
+            cached by them and a replica that has not reached them is not used, so the page is never older than
+            the ETag sent with it. Ie {('user_id', 24): 7}
+        :returns tuple with the list of Reservation items and the cursor of the next page (None if it is the last one)
+        """
+        page_filters = dict(filters, limit=limit, cursor=cursor and '|'.join(map(str, cursor)))
+        if versions:
+            page_filters['versions'] = ','.join(
+                '{0}:{1}={2}'.format(kind, key_id, version) for (kind, key_id), version in sorted(versions.items()))
+        key = cache_key('select_page_rows' if projection else 'select_page', page_filters)
+        cached_page = self.get_cached(key)
+        if cached_page is not None:
+            rows, next_cursor = cached_page
+            return self.from_cache(rows, projection), next_cursor
+
+        def read_page(session):
+            # Versions are read before the rows, so the rows are at least as new as them
+            read_versions = self.counters.get_versions(versions.keys(), session) if versions else {}
+            query = self.build_query(filters, projection, session)
+
+            if cursor:
+                query = query.filter(tuple_(Reservation.create_date, Reservation.id) > tuple_(*cursor))
+
+            # One extra row tells us if there is a next page without a count query
+            query = query.order_by(Reservation.create_date, Reservation.id).limit(limit + 1)
+            return self.fetch(query, projection), read_versions
+
+        try:
+            reservations, read_versions = self.read(read_page)
+            if any(read_versions[counter] < version for counter, version in (versions or {}).iteritems()):
+                # A lagging replica, the primary has at least the versions of the ETag
+                reservations, _ = self.read(read_page, primary=True)
+
+            next_cursor = None
+            if len(reservations) > limit:
+                reservations = reservations[:limit]
+                next_cursor = (reservations[-1].create_date, reservations[-1].id)
+
+            self.cache.set(key, (self.to_cache(reservations, projection), next_cursor), cache_tags(filters))
+
+            return reservations, next_cursor
+
+        except Exception, e:
+            error_message = "Error getting reservations page by filters {0}. Detail error {1}".format(filters, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='select_page')
+            return [], None
+
+    @timed('manager')
+    def select_by_keys(self, user_ids=None, event_ids=None, group_by='user_id', chunk_size=1000):
+        """
+        Get the reservations of many users and/or events grouped by user_id or event_id.
+        Lists are sent in chunks of chunk_size keys so long lists do not build huge IN clauses.
+        :param user_ids: List, users of the reservations. Ie [10, 11, 12]
+        :param event_ids: List, events of the reservations. Ie [45]
+        :param group_by: String, 'user_id' or 'event_id'
+        :param chunk_size: Int, max number of keys of each query. Ie 1000
+        :returns dict with a list of ReservationRow items by key, keys of group_by list without reservations
+            are included with an empty list. Ie {10: [ReservationRow(...)], 11: []}
+        """
+        group_column = getattr(Reservation, group_by)
+        keys_by_column = [(Reservation.user_id, user_ids), (Reservation.event_id, event_ids)]
+        chunked_keys = user_ids if group_by == 'user_id' else event_ids
+
+        def read_groups(session):
+            grouped = dict((key, []) for key in chunked_keys or ())
+
+            query = session.query(*LIST_COLUMNS).filter(Reservation.cancelled.is_(False))
+            for column, keys in keys_by_column:
+                if keys is not None and column is not group_column:
+                    query = query.filter(column.in_(keys))
+
+            if chunked_keys is None:
+                chunks = [query]
+            else:
+                unique_keys = sorted(set(chunked_keys))
+                chunks = [
+                    query.filter(group_column.in_(unique_keys[start:start + chunk_size]))
+                    for start in xrange(0, len(unique_keys), chunk_size)
+                ]
+
+            for chunk_query in chunks:
+                for result in chunk_query.order_by(Reservation.create_date, Reservation.id):
+                    row = ReservationRow(*result)
+                    grouped.setdefault(getattr(row, group_by), []).append(row)
+
+            return grouped
+
+        try:
+            return self.read(read_groups)
+
+        except Exception, e:
+            error_message = "Error getting reservations by users {0} and events {1}. Detail error {2}".format(
+                user_ids, event_ids, e.message)
+            print error_message
+            MANAGER_ERRORS.inc(operation='select_by_keys')
+            return {}
+
+    def stream(self, filters, chunk_size, projection=False):
+        """
+        Iterate over all reservation match with filters without load them all in memory
+        :param filters: Dictionary, filters of itme wants to get. Ie {'event_id': 45}
+        :param chunk_size: Int, number of rows fetched from the db server side cursor on each round trip. Ie 1000
+        :param projection: Boolean, yield read-only ReservationRow items with LIST_COLUMNS instead of Reservation items
+        :returns generator of Reservation item objects that mathc with the filters
+        """
+        def read_rows(session):
+            return self.build_query(filters, projection, session)\
+                .order_by(Reservation.create_date, Reservation.id)\
+                .yield_per(chunk_size)
+
+        for reservation in self.replicas.iterate(read_rows, self.db_session, primary=not self.auto_commit):
+            yield ReservationRow(*reservation) if projection else reservation
+
+    def copy_csv(self, filters, output):
+        """
+        Write all reservation match with filters as csv with a header using Postgres COPY TO,
+        rows go from the server to output without being loaded as python objects. The statement timeout of the
+        connections is lifted for the rest of the transaction, a full export runs longer than RS_DB_STATEMENT_TIMEOUT
+        :param filters: Dictionary, filters of itme wants to get. Ie {'event_id': 45}
+        :param output: File-like object with a write method
+        """
+        query = self.build_query(filters, projection=True)\
+            .with_entities(Reservation.id, Reservation.user_id, Reservation.event_id,
+                           cast(Reservation.create_date, Date).label('create_date'))\
+            .order_by(Reservation.create_date, Reservation.id)
+
+        connection = self.db_session.connection()
+        compiled = query.statement.compile(dialect=connection.dialect)
+
+        cursor = connection.connection.cursor()
+        try:
+            # SET LOCAL ends with the transaction, the connection goes back to the pool with its timeout
+            cursor.execute('SET LOCAL statement_timeout = 0')
+            statement = cursor.mogrify(unicode(compiled), compiled.params)
+            cursor.copy_expert('COPY ({0}) TO STDOUT WITH CSV HEADER'.format(statement), output)
+        finally:
+            cursor.close()
+
+    def build_query(self, filters, projection=False, session=None):
+        """
+        Build the read query of filters
+        :param filters: Dictionary, filters of itme wants to get. Ie {'event_id': 45, 'create_date_from': date(2019, 4, 1)}
+        :param projection: Boolean, query only LIST_COLUMNS instead of whole Reservation items
+        :param session: Session of the query, the primary one by default
+        :returns sqlalchemy Query
+        """
+
+        session = session or self.db_session
+        equal_filters = dict((key, value) for key, value in filters.iteritems() if key not in DATE_RANGE_FILTERS)
+
+        if projection:
+            query = session.query(*LIST_COLUMNS).filter_by(cancelled=False, **equal_filters)
+        else:
+            query = session.query(Reservation).filter_by(cancelled=False, **equal_filters)
+
+        # Bounds on create_date let Postgres scan only the partitions of the months in the range
+        if filters.get('create_date_from') is not None:
+            query = query.filter(Reservation.create_date >= day_start(filters['create_date_from']))
+        if filters.get('create_date_to') is not None:
+            query = query.filter(Reservation.create_date < day_start(filters['create_date_to'] + timedelta(days=1)))
+
+        return query
+
+    def fetch(self, query, projection=False):
+        """
+        Get all the results of a query built by build_query
+        :returns list of ReservationRow items if projection, list of Reservation items otherwise
+        """
+
+        if projection:
+            return [ReservationRow(*result) for result in query.all()]
+
+        return query.all()
+
+    def to_cache(self, reservations, projection):
+        """
+        Get the cached form of the reservations of a read, ReservationRow items are cached as they are
+        """
+
+        if projection:
+            return reservations
+
+        return [self.to_row(reservation) for reservation in reservations]
+
+    def from_cache(self, rows, projection):
+        """
+        Get the reservations of a read from its cached form
+        """
+
+        if projection:
+            return rows
+
+        return [Reservation(**row) for row in rows]
+
+    def to_row(self, reservation):
+        """
+        Get the column values of a reservation, the form in which reads are cached
+        :param reservation: Reservation item object
+        :returns dict with column values. Ie {'id': '2h-34-jh-34', 'user_id': 34, 'event_id': 45, ...}
+        """
+
+        return dict((column.name, getattr(reservation, column.name)) for column in Reservation.__table__.columns)
+
+    def index_created(self, reservations):
+        """
+        Add the created reservations to the in-memory index of the hot events. Reservations of a transaction of the
+        caller may still be rolled back, they are read from the change feed after it commits
+        :param reservations: List of dicts or items with user_id and event_id. Ie [{'user_id': 34, 'event_id': 45}]
+        """
+
+        index = get_hot_event_index()
+        if not self.auto_commit:
+            index.expire()
+            return
+
+        for reservation in reservations:
+            if isinstance(reservation, dict):
+                index.add(reservation['event_id'], reservation['user_id'])
+            else:
+                index.add(reservation.event_id, reservation.user_id)
+
+    def invalidate_rows(self, rows):
+        """
+        Invalidate the cached reads of the users and events of rows
+        :param rows: List of dicts with the id, user_id and event_id of written reservations
+        """
+
+        tags = set()
+        for row in rows:
+            tags.update(reservation_tags(row['user_id'], row['event_id'], row['id']))
+
+        self.cache.invalidate(list(tags))
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from reservationservice.app.cache import get_reservation_cache
+from reservationservice.app.database import pool_stats
+from reservationservice.app.hotindex import get_hot_event_index
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+def format_labels(labelnames, values):
+    """
+    Format label values as prometheus text. Ie {endpoint="reservation",method="GET"}
+    """
+
+    if not labelnames:
+        return ''
+
+    pairs = ['{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in zip(labelnames, values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+    """
+    Monotonic counter by label values
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, value=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, self.labelnames, key, value) for key, value in sorted(self.values.items())]
+
+
+class Histogram(object):
+    """
+    Cumulative histogram by label values
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            bucket_counts, count, total = self.values.get(key, ([0] * len(self.buckets), 0, 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[index] += 1
+            self.values[key] = (bucket_counts, count + 1, total + value)
+
+    def samples(self):
+        samples = []
+        bucket_labelnames = self.labelnames + ('le',)
+
+        with self.lock:
+            for key, (bucket_counts, count, total) in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    samples.append((self.name + '_bucket', bucket_labelnames, key + (format_value(bound),), bucket_count))
+
+                samples.append((self.name + '_bucket', bucket_labelnames, key + ('+Inf',), count))
+                samples.append((self.name + '_count', self.labelnames, key, count))
+                samples.append((self.name + '_sum', self.labelnames, key, total))
+
+        return samples
+
+
+class MetricsRegistry(object):
+    """
+    Metrics of the process and collectors of values read at exposition time
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        :param collector: Function returning a list of (name, type, documentation, [(labels dict, value)])
+        """
+
+        self.collectors.append(collector)
+
+    def render(self):
+        """
+        Get all the metrics in prometheus text exposition format
+        """
+
+        lines = []
+
+        for metric in self.metrics:
+            lines.append('# HELP {0} {1}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {0} {1}'.format(metric.name, metric.type))
+            for name, labelnames, values, value in metric.samples():
+                lines.append('{0}{1} {2}'.format(name, format_labels(labelnames, values), format_value(value)))
+
+        for collector in self.collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append('# HELP {0} {1}'.format(name, documentation))
+                lines.append('# TYPE {0} {1}'.format(name, metric_type))
+                for labels, value in samples:
+                    labelnames = sorted(labels)
+                    values = [labels[label] for label in labelnames]
+                    lines.append('{0}{1} {2}'.format(name, format_labels(labelnames, values), format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    'rs_request_duration_seconds', 'Duration of HTTP requests', ('endpoint', 'method', 'status'))
+REQUEST_SQL_QUERIES = registry.histogram(
+    'rs_request_sql_queries', 'SQL statements executed by HTTP request', ('endpoint', 'method'), COUNT_BUCKETS)
+REQUEST_SQL_DURATION = registry.histogram(
+    'rs_request_sql_duration_seconds', 'Time spent in SQL statements by HTTP request', ('endpoint', 'method'))
+LAYER_DURATION = registry.histogram(
+    'rs_layer_duration_seconds', 'Duration of controller and manager calls', ('layer', 'operation'))
+SERIALIZATION_DURATION = registry.histogram(
+    'rs_serialization_duration_seconds', 'Time spent serializing reservations', ('operation',))
+ROWS_RETURNED = registry.histogram(
+    'rs_rows_returned', 'Reservations returned by read operations', ('operation',), COUNT_BUCKETS)
+MANAGER_ERRORS = registry.counter(
+    'rs_manager_errors_total', 'Errors caught by the managers', ('operation',))
+
+
+def timed(layer):
+    """
+    Decorator recording the duration of each call of the function in LAYER_DURATION
+    :param layer: String, layer of the function. Ie 'manager'
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                LAYER_DURATION.observe(time.time() - start, layer=layer, operation=function.__name__)
+        return wrapper
+
+    return decorator
+
+
+def serialize(operation, function, reservations):
+    """
+    Serialize reservations with function recording the serialization time and the rows returned
+    :param operation: String, read operation. Ie 'select_reservation'
+    :param function: Function serializing a list of reservations. Ie dump_reservations
+    :param reservations: List of reservations
+    """
+
+    start = time.time()
+    data = function(reservations)
+    SERIALIZATION_DURATION.observe(time.time() - start, operation=operation)
+    ROWS_RETURNED.observe(len(reservations), operation=operation)
+    return data
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start is kept by the execution, a failed statement never reaches after_cursor_execute and its start is
+    # dropped with its context instead of staying on the connection
+    if context is not None:
+        context.rs_query_start = time.time()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'rs_query_start', None)
+    if start is None:
+        return
+
+    elapsed = time.time() - start
+    if has_app_context() and hasattr(g, 'sql_queries'):
+        g.sql_queries += 1
+        g.sql_time += elapsed
+
+
+def start_request():
+    g.request_start = time.time()
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+
+def finish_request(response):
+    start = getattr(g, 'request_start', None)
+    if start is None:
+        return response
+
+    # Labels keep the endpoint names of the resources, without the name of their blueprint
+    endpoint = (request.endpoint or 'unknown').rpartition('.')[2]
+    REQUEST_DURATION.observe(time.time() - start, endpoint=endpoint, method=request.method,
+                             status=response.status_code)
+    REQUEST_SQL_QUERIES.observe(g.sql_queries, endpoint=endpoint, method=request.method)
+    REQUEST_SQL_DURATION.observe(g.sql_time, endpoint=endpoint, method=request.method)
+    return response
+
+
+def collect_cache():
+    stats = get_reservation_cache().stats.as_dict()
+    return [
+        ('rs_cache_{0}_total'.format(name), 'counter', 'Reservation cache {0}'.format(name), [({}, value)])
+        for name, value in sorted(stats.items())
+    ]
+
+
+def collect_hot_index():
+    events = get_hot_event_index().stats()['events']
+    return [
+        ('rs_hot_index_{0}'.format(name), 'gauge', 'Hot event index {0} by event'.format(name),
+         [({'event_id': str(event['event_id'])}, event[name]) for event in events])
+        for name in ('bytes', 'reservations')
+    ]
+
+
+def collect_pool():
+    stats = pool_stats(current_app.extensions['sqlalchemy'].db.engine)
+
+    return [
+        ('rs_db_pool_{0}'.format(name), 'gauge', 'Database pool {0}'.format(name.replace('_', ' ')), [({}, value)])
+        for name, value in sorted(stats.items()) if name != 'pool'
+    ]
+
+
+def init_metrics(app):
+    """
+    Register the request hooks, the SQL events and the cache, hot index and pool collectors
+    :param app: Flask application
+    """
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+    # The registry is shared by the applications of the process, the collectors read the current one
+    for collector in (collect_cache, collect_hot_index, collect_pool):
+        if collector not in registry.collectors:
+            registry.add_collector(collector)
@@ -1,31 +1,90 @@
-import os
+from collections import namedtuple
 from datetime import datetime
 
-from flask import Flask
-from flask.ext.script import Manager, Shell
-from flask.ext.login import UserMixin
+from reservationservice.app import db
+from reservationservice.app.ids import GUID, uuid7
 
-from werkzeug.security import generate_password_hash, check_password_hash
 
-from sqlalchemy import Sequence, ForeignKey
-from sqlalchemy.orm import relationship
-from sqlalchemy.ext.hybrid import Comparator, hybrid_property
-from sqlalchemy import func
+class Reservation(db.Model):
+    # On Postgres the table is partitioned by month of create_date (migration 6488ee377007): the primary
+    # key is (id, create_date) and the unique (user_id, event_id) is kept by table reservation_pairs
+    __tablename__ = 'reservations'
 
-from reservationservice.app import db, app
+    # Time-ordered UUIDv7 stored as native uuid on Postgres, exposed as its canonical string
+    id = db.Column(GUID, primary_key=True, default=uuid7)
+    user_id = db.Column(db.Integer, nullable=False)
+    event_id = db.Column(db.Integer, nullable=False)
+    # TIMESTAMP on Postgres (migrations 44567dfc2c69 and 6488ee377007)
+    create_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    update_date = db.Column(db.DateTime)
+    # Bumped by every update, updates and cancellations must send the version they read (optimistic locking)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Cancellations are soft deletes stamped with update_date, reads skip cancelled reservations
+    cancelled = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
-from general.util.db_helper import uuid_generator
+    __table_args__ = (
+        db.Index('ix_reservations_user_id_create_date', 'user_id', 'create_date'),
+        db.Index('ix_reservations_event_id_create_date', 'event_id', 'create_date'),
+        db.Index('ux_reservations_user_id_event_id', 'user_id', 'event_id', unique=True),
+    )
 
 
-class Reservation(db.Model):
-    __tablename__ = 'reservations'
+class IdempotencyKey(db.Model):
+    __tablename__ = 'reservation_idempotency_keys'
+
+    key = db.Column(db.String(255), primary_key=True)
+    reservation_id = db.Column(GUID, nullable=False)
+    create_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class ReservationCounter(db.Model):
+    __tablename__ = 'reservation_counters'
+
+    # Column counted, 'user_id' or 'event_id'
+    kind = db.Column(db.String(10), primary_key=True)
+    key_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped on every write of the user or event reservations, ETag of their reads
+    version = db.Column(db.Integer, nullable=False, default=0)
 
-    id = db.Column(db.String(100), primary_key=True, default=uuid_generator)
+
+class EventCapacity(db.Model):
+    __tablename__ = 'event_capacities'
+
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    remaining = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.CheckConstraint('remaining >= 0', name='ck_event_capacities_remaining'),
+    )
+
+
+class ReservationChange(db.Model):
+    # Transactional outbox: a row by reservation created, updated or cancelled, written in the transaction of
+    # the change and read by GET /reservation/changes
+    __tablename__ = 'reservation_changes'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # Postgres txid_current() of the writing transaction, the feed orders by (tx_id, id) (see ReservationChangeManager)
+    tx_id = db.Column(db.BigInteger)
+    # 'created', 'updated' or 'cancelled'
+    type = db.Column(db.String(10), nullable=False)
+    reservation_id = db.Column(GUID, nullable=False)
     user_id = db.Column(db.Integer, nullable=False)
     event_id = db.Column(db.Integer, nullable=False)
-    create_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
-    update_date = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False)
+    create_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_reservation_changes_tx_id_id', 'tx_id', 'id'),
+    )
+
+
+class ReservationRow(namedtuple('ReservationRow', ['id', 'user_id', 'event_id', 'create_date'])):
+    """
+    Read-only reservation with only the columns of list reads, loaded without ORM hydration
+    """
 
+    __slots__ = ()
 
-if __name__ == '__main__':
-    manager.run()
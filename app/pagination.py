@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import base64
+import uuid
+from datetime import datetime
+
+CURSOR_SEPARATOR = '|'
+# create_date is a timestamp, cursors keep it to the microsecond so a page never starts again at midnight
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(cursor):
+    """
+    Build the opaque string sent to the clients as next_cursor
+    :param cursor: Tuple, (create_date, id) of the last reservation of a page. Ie (datetime(2019, 4, 1, 10, 30), '2h-34-jh-34')
+    :returns String with the encoded cursor or None when there is not a next page
+    """
+
+    if not cursor:
+        return None
+
+    create_date, reservation_id = cursor
+    raw_cursor = CURSOR_SEPARATOR.join([create_date.strftime(CURSOR_DATE_FORMAT), str(reservation_id)])
+    return base64.urlsafe_b64encode(raw_cursor)
+
+
+def decode_cursor(cursor):
+    """
+    Get the (create_date, id) tuple from a cursor sent by a client
+    :param cursor: String, cursor returned as next_cursor in a previous page.
+        Ie 'MjAxOS0wNC0wMVQxMDozMDowMC4wMDAwMDB8MmgtMzQtamgtMzQ='
+    :returns Tuple (create_date, id) or None when cursor is empty
+    :raises ValueError when the cursor is malformed
+    """
+
+    if not cursor:
+        return None
+
+    try:
+        raw_cursor = base64.urlsafe_b64decode(str(cursor))
+        create_date, reservation_id = raw_cursor.split(CURSOR_SEPARATOR, 1)
+        return datetime.strptime(create_date, CURSOR_DATE_FORMAT), str(uuid.UUID(reservation_id))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor {0}".format(cursor))
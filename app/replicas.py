@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import itertools
+import math
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import exc
+from sqlalchemy.orm import sessionmaker
+
+from reservationservice.app.database import pool_stats
+from reservationservice.app.extensions import get_app_extension
+from reservationservice.app.metrics import registry
+
+READ_PRIMARY_COOKIE = 'rs_read_primary'
+SELECTIONS = ('round_robin', 'least_loaded')
+REPLICA_ROUTER_EXTENSION = 'rs_replica_router'
+
+# Errors of a replica that can not serve reads, other errors are errors of the read itself
+REPLICA_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError)
+
+REPLICA_READS = registry.counter('rs_db_reads_total', 'Reads by database that served them', ('database',))
+REPLICA_FAILURES = registry.counter(
+    'rs_db_replica_failures_total', 'Reads of a replica that failed and were served by the primary', ('database',))
+
+_replica_router_lock = threading.Lock()
+
+
+def mark_write():
+    """
+    Send the reads of the client to the primary for RS_DB_READ_YOUR_WRITES_SECONDS, so it sees
+    what it has just written while the replicas catch up
+    """
+
+    if not has_request_context():
+        return
+
+    g.read_primary_until = time.time() + current_app.config['RS_DB_READ_YOUR_WRITES_SECONDS']
+
+
+def reads_primary():
+    """
+    Check if the reads of the current request must go to the primary because its client wrote recently
+    """
+
+    if not has_request_context():
+        return False
+
+    now = time.time()
+    if getattr(g, 'read_primary_until', 0) > now:
+        return True
+
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > now
+    except ValueError:
+        return False
+
+
+def set_read_primary_cookie(response):
+    """
+    after_request hook telling the client of a write to keep its reads on the primary for a while
+    """
+
+    until = getattr(g, 'read_primary_until', None)
+    if until is not None:
+        response.set_cookie(READ_PRIMARY_COOKIE, '{0:.3f}'.format(until),
+                            max_age=int(math.ceil(until - time.time())), httponly=True)
+
+    return response
+
+
+class Replica(object):
+    """
+    Read replica with its engine and its health
+    """
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.create_session = sessionmaker(bind=engine)
+        self.in_flight = 0
+        self.reads = 0
+        self.failures = 0
+        self.unhealthy_until = 0
+
+    def stats(self):
+        stats = pool_stats(self.engine)
+        stats.update({
+            'name': self.name,
+            'in_flight': self.in_flight,
+            'reads': self.reads,
+            'failures': self.failures,
+            'healthy': self.unhealthy_until <= time.time()
+        })
+        return stats
+
+
+class ReplicaRouter(object):
+    """
+    Route reads to the read replicas, by turns (round_robin) or to the one with less reads in
+    flight (least_loaded). A replica whose read fails with a connection error is skipped for
+    retry_interval seconds and the read is served by the primary.
+    Without replicas every read goes to the primary.
+    """
+
+    def __init__(self, replicas=(), selection='round_robin', retry_interval=30):
+        """
+        :param replicas: List of Replica items
+        :param selection: String, one of SELECTIONS
+        :param retry_interval: Int, seconds a failed replica is not used. Ie 30
+        """
+
+        if selection not in SELECTIONS:
+            raise ValueError('Unknown replica selection {0}'.format(selection))
+
+        self.replicas = list(replicas)
+        self.selection = selection
+        self.retry_interval = retry_interval
+        self.lock = threading.Lock()
+        self.turns = itertools.count()
+
+    def pinned(self):
+        """
+        Check if the reads of the current request go to the primary although there are replicas
+        """
+
+        return bool(self.replicas) and reads_primary()
+
+    def acquire(self):
+        """
+        Choose the replica of a read
+        :returns Replica item or None if there is not a healthy one
+        """
+
+        now = time.time()
+
+        with self.lock:
+            healthy = [replica for replica in self.replicas if replica.unhealthy_until <= now]
+            if not healthy:
+                return None
+
+            if self.selection == 'least_loaded':
+                replica = min(healthy, key=lambda item: (item.in_flight, item.reads))
+            else:
+                replica = healthy[next(self.turns) % len(healthy)]
+
+            replica.in_flight += 1
+            replica.reads += 1
+            return replica
+
+    def release(self, replica, failed=False):
+        with self.lock:
+            replica.in_flight -= 1
+            if failed:
+                replica.failures += 1
+                replica.unhealthy_until = time.time() + self.retry_interval
+
+    def read(self, read, primary_session, primary=False):
+        """
+        Run read on a replica session, on primary_session if there is not a healthy replica or the replica fails
+        :param read: Function receiving a session and returning the fully loaded result of the read
+        :param primary_session: Session of the primary
+        :param primary: Boolean, force the primary. Ie reads inside a transaction
+        :returns the result of read
+        """
+
+        replica = None if primary or reads_primary() else self.acquire()
+        if replica is None:
+            REPLICA_READS.inc(database='primary')
+            return read(primary_session)
+
+        session = replica.create_session()
+        try:
+            result = read(session)
+        except REPLICA_ERRORS, e:
+            print "Error reading from replica {0}, reading from primary. Detail error {1}".format(replica.name, e)
+            session.close()
+            self.release(replica, failed=True)
+            REPLICA_FAILURES.inc(database=replica.name)
+            REPLICA_READS.inc(database='primary')
+            return read(primary_session)
+
+        session.close()
+        self.release(replica)
+        REPLICA_READS.inc(database=replica.name)
+        return result
+
+    def iterate(self, read, primary_session, primary=False):
+        """
+        Like read for reads returning an iterator, the replica session is kept until the iterator
+        is exhausted. The primary takes over only if the replica fails before the first item.
+        """
+
+        replica = None if primary or reads_primary() else self.acquire()
+        if replica is None:
+            REPLICA_READS.inc(database='primary')
+            for item in read(primary_session):
+                yield item
+            return
+
+        session = replica.create_session()
+        started = False
+        failed = False
+
+        try:
+            for item in read(session):
+                started = True
+                yield item
+        except REPLICA_ERRORS, e:
+            if started:
+                failed = True
+                raise
+
+            print "Error reading from replica {0}, reading from primary. Detail error {1}".format(replica.name, e)
+            failed = True
+        finally:
+            session.close()
+            self.release(replica, failed=failed)
+
+        if failed:
+            REPLICA_FAILURES.inc(database=replica.name)
+            REPLICA_READS.inc(database='primary')
+            for item in read(primary_session):
+                yield item
+        else:
+            REPLICA_READS.inc(database=replica.name)
+
+    def stats(self):
+        with self.lock:
+            return [replica.stats() for replica in self.replicas]
+
+
+def build_replica_router(app, db):
+    """
+    Build the router of the replicas of RS_DB_REPLICA_URIS, their engines are set up like the primary one
+    :param app: Flask application
+    :param db: ReservationSQLAlchemy extension
+    """
+
+    replicas = [
+        Replica('replica{0}'.format(index), db.create_replica_engine(app, uri))
+        for index, uri in enumerate(app.config['RS_DB_REPLICA_URIS'])
+    ]
+
+    return ReplicaRouter(replicas, app.config['RS_DB_REPLICA_SELECTION'], app.config['RS_DB_REPLICA_RETRY_SECONDS'])
+
+
+def get_replica_router():
+    """
+    Get the router shared by all requests of the application, it is built on first use from the app config
+    :returns ReplicaRouter, without replicas when there is not an application context
+    """
+
+    if not has_app_context():
+        return ReplicaRouter()
+
+    return get_app_extension(
+        REPLICA_ROUTER_EXTENSION, _replica_router_lock,
+        lambda app: build_replica_router(app, app.extensions['sqlalchemy'].db))
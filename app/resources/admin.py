@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import Response, jsonify
+from flask_restful import Resource, abort
+
+from reservationservice.app import db
+from reservationservice.app.admission import get_concurrency_limiter
+from reservationservice.app.controllers.hotindex import HotEventController
+from reservationservice.app.database import pool_stats
+from reservationservice.app.metrics import registry
+from reservationservice.app.replicas import get_replica_router
+
+hot_event_controller = HotEventController()
+
+
+class PoolStatsAPI(Resource):
+
+    def get(self):
+        """
+        Get live statistics of the database connection pool, of the read replicas and of the requests in flight
+        """
+        return jsonify({
+            'data': pool_stats(db.engine),
+            'replicas': get_replica_router().stats(),
+            'admission': get_concurrency_limiter().stats()
+        })
+
+
+class MetricsAPI(Resource):
+
+    def get(self):
+        """
+        Get the metrics of the process in prometheus text format
+        """
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+class HotEventsAPI(Resource):
+
+    def get(self):
+        """
+        Get the reservations and memory of each event of the in-memory index
+        """
+        return jsonify({'data': hot_event_controller.stats()})
+
+
+class HotEventAPI(Resource):
+
+    def put(self, event_id):
+        """
+        Load (or load again) the reservations of the event in the in-memory index
+        """
+        events = hot_event_controller.warm_events([event_id])
+        if events is None:
+            abort(503, message='Reservations of event {0} could not be loaded'.format(event_id))
+
+        return jsonify({'data': events[0]})
+
+    def delete(self, event_id):
+        """
+        Remove the event from the in-memory index
+        """
+        hot_event_controller.drop_event(event_id)
+
+        return jsonify({'data': hot_event_controller.stats()})
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import jsonify
+from flask_restful import Resource, abort, inputs, reqparse
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.exceptions import EventCapacityNotFoundError
+
+capacity_controller = EventCapacityController()
+
+put_parser = reqparse.RequestParser()
+put_parser.add_argument('capacity', type=inputs.natural, location='json', required=True)
+
+
+class EventCapacityAPI(Resource):
+
+    def get(self, event_id):
+        """
+        Get the capacity and remaining seats of the event
+        """
+        try:
+            capacity = capacity_controller.get_capacity(event_id)
+        except EventCapacityNotFoundError, e:
+            abort(404, message=str(e))
+
+        if capacity is None:
+            abort(503, message='Capacity of event {0} could not be read'.format(event_id))
+
+        return jsonify({'data': capacity})
+
+    def put(self, event_id):
+        """
+        Set the capacity of the event
+        """
+        params = self.put_params()
+
+        capacity = capacity_controller.set_capacity(event_id, params['capacity'])
+        if capacity is None:
+            abort(503, message='Capacity could not be saved')
+
+        return jsonify({'data': capacity})
+
+    def put_params(self):
+        """
+        Get params for put action
+        """
+
+        return put_parser.parse_args()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app, jsonify
+from flask_restful import Resource, abort, inputs, reqparse
+
+from reservationservice.app.controllers.change import ReservationChangeController
+
+change_controller = ReservationChangeController()
+
+get_parser = reqparse.RequestParser()
+get_parser.add_argument('offset', type=str, location='args')
+get_parser.add_argument('limit', type=inputs.positive, location='args')
+get_parser.add_argument('wait', type=inputs.natural, location='args', default=0)
+
+
+class ReservationChangesAPI(Resource):
+
+    def get(self):
+        """
+        Get the reservations created, updated and cancelled after offset, in commit order. With wait (seconds)
+        the request is held until there are changes or the wait ends. Consumers resume with next_offset
+        """
+        params = self.get_params()
+        config = current_app.config
+
+        limit = min(params['limit'] or config['RS_FEED_PAGE_SIZE'], config['RS_FEED_MAX_PAGE_SIZE'])
+        wait = min(params['wait'], config['RS_FEED_MAX_WAIT_SECONDS'])
+
+        try:
+            result = change_controller.poll_changes(params['offset'], limit, wait, config['RS_FEED_POLL_SECONDS'])
+        except ValueError, e:
+            abort(400, message=str(e))
+
+        if result is None:
+            abort(503, message='Changes could not be read')
+
+        changes, next_offset = result
+        return jsonify({'data': changes, 'next_offset': next_offset})
+
+    def get_params(self):
+        """
+        Get params for get action
+        """
+
+        return get_parser.parse_args()
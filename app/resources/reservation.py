@@ -1,48 +1,405 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import jsonify
-from flask_restful import Resource, reqparse
+from flask import Response, current_app, jsonify, request, stream_with_context, url_for
+from flask_restful import Resource, abort, inputs, reqparse
 
 from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import EventSoldOutError, ReservationError, ReservationNotFoundError
+from reservationservice.app.export import MIMETYPES, export_formats
 
-class ReservationAPI(Resource):
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def iso_date(value):
+    """
+    Parse a YYYY-MM-DD param as a date
+    """
+
+    return inputs.date(value).date()
+
+
+# Controllers and parsers do not keep request state, they are built once and shared by all requests
+reservation_controller = ReservationController()
+
+get_parser = reqparse.RequestParser()
+get_parser.add_argument('user_id', type=int, location='args')
+get_parser.add_argument('event_id', type=int, location='args')
+get_parser.add_argument('from', type=iso_date, location='args', dest='create_date_from')
+get_parser.add_argument('to', type=iso_date, location='args', dest='create_date_to')
+get_parser.add_argument('limit', type=inputs.positive, location='args')
+get_parser.add_argument('cursor', type=str, location='args')
+get_parser.add_argument('stream', type=inputs.boolean, location='args', default=False)
+
+export_parser = reqparse.RequestParser()
+export_parser.add_argument('user_id', type=int, location='args')
+export_parser.add_argument('event_id', type=int, location='args')
+export_parser.add_argument('from', type=iso_date, location='args', dest='create_date_from')
+export_parser.add_argument('to', type=iso_date, location='args', dest='create_date_to')
+export_parser.add_argument('format', type=str, location='args', choices=export_formats(), default='ndjson')
+export_parser.add_argument('gzip', type=inputs.boolean, location='args', default=False)
+
+post_parser = reqparse.RequestParser()
+post_parser.add_argument('user_id', type=int, location='json', required=True)
+post_parser.add_argument('event_id', type=int, location='json', required=True)
+
+patch_parser = reqparse.RequestParser()
+patch_parser.add_argument('version', type=int, location='json', required=True)
+patch_parser.add_argument('user_id', type=int, location='json')
+patch_parser.add_argument('event_id', type=int, location='json')
+
+delete_parser = reqparse.RequestParser()
+delete_parser.add_argument('version', type=int, location='args', required=True)
+
+cancel_event_parser = reqparse.RequestParser()
+cancel_event_parser.add_argument('event_id', type=int, location='args', required=True)
+
+count_parser = reqparse.RequestParser()
+count_parser.add_argument('user_id', type=int, location='args', action='append')
+count_parser.add_argument('event_id', type=int, location='args', action='append')
+
+batch_post_parser = reqparse.RequestParser()
+batch_post_parser.add_argument('user_ids', type=list, location='json')
+batch_post_parser.add_argument('event_ids', type=list, location='json')
+batch_post_parser.add_argument('group_by', type=str, location='json', choices=('user_id', 'event_id'))
+
+bulk_post_parser = reqparse.RequestParser()
+bulk_post_parser.add_argument('data', type=list, location='json', required=True)
+
+
+class ReservationFiltersMixin(object):
+    """
+    Filters of the reads of reservations
+    """
+
+    filter_params = ('user_id', 'event_id', 'create_date_from', 'create_date_to')
+
+    def get_filters(self, params):
+        """
+        Get the filters sent by the client, params not sent are not used as filters
+        :param params: Dict, parsed params of get action. Ie {'user_id': 24, 'event_id': None, 'limit': 10}
+        :returns dict with the filters. Ie {'user_id': 24}
+        """
+
+        filters = dict((key, params[key]) for key in self.filter_params if params.get(key) is not None)
+
+        if filters.get('create_date_from') and filters.get('create_date_to') and \
+                filters['create_date_from'] > filters['create_date_to']:
+            abort(400, message='from must be before to')
+
+        return filters
+
+
+class ReservationAPI(ReservationFiltersMixin, Resource):
 
     def get(self):
         """
-        Get all reservetions by filters
+        Get reservetions by filters, paginated by cursor or streamed.
+        from and to (YYYY-MM-DD, both included) filter by create_date
         """
         params = self.get_params()
-        reservations = ReservationController().select_reservation(params)
+        filters = self.get_filters(params)
 
-        return jsonify({'data': reservations})
+        if params['stream']:
+            chunks = reservation_controller.stream_reservations(filters, current_app.config['RS_STREAM_CHUNK_SIZE'])
+            return Response(stream_with_context(chunks), mimetype='application/json')
+
+        limit = min(params['limit'] or current_app.config['RS_PAGE_SIZE'], current_app.config['RS_MAX_PAGE_SIZE'])
+
+        # Polls of an unchanged user or event cost one indexed lookup of its counter
+        versions = reservation_controller.counter_versions(filters)
+        etag = reservation_controller.reservations_etag(filters, limit, params['cursor'], versions)
+        if etag is not None and etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        try:
+            reservations, next_cursor = reservation_controller.select_reservation_page(
+                filters, limit, params['cursor'], versions)
+        except ValueError, e:
+            abort(400, message=str(e))
+
+        response = jsonify({'data': reservations, 'next_cursor': next_cursor})
+        if etag is not None:
+            response.set_etag(etag)
+        return response
 
     def get_params(self):
         """
         Get params for get action
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('user_id', type=int, location='args')
-        parser.add_argument('event_id', type=int, location='args')
-
-        return parser.parse_args()
+        return get_parser.parse_args()
 
     def post(self):
         """
         Create reservation
         """
         params = self.post_params()
-        reservations = ReservationController().create_reservation(params)
-        return jsonify({})
+        idempotency_key = request.headers.get('Idempotency-Key')
+
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+            abort(400, message='Idempotency-Key must have between 1 and {0} characters'.format(IDEMPOTENCY_KEY_MAX_LENGTH))
+
+        # Requests with an Idempotency-Key are written at once so retries get the stored reservation
+        if current_app.config['RS_WRITE_BEHIND'] and idempotency_key is None:
+            reservation = reservation_controller.enqueue_reservation(params)
+
+            response = jsonify({'data': reservation})
+            response.status_code = 202
+            response.headers['Location'] = url_for('.reservation_status', reservation_id=reservation['id'])
+            return response
+
+        try:
+            reservation = reservation_controller.create_reservation(params, idempotency_key)
+        except EventSoldOutError, e:
+            abort(409, message=str(e))
+
+        if reservation is None:
+            abort(503, message='Reservation could not be created')
+
+        return jsonify({'data': reservation})
+
+    def post_params(self):
+        """
+        Get params for post action
+        """
+
+        return post_parser.parse_args()
+
+    def delete(self):
+        """
+        Cancel all the reservations of a cancelled event (?event_id=45)
+        """
+        params = self.delete_params()
+
+        response = reservation_controller.cancel_event_reservations(params['event_id'])
+        if response is None:
+            abort(503, message='Reservations of event {0} could not be cancelled'.format(params['event_id']))
+
+        return jsonify({'data': response})
+
+    def delete_params(self):
+        """
+        Get params for delete action
+        """
+
+        return cancel_event_parser.parse_args()
+
+
+class EventReservationAPI(Resource):
+
+    def get(self, event_id, user_id):
+        """
+        Check if the user has reserved the event, answered from memory for the hot events
+        """
+        reserved = reservation_controller.has_reservation(event_id, user_id)
+
+        return jsonify({'data': {'event_id': event_id, 'user_id': user_id, 'reserved': reserved}})
+
+
+class ReservationItemAPI(Resource):
+
+    def get(self, reservation_id):
+        """
+        Get a reservation with its version
+        """
+        reservation = reservation_controller.get_reservation(reservation_id)
+        if reservation is None:
+            abort(404, message='Reservation {0} does not exist'.format(reservation_id))
+
+        return jsonify({'data': reservation})
+
+    def patch(self, reservation_id):
+        """
+        Change the user or the event of a reservation, version must be the one read by the client
+        """
+        params = self.patch_params()
+        data = dict((key, params[key]) for key in ('user_id', 'event_id') if params[key] is not None)
+
+        if not data:
+            abort(400, message='user_id or event_id is required')
+
+        try:
+            reservation = reservation_controller.update_reservation(reservation_id, params['version'], data)
+        except ReservationNotFoundError, e:
+            abort(404, message=str(e))
+        except ReservationError, e:
+            abort(409, message=str(e))
+
+        if reservation is None:
+            abort(503, message='Reservation {0} could not be updated'.format(reservation_id))
+
+        return jsonify({'data': reservation})
+
+    def patch_params(self):
+        """
+        Get params for patch action
+        """
+
+        return patch_parser.parse_args()
+
+    def delete(self, reservation_id):
+        """
+        Cancel a reservation (?version=3), version must be the one read by the client
+        """
+        params = self.delete_params()
+
+        try:
+            reservation = reservation_controller.cancel_reservation(reservation_id, params['version'])
+        except ReservationNotFoundError, e:
+            abort(404, message=str(e))
+        except ReservationError, e:
+            abort(409, message=str(e))
+
+        if reservation is None:
+            abort(503, message='Reservation {0} could not be cancelled'.format(reservation_id))
+
+        return jsonify({'data': reservation})
+
+    def delete_params(self):
+        """
+        Get params for delete action
+        """
+
+        return delete_parser.parse_args()
+
+
+class ReservationExportAPI(ReservationFiltersMixin, Resource):
+
+    def get(self):
+        """
+        Export reservations by filters as NDJSON, CSV or Arrow, optionally gzipped.
+        The response is streamed so it is never built in memory
+        """
+        params = self.get_params()
+        filters = self.get_filters(params)
+
+        chunks = reservation_controller.export_reservations(
+            filters, params['format'], current_app.config['RS_EXPORT_CHUNK_SIZE'], params['gzip'])
+
+        response = Response(stream_with_context(chunks), mimetype=MIMETYPES[params['format']])
+        if params['gzip']:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    def get_params(self):
+        """
+        Get params for get action
+        """
+
+        return export_parser.parse_args()
+
+
+class ReservationStatusAPI(Resource):
+
+    def get(self, reservation_id):
+        """
+        Get if a reservation accepted with 202 is queued, committed or rejected
+        """
+        status = reservation_controller.reservation_status(reservation_id)
+        if status is None:
+            abort(404, message='Reservation {0} is not known'.format(reservation_id))
+
+        return jsonify({'data': status})
+
+
+class ReservationBulkAPI(Resource):
+
+    def post(self):
+        """
+        Create many reservations in one request
+        """
+        response = reservation_controller.bulk_create_reservations(self.get_items())
+        return jsonify(response)
+
+    def patch(self):
+        """
+        Update many reservations in one request, each item has the id, the version and the values to change
+        """
+        response = reservation_controller.bulk_update_reservations(self.get_items())
+        return jsonify(response)
+
+    def delete(self):
+        """
+        Cancel many reservations in one request, each item has the id and the version
+        """
+        response = reservation_controller.bulk_cancel_reservations(self.get_items())
+        return jsonify(response)
+
+    def get_items(self):
+        """
+        Get the items of the batch sent in data, batches are limited to RS_BULK_MAX_SIZE items
+        """
+        params = bulk_post_parser.parse_args()
+
+        if len(params['data']) > current_app.config['RS_BULK_MAX_SIZE']:
+            abort(413, message='Batches are limited to {0} reservations'.format(current_app.config['RS_BULK_MAX_SIZE']))
+
+        return params['data']
+
+
+class ReservationBatchAPI(Resource):
+
+    def post(self):
+        """
+        Get the reservations of many users and/or events grouped by user_id or event_id
+        """
+        params = self.post_params()
+        user_ids, event_ids = params['user_ids'], params['event_ids']
+
+        if not user_ids and not event_ids:
+            abort(400, message='user_ids or event_ids is required')
+
+        for name, keys in (('user_ids', user_ids), ('event_ids', event_ids)):
+            if keys is None:
+                continue
+            if not keys or not all(isinstance(key, (int, long)) and not isinstance(key, bool) for key in keys):
+                abort(400, message='{0} must be a non empty list of integers'.format(name))
+            if len(keys) > current_app.config['RS_BATCH_MAX_KEYS']:
+                abort(413, message='{0} is limited to {1} keys'.format(name, current_app.config['RS_BATCH_MAX_KEYS']))
+
+        group_by = params['group_by'] or ('user_id' if user_ids else 'event_id')
+        reservations = reservation_controller.select_reservations_by_keys(
+            user_ids, event_ids, group_by, current_app.config['RS_BATCH_CHUNK_SIZE'])
+
+        return jsonify({'data': reservations})
 
     def post_params(self):
         """
         Get params for post action
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('user_id', type=int, location='json', required=True)
-        parser.add_argument('event_id', type=int, location='json', required=True)
+        return batch_post_parser.parse_args()
+
+
+class ReservationCountAPI(Resource):
+
+    def get(self):
+        """
+        Get the number of reservations of one or many users (?user_id=1&user_id=2) or events (?event_id=45)
+        """
+        params = self.get_params()
+
+        if bool(params['user_id']) == bool(params['event_id']):
+            abort(400, message='Send user_id or event_id, but not both')
+
+        kind = 'user_id' if params['user_id'] else 'event_id'
+        key_ids = params[kind]
+
+        if len(key_ids) > current_app.config['RS_BATCH_MAX_KEYS']:
+            abort(413, message='{0} is limited to {1} keys'.format(kind, current_app.config['RS_BATCH_MAX_KEYS']))
+
+        counts = reservation_controller.count_reservations(kind, key_ids)
+        if counts is None:
+            abort(503, message='Counts are not available')
+
+        return jsonify({'data': counts})
+
+    def get_params(self):
+        """
+        Get params for get action
+        """
 
-        return parser.parse_args()
+        return count_parser.parse_args()
@@ -3,6 +3,31 @@ from marshmallow_sqlalchemy import ModelSchema
 
 from reservationservice.app.models import Reservation
 
+RESERVATION_FIELDS = ('id', 'user_id', 'event_id', 'create_date')
+# Fields of single reservation responses, clients send the version back to update or cancel it
+RESERVATION_DETAIL_FIELDS = RESERVATION_FIELDS + ('version', 'cancelled', 'update_date')
+DATE_FORMAT = "%m/%d/%Y"
+
+
+def dump_reservations(reservations):
+    """
+    Serialize reservations with RESERVATION_FIELDS without marshmallow, the output is the same
+    than ReservationShema(many=True, only=RESERVATION_FIELDS) at a fraction of the cost for long lists
+    :param reservations: List of Reservation items
+    :returns list of dicts. Ie [{'id': '2h-34-jh-34', 'user_id': 34, 'event_id': 45, 'create_date': '04/01/2019'}]
+    """
+
+    return [
+        {
+            'id': reservation.id,
+            'user_id': reservation.user_id,
+            'event_id': reservation.event_id,
+            'create_date': reservation.create_date.strftime(DATE_FORMAT)
+        }
+        for reservation in reservations
+    ]
+
+
 class ReservationShema(ModelSchema):
     """
     Serialize Reservation model
@@ -11,11 +36,17 @@ class ReservationShema(ModelSchema):
     class Meta:
         model = Reservation
 
+    # GUID columns are not converted by ModelSchema, ids are their canonical strings
+    id = fields.String()
     create_date = fields.Method("get_create_date", dump_only=True)
     update_date = fields.Method("get_update_date", dump_only=True)
 
     def get_create_date(self, reservation):
-        return reservation.create_date.strftime("%m/%d/%Y")
+        return reservation.create_date.strftime(DATE_FORMAT)
 
     def get_update_date(self, reservation):
-        return reservation.update_date.strftime("%m/%d/%Y")
+        # Reservations never updated have not update_date
+        if reservation.update_date is None:
+            return None
+
+        return reservation.update_date.strftime(DATE_FORMAT)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from Queue import Empty, Queue
+
+from flask import current_app, has_app_context
+
+from reservationservice.app.extensions import get_app_extension
+from reservationservice.app.ids import uuid7
+from reservationservice.app.managers.reservation import BULK_ERROR_MESSAGE, ReservationManager
+from reservationservice.app.metrics import MANAGER_ERRORS
+
+JOURNAL_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+# Journals written before create_date kept its time have only the day
+JOURNAL_DAY_FORMAT = '%Y-%m-%d'
+JOURNAL_PATTERN = 'journal-*.log'
+
+QUEUED = 'queued'
+COMMITTED = 'committed'
+REJECTED = 'rejected'
+
+WRITE_BEHIND_QUEUE_EXTENSION = 'rs_write_behind_queue'
+
+_write_behind_queue_lock = threading.Lock()
+
+
+def parse_journal_date(value):
+    """
+    :param value: String, create_date of a journal record. Ie '2019-04-01T10:30:00.000000'
+    :returns Datetime
+    """
+
+    try:
+        return datetime.strptime(value, JOURNAL_DATE_FORMAT)
+    except ValueError:
+        return datetime.strptime(value, JOURNAL_DAY_FORMAT)
+
+
+class WriteBehindJournal(object):
+    """
+    Append-only file of the reservations accepted by the queue and of the ones already written.
+    Each record is a json line and is fsynced before the append returns, so an accepted reservation
+    survives a crash of the process. The file is locked while it is open, journals of other
+    processes that are not locked were left by a crash and can be taken over.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: String, path of the journal of this process. Ie '/var/lib/reservationservice/journal-1.log'
+        """
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self.records = 0
+
+    def open(self):
+        """
+        Lock and open the journal
+        :returns OrderedDict with the rows accepted and not written by the previous process of the journal
+        :raises IOError when another process has the journal open
+        """
+
+        journal_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(journal_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            journal_file.close()
+            raise
+
+        self.file = journal_file
+
+        self.file.seek(0)
+        pending = self.parse(self.file)
+        self.records = len(pending)
+        return pending
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    @staticmethod
+    def parse(lines):
+        """
+        Replay the records of a journal
+        :param lines: Iterable of json lines
+        :returns OrderedDict with the accepted rows without a done record by id
+        """
+
+        pending = OrderedDict()
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line is cut when the process crashed while writing it, it was never acknowledged
+                continue
+
+            if 'accepted' in record:
+                row = record['accepted']
+                row['create_date'] = parse_journal_date(row['create_date'])
+                pending[row['id']] = row
+            else:
+                for reservation_id in record['done']:
+                    pending.pop(reservation_id, None)
+
+        return pending
+
+    def append_accepted(self, rows):
+        self.append([{'accepted': dict(row, create_date=row['create_date'].strftime(JOURNAL_DATE_FORMAT))}
+                     for row in rows])
+
+    def append_done(self, reservation_ids):
+        self.append([{'done': reservation_ids}])
+
+    def append(self, records):
+        with self.lock:
+            self.file.write(''.join(json.dumps(record) + '\n' for record in records))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.records += len(records)
+
+    def rewrite(self, rows):
+        """
+        Replace the journal with one holding only the pending rows, the new file is locked and
+        fsynced before it is renamed over the old one so it is never left unlocked or half written
+        :param rows: List of the pending rows
+        """
+
+        with self.lock:
+            temporary_path = self.path + '.tmp'
+            new_file = open(temporary_path, 'w+')
+            fcntl.flock(new_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            new_file.write(''.join(
+                json.dumps({'accepted': dict(row, create_date=row['create_date'].strftime(JOURNAL_DATE_FORMAT))}) + '\n'
+                for row in rows
+            ))
+            new_file.flush()
+            os.fsync(new_file.fileno())
+            os.rename(temporary_path, self.path)
+
+            self.file.close()
+            self.file = new_file
+            self.records = len(rows)
+
+
+class WriteBehindQueue(object):
+    """
+    Queue of accepted reservations written to the database by a background thread in batches of
+    batch_size rows or every flush_interval seconds, with one transaction per batch.
+    Batches failing because of the database are retried, rows rejected by the database
+    (the reservation exists, the event is sold out) get the rejected status.
+    """
+
+    def __init__(self, app, directory, batch_size=500, flush_interval=0.05, retry_interval=1.0,
+                 compact_records=10000, status_size=100000):
+        """
+        :param app: Flask application, the writer thread runs in its app context
+        :param directory: String, directory of the journals. Ie '/var/lib/reservationservice'
+        :param batch_size: Int, max rows of each transaction. Ie 500
+        :param flush_interval: Float, max seconds a row waits for its batch to fill. Ie 0.05
+        :param retry_interval: Float, seconds to wait before retrying a batch that failed. Ie 1.0
+        :param compact_records: Int, records of the journal that trigger its compaction. Ie 10000
+        :param status_size: Int, number of finished reservations whose status is remembered. Ie 100000
+        """
+
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.compact_records = compact_records
+        self.status_size = status_size
+
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending = OrderedDict()
+        self.finished = OrderedDict()
+        self.thread = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.journal = WriteBehindJournal(os.path.join(directory, 'journal-{0}.log'.format(os.getpid())))
+
+    def start(self):
+        """
+        Open the journal, take over the journals of crashed processes, queue the rows they did not
+        write and start the writer thread
+        """
+
+        pending = self.journal.open()
+
+        orphans = []
+        for path in sorted(glob.glob(os.path.join(self.directory, JOURNAL_PATTERN))):
+            if path == self.journal.path:
+                continue
+
+            orphan = WriteBehindJournal(path)
+            try:
+                pending.update(orphan.open())
+            except IOError:
+                # The journal is used by a running process
+                continue
+            orphans.append(orphan)
+
+        # Keep only one journal with the pending rows of all the crashed processes, the old ones
+        # are deleted once the rows are safe in it
+        self.journal.rewrite(pending.values())
+        for orphan in orphans:
+            os.unlink(orphan.path)
+            orphan.close()
+
+        for row in pending.values():
+            self.pending[row['id']] = row
+            self.queue.put(row)
+
+        self.thread = threading.Thread(target=self.run, name='write-behind')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Write the queued rows and stop the writer thread
+        :param timeout: Float, max seconds to wait. Ie 10
+        """
+
+        if self.thread is None:
+            return
+
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+        if not self.thread.is_alive():
+            self.thread = None
+            self.journal.close()
+
+    def submit(self, data):
+        """
+        Accept a reservation, it is saved in the journal before it is queued
+        :param data: Dictionary with the data to create. Ie {'user_id': 34, 'event_id': 45}
+        :returns dict with the row that will be written. Ie {'id': '2h-34-jh-34', 'user_id': 34, ...}
+        """
+
+        row = {
+            'id': uuid7(),
+            'user_id': data['user_id'],
+            'event_id': data['event_id'],
+            'create_date': datetime.utcnow()
+        }
+
+        # A compaction between the append and the insert in pending would drop the row from the journal
+        with self.lock:
+            self.journal.append_accepted([row])
+            self.pending[row['id']] = row
+        self.queue.put(row)
+
+        return row
+
+    def status(self, reservation_id):
+        """
+        Get the status of a reservation accepted by this process
+        :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+        :returns dict or None if the reservation is not known. Ie {'id': '2h-34-jh-34', 'status': 'rejected',
+            'message': 'event is sold out'}
+        """
+
+        with self.lock:
+            if reservation_id in self.pending:
+                return {'id': reservation_id, 'status': QUEUED}
+
+            return self.finished.get(reservation_id)
+
+    def flush(self, timeout=None):
+        """
+        Wait until all the accepted reservations are written or rejected
+        :param timeout: Float, max seconds to wait. Ie 10
+        :returns Boolean, True if nothing is pending
+        """
+
+        deadline = time.time() + timeout if timeout is not None else None
+
+        with self.idle:
+            while self.pending:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+
+        return True
+
+    def run(self):
+        batch, stopping = [], False
+
+        # After stop the rows still queued are written before the thread ends
+        while not (stopping and not batch and self.queue.empty()):
+            stopping = self.fill_batch(batch) or stopping
+
+            if batch:
+                batch = self.write(batch)
+                if batch:
+                    time.sleep(self.retry_interval)
+
+    def fill_batch(self, batch):
+        """
+        Add rows of the queue to batch until it has batch_size rows or the oldest row waited flush_interval
+        :param batch: List, rows to write, it may have rows of a batch that failed
+        :returns Boolean, True if the queue was stopped
+        """
+
+        deadline = None
+
+        while len(batch) < self.batch_size:
+            if not batch:
+                row = self.queue.get()
+            else:
+                deadline = deadline or time.time() + self.flush_interval
+                try:
+                    row = self.queue.get(timeout=max(deadline - time.time(), 0))
+                except Empty:
+                    return False
+
+            if row is None:
+                return True
+
+            batch.append(row)
+
+        return False
+
+    def write(self, batch):
+        """
+        Write a batch in one transaction
+        :param batch: List, rows to write
+        :returns list of the rows that must be retried
+        """
+
+        try:
+            with self.app.app_context():
+                manager = ReservationManager()
+
+                # Rows of a retried or replayed batch may have been committed before the failure
+                committed_ids = manager.get_existing_ids([row['id'] for row in batch])
+                rows = [row for row in batch if row['id'] not in committed_ids]
+
+                errors = manager.bulk_create(rows, preassigned=True)[1] if rows else []
+        except Exception, e:
+            error_message = "Error writing {0} queued reservations. Detail error {1}".format(len(batch), e)
+            print error_message
+            MANAGER_ERRORS.inc(operation='write_behind')
+            return batch
+
+        retry, rejected = [], {}
+        for error in errors:
+            if error['message'] == BULK_ERROR_MESSAGE:
+                retry.append(rows[error['index']])
+            else:
+                rejected[rows[error['index']]['id']] = error['message']
+
+        retry_ids = set(row['id'] for row in retry)
+        done_ids = [row['id'] for row in batch if row['id'] not in retry_ids]
+
+        if done_ids:
+            self.journal.append_done(done_ids)
+            self.finish(done_ids, rejected)
+
+        if self.journal.records >= self.compact_records:
+            # Submits wait for the rewrite, a row accepted meanwhile is appended to the new journal
+            with self.lock:
+                self.journal.rewrite(self.pending.values())
+
+        return retry
+
+    def finish(self, reservation_ids, rejected):
+        with self.idle:
+            for reservation_id in reservation_ids:
+                self.pending.pop(reservation_id, None)
+
+                status = {'id': reservation_id, 'status': COMMITTED}
+                if reservation_id in rejected:
+                    status = {'id': reservation_id, 'status': REJECTED, 'message': rejected[reservation_id]}
+                self.finished[reservation_id] = status
+
+            while len(self.finished) > self.status_size:
+                self.finished.popitem(last=False)
+
+            if not self.pending:
+                self.idle.notify_all()
+
+
+def start_write_behind_queue(app):
+    """
+    Build and start the write-behind queue of app from its config:
+    RS_WRITE_BEHIND_DIR, RS_WRITE_BEHIND_BATCH_SIZE and RS_WRITE_BEHIND_FLUSH_MS
+    :param app: Flask application
+    :returns WriteBehindQueue
+    """
+
+    config = app.config
+    queue = WriteBehindQueue(
+        app,
+        config['RS_WRITE_BEHIND_DIR'],
+        batch_size=config['RS_WRITE_BEHIND_BATCH_SIZE'],
+        flush_interval=config['RS_WRITE_BEHIND_FLUSH_MS'] / 1000.0
+    )
+    queue.start()
+    atexit.register(queue.stop, config['RS_WRITE_BEHIND_FLUSH_MS'] / 1000.0 + 10)
+    return queue
+
+
+def get_write_behind_queue():
+    """
+    Get the write-behind queue of the application, it is built and started on first use
+    :returns WriteBehindQueue
+    """
+
+    return get_app_extension(WRITE_BEHIND_QUEUE_EXTENSION, _write_behind_queue_lock, start_write_behind_queue)
+
+
+def get_queued_status(reservation_id):
+    """
+    Get the status of a reservation accepted by the write-behind queue of the process
+    :param reservation_id: String, id of the reservation. Ie '2h-34-jh-34'
+    :returns dict or None if the reservation is not known or the queue was not started
+    """
+
+    queue = current_app.extensions.get(WRITE_BEHIND_QUEUE_EXTENSION) if has_app_context() else None
+    if queue is None:
+        return None
+
+    return queue.status(reservation_id)
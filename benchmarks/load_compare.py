@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the WSGI server (run.py runserver) and the cooperative server (run_async.py)
+driving the same GET/POST /reservation mix at the same concurrency.
+
+Start both servers against the same database (a local Postgres, or a sqlite file through
+RS_DATABASE_URI as an in-memory stand-in), then:
+
+Usage: python -m reservationservice.benchmarks.load_compare \\
+    --url wsgi=http://localhost:5430 --url async=http://localhost:5431 --concurrency 50 --requests 5000
+"""
+
+import argparse
+import json
+import random
+import urllib2
+
+from reservationservice.benchmarks.common import print_summary, run_load, summarize
+
+
+def send(base_url, method, users, events):
+    """
+    Send one request of the mix and return its status code
+    """
+
+    if method == 'POST':
+        body = json.dumps({'user_id': random.randint(1, users), 'event_id': random.randint(1, events)})
+        request = urllib2.Request(base_url + '/reservation', body, {'Content-Type': 'application/json'})
+    else:
+        request = urllib2.Request('{0}/reservation?event_id={1}&limit=50'.format(base_url, random.randint(1, events)))
+
+    try:
+        response = urllib2.urlopen(request, timeout=60)
+        response.read()
+        return response.getcode()
+    except urllib2.HTTPError, e:
+        e.read()
+        return e.code
+
+
+def run(base_url, concurrency, requests, write_ratio, users, events):
+    """
+    Drive requests from concurrency threads
+    :returns tuple with latencies by method and the elapsed seconds
+    """
+
+    latencies, _, elapsed = run_load(
+        lambda: lambda method: send(base_url, method, users, events), concurrency, requests, write_ratio)
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare reservation servers under the same load')
+    parser.add_argument('--url', action='append', required=True, help='name=base_url of a server to compare')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=1000)
+    args = parser.parse_args()
+
+    for server in args.url:
+        name, base_url = server.split('=', 1)
+        latencies, elapsed = run(base_url.rstrip('/'), args.concurrency, args.requests,
+                                 args.write_ratio, args.users, args.events)
+
+        print '{0}: {1:.1f} requests/s at concurrency {2}'.format(name, args.requests / elapsed, args.concurrency)
+        for method in ('GET', 'POST'):
+            if latencies[method]:
+                print_summary('  {0} {1}'.format(name, method), summarize(latencies[method]))
+
+
+if __name__ == '__main__':
+    main()
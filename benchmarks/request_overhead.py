@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the per-request overhead of the GET /reservation hot path that does not depend on the db:
+building controllers, parsers and schemas, parsing args and serializing the reservations list.
+
+Usage: python -m reservationservice.benchmarks.request_overhead --rows 100
+"""
+
+import argparse
+import timeit
+import uuid
+from datetime import datetime
+
+from flask_restful import inputs, reqparse
+
+from reservationservice.app import app
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.models import Reservation
+from reservationservice.app.resources.reservation import get_parser
+from reservationservice.app.schemas import RESERVATION_FIELDS, ReservationShema, dump_reservations
+
+
+def build_get_parser():
+    """
+    Build the GET parser the way it was built on every request
+    """
+
+    parser = reqparse.RequestParser()
+    parser.add_argument('user_id', type=int, location='args')
+    parser.add_argument('event_id', type=int, location='args')
+    parser.add_argument('limit', type=inputs.positive, location='args')
+    parser.add_argument('cursor', type=str, location='args')
+    parser.add_argument('stream', type=inputs.boolean, location='args', default=False)
+    return parser
+
+
+def per_request_objects(reservations):
+    ReservationController()
+    build_get_parser().parse_args()
+    return ReservationShema(many=True, only=RESERVATION_FIELDS).dump(reservations).data
+
+
+def long_lived_objects(reservations):
+    get_parser.parse_args()
+    return dump_reservations(reservations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-request overhead of GET /reservation')
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--number', type=int, default=1000)
+    args = parser.parse_args()
+
+    reservations = [
+        Reservation(id=str(uuid.uuid4()), user_id=index, event_id=45, create_date=datetime.utcnow())
+        for index in xrange(args.rows)
+    ]
+
+    with app.test_request_context('/reservation?event_id=45&limit={0}'.format(args.rows)):
+        assert per_request_objects(reservations) == long_lived_objects(reservations)
+
+        for name, function in (('per-request objects + marshmallow', per_request_objects),
+                               ('long-lived objects + fast dump', long_lived_objects)):
+            seconds = timeit.timeit(lambda: function(reservations), number=args.number)
+            print '{0:<40} {1:10.1f}us per request ({2} rows)'.format(name, seconds / args.number * 1e6, args.rows)
+
+
+if __name__ == '__main__':
+    main()
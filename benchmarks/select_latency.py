@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure reservation lookup latency without and with the lookup indexes.
+
+Usage: python -m reservationservice.benchmarks.select_latency --rows 1000000
+
+The reservations of the benchmarked database are deleted.
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import text
+
+from reservationservice.app.models import Reservation
+from reservationservice.benchmarks.common import get_engine, print_summary, reset_reservations, seed_reservations, summarize
+
+# Indexes dropped and created again, the unique (user_id, event_id) index does not exist on the partitioned
+# table of Postgres, its pairs are kept unique by reservation_pairs
+LOOKUP_INDEXES = ('ix_reservations_user_id_create_date', 'ix_reservations_event_id_create_date')
+
+LOOKUPS = (
+    ('user_id', text('SELECT * FROM reservations WHERE user_id = :user_id ORDER BY create_date')),
+    ('event_id', text('SELECT * FROM reservations WHERE event_id = :event_id ORDER BY create_date')),
+    ('user_id and event_id', text('SELECT * FROM reservations WHERE user_id = :user_id AND event_id = :event_id')),
+)
+
+
+def measure(engine, users, events, queries):
+    """
+    Run random lookups of each kind
+    :returns dict with the summary of each lookup
+    """
+
+    results = {}
+    connection = engine.connect()
+
+    try:
+        for name, statement in LOOKUPS:
+            latencies = []
+            for _ in xrange(queries):
+                params = {'user_id': random.randint(1, users), 'event_id': random.randint(1, events)}
+                start = time.time()
+                connection.execute(statement, **params).fetchall()
+                latencies.append(time.time() - start)
+
+            results[name] = summarize(latencies)
+
+    finally:
+        connection.close()
+
+    return results
+
+
+def index_exists(engine, index):
+    """
+    Check if index is already created in the database
+    """
+
+    return engine.execute(text('SELECT to_regclass(:name)'), name=index.name).scalar() is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reservation lookups latency before and after indexes')
+    parser.add_argument('--database-uri', default=None)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--events-per-user', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_uri)
+    indexes = [index for index in Reservation.__table__.indexes if index.name in LOOKUP_INDEXES]
+    users = args.rows // args.events_per_user
+
+    reset_reservations(engine)
+    for index in indexes:
+        if index_exists(engine, index):
+            index.drop(engine)
+
+    seconds = seed_reservations(engine, args.rows, events=args.events, events_per_user=args.events_per_user)
+    print 'Seeded {0} rows in {1:.1f}s'.format(args.rows, seconds)
+
+    before = measure(engine, users, args.events, args.queries)
+
+    for index in indexes:
+        index.create(engine)
+    engine.execute('ANALYZE reservations')
+
+    after = measure(engine, users, args.events, args.queries)
+
+    for name, _ in LOOKUPS:
+        print_summary('{0} without indexes'.format(name), before[name])
+        print_summary('{0} with indexes'.format(name), after[name])
+
+
+if __name__ == '__main__':
+    main()
@@ -12,3 +12,88 @@ SQLALCHEMY_DATABASE_URI = os.environ.get('RS_DATABASE_URI') or \
 
 RS_API_URL = os.environ.get('RS_API_URL') or \
     "http://localhost:5430/reservationservice/api/v1.0"
+
+# Pagination of GET /reservation
+RS_PAGE_SIZE = int(os.environ.get('RS_PAGE_SIZE', 100))
+RS_MAX_PAGE_SIZE = int(os.environ.get('RS_MAX_PAGE_SIZE', 1000))
+RS_STREAM_CHUNK_SIZE = int(os.environ.get('RS_STREAM_CHUNK_SIZE', 1000))
+
+# Rows fetched and serialized at once by GET /reservation/export and the export_reservations command
+RS_EXPORT_CHUNK_SIZE = int(os.environ.get('RS_EXPORT_CHUNK_SIZE', 10000))
+
+# Max number of reservations in a POST /reservation/bulk
+RS_BULK_MAX_SIZE = int(os.environ.get('RS_BULK_MAX_SIZE', 5000))
+
+# Cache of reservation reads: 'none', 'memory' (per process) or 'redis' (shared by all processes)
+RS_CACHE_BACKEND = os.environ.get('RS_CACHE_BACKEND', 'none')
+RS_CACHE_TTL = int(os.environ.get('RS_CACHE_TTL', 30))
+RS_CACHE_MAX_SIZE = int(os.environ.get('RS_CACHE_MAX_SIZE', 10000))
+RS_CACHE_REDIS_URL = os.environ.get('RS_CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+
+# Database connection pool
+SQLALCHEMY_POOL_SIZE = int(os.environ.get('RS_DB_POOL_SIZE', 10))
+SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('RS_DB_MAX_OVERFLOW', 10))
+SQLALCHEMY_POOL_TIMEOUT = int(os.environ.get('RS_DB_POOL_TIMEOUT', 10))
+SQLALCHEMY_POOL_RECYCLE = int(os.environ.get('RS_DB_POOL_RECYCLE', 1800))
+RS_DB_POOL_PRE_PING = os.environ.get('RS_DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Milliseconds, 0 disables the timeout
+RS_DB_STATEMENT_TIMEOUT = int(os.environ.get('RS_DB_STATEMENT_TIMEOUT', 30000))
+
+# Read replicas of GET /reservation reads, comma separated URIs (none by default). Replicas are chosen
+# 'round_robin' or 'least_loaded', a failed replica is not used for RS_DB_REPLICA_RETRY_SECONDS and a
+# client that writes reads from the primary for RS_DB_READ_YOUR_WRITES_SECONDS
+RS_DB_REPLICA_URIS = [uri.strip() for uri in os.environ.get('RS_DB_REPLICA_URIS', '').split(',') if uri.strip()]
+RS_DB_REPLICA_SELECTION = os.environ.get('RS_DB_REPLICA_SELECTION', 'round_robin')
+RS_DB_REPLICA_RETRY_SECONDS = int(os.environ.get('RS_DB_REPLICA_RETRY_SECONDS', 30))
+RS_DB_READ_YOUR_WRITES_SECONDS = int(os.environ.get('RS_DB_READ_YOUR_WRITES_SECONDS', 5))
+
+# Admission control. Token buckets of POST /reservation by client and by event: 'none', 'memory' (per process)
+# or 'redis' (shared by all processes). Clients are identified by RS_RATE_LIMIT_CLIENT_HEADER (an API key
+# header or X-Forwarded-For set by the proxy in front of the service, its last address is used) or by their
+# address. Requests in flight are limited to RS_MAX_CONCURRENT_REQUESTS (by default the connections of the db
+# pool, 0 disables the limit) and wait RS_ADMISSION_TIMEOUT_MS for a slot before a 503
+RS_RATE_LIMIT_BACKEND = os.environ.get('RS_RATE_LIMIT_BACKEND', 'none')
+RS_RATE_LIMIT_REDIS_URL = os.environ.get('RS_RATE_LIMIT_REDIS_URL') or RS_CACHE_REDIS_URL
+RS_RATE_LIMIT_CLIENT_HEADER = os.environ.get('RS_RATE_LIMIT_CLIENT_HEADER')
+RS_RATE_LIMIT_CLIENT_RATE = float(os.environ.get('RS_RATE_LIMIT_CLIENT_RATE', 5))
+RS_RATE_LIMIT_CLIENT_BURST = int(os.environ.get('RS_RATE_LIMIT_CLIENT_BURST', 10))
+RS_RATE_LIMIT_EVENT_RATE = float(os.environ.get('RS_RATE_LIMIT_EVENT_RATE', 200))
+RS_RATE_LIMIT_EVENT_BURST = int(os.environ.get('RS_RATE_LIMIT_EVENT_BURST', 400))
+RS_MAX_CONCURRENT_REQUESTS = int(os.environ['RS_MAX_CONCURRENT_REQUESTS']) \
+    if os.environ.get('RS_MAX_CONCURRENT_REQUESTS') else None
+RS_ADMISSION_TIMEOUT_MS = int(os.environ.get('RS_ADMISSION_TIMEOUT_MS', 100))
+
+# GET /reservation/changes: default and max changes of a response, max seconds a long poll waits, max seconds
+# between its reads while it waits and hours the changes are kept by the purge_reservation_changes command
+RS_FEED_PAGE_SIZE = int(os.environ.get('RS_FEED_PAGE_SIZE', 100))
+RS_FEED_MAX_PAGE_SIZE = int(os.environ.get('RS_FEED_MAX_PAGE_SIZE', 1000))
+RS_FEED_MAX_WAIT_SECONDS = int(os.environ.get('RS_FEED_MAX_WAIT_SECONDS', 30))
+RS_FEED_POLL_SECONDS = float(os.environ.get('RS_FEED_POLL_SECONDS', 1))
+RS_FEED_RETENTION_HOURS = int(os.environ.get('RS_FEED_RETENTION_HOURS', 168))
+
+# In-memory index of the reservations of the events on sale: events loaded before the first request (comma
+# separated, more can be loaded with PUT /admin/hot_events/<event_id>) and max milliseconds the index lags
+# behind the writes of the other processes
+RS_HOT_EVENT_IDS = [int(event_id) for event_id in os.environ.get('RS_HOT_EVENT_IDS', '').split(',') if event_id.strip()]
+RS_HOT_INDEX_MAX_LAG_MS = int(os.environ.get('RS_HOT_INDEX_MAX_LAG_MS', 1000))
+
+# Hours an Idempotency-Key of POST /reservation is remembered
+RS_IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('RS_IDEMPOTENCY_KEY_TTL_HOURS', 48))
+
+# POST /reservation/batch: max keys of each list and max keys sent in each query
+RS_BATCH_MAX_KEYS = int(os.environ.get('RS_BATCH_MAX_KEYS', 50000))
+RS_BATCH_CHUNK_SIZE = int(os.environ.get('RS_BATCH_CHUNK_SIZE', 1000))
+
+# Write-behind mode of POST /reservation: reservations are accepted with 202 and written in batches
+# of RS_WRITE_BEHIND_BATCH_SIZE rows or every RS_WRITE_BEHIND_FLUSH_MS milliseconds. Accepted
+# reservations are kept in a journal in RS_WRITE_BEHIND_DIR until they are written.
+RS_WRITE_BEHIND = os.environ.get('RS_WRITE_BEHIND', 'false').lower() == 'true'
+RS_WRITE_BEHIND_DIR = os.environ.get('RS_WRITE_BEHIND_DIR') or os.path.join(basedir, 'write_behind')
+RS_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('RS_WRITE_BEHIND_BATCH_SIZE', 500))
+RS_WRITE_BEHIND_FLUSH_MS = int(os.environ.get('RS_WRITE_BEHIND_FLUSH_MS', 50))
+
+# Monthly partitions of the reservations table kept by the maintain_partitions command: months created
+# ahead, months kept attached (0 keeps all of them) and schema of the detached ones
+RS_PARTITION_MONTHS_AHEAD = int(os.environ.get('RS_PARTITION_MONTHS_AHEAD', 3))
+RS_PARTITION_RETENTION_MONTHS = int(os.environ.get('RS_PARTITION_RETENTION_MONTHS', 0))
+RS_PARTITION_ARCHIVE_SCHEMA = os.environ.get('RS_PARTITION_ARCHIVE_SCHEMA') or 'reservations_archive'
@@ -0,0 +1,45 @@
+"""reservation uuid ids
+
+Revision ID: 28a0c2f96fc4
+Revises: a161980c2b9a
+Create Date: 2026-10-18 16:20:37.251904
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '28a0c2f96fc4'
+down_revision = 'a161980c2b9a'
+
+from alembic import op
+
+UUID_PATTERN = '^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$'
+
+
+def upgrade():
+    """
+    Store reservation ids as native uuid (16 bytes instead of 37 bytes of text in the table and in every index).
+    Existing ids keep their value so the clients holding them still find their reservations, new ids are
+    time-ordered UUIDv7 generated by the application.
+    """
+    bind = op.get_bind()
+
+    for table, column in (('reservations', 'id'), ('reservation_idempotency_keys', 'reservation_id')):
+        invalid = bind.execute(
+            "SELECT count(*) FROM {0} WHERE {1} !~ '{2}'".format(table, column, UUID_PATTERN)
+        ).scalar()
+        if invalid:
+            raise Exception('{0} rows of {1} have a {2} that is not a UUID, fix them before upgrading'.format(
+                invalid, table, column))
+
+    op.execute("ALTER TABLE reservations ALTER COLUMN id TYPE uuid USING id::uuid")
+    op.execute(
+        "ALTER TABLE reservation_idempotency_keys ALTER COLUMN reservation_id TYPE uuid USING reservation_id::uuid")
+
+
+def downgrade():
+    """
+    Store reservation ids as text
+    """
+    op.execute(
+        "ALTER TABLE reservation_idempotency_keys ALTER COLUMN reservation_id TYPE varchar(100) USING reservation_id::text")
+    op.execute("ALTER TABLE reservations ALTER COLUMN id TYPE varchar(100) USING id::text")
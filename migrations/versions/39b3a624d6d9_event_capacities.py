@@ -0,0 +1,34 @@
+"""event capacities
+
+Revision ID: 39b3a624d6d9
+Revises: a6d47cac7dc4
+Create Date: 2026-10-18 14:21:09.184723
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '39b3a624d6d9'
+down_revision = 'a6d47cac7dc4'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Create table event_capacities, events without a row have unlimited capacity
+    """
+    op.create_table(
+        'event_capacities',
+        sa.Column('event_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('capacity', sa.Integer, nullable=False),
+        sa.Column('remaining', sa.Integer, nullable=False),
+        sa.CheckConstraint('remaining >= 0', name='ck_event_capacities_remaining')
+    )
+
+
+def downgrade():
+    """
+    Delete table
+    """
+    op.drop_table('event_capacities')
@@ -0,0 +1,34 @@
+"""reservation idempotency keys
+
+Revision ID: 3b8f1d2a7c4e
+Revises: eca1500832c1
+Create Date: 2026-10-18 11:40:02.118734
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3b8f1d2a7c4e'
+down_revision = 'eca1500832c1'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Create table reservation_idempotency_keys
+    """
+    op.create_table(
+        'reservation_idempotency_keys',
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('reservation_id', sa.String(100), nullable=False),
+        sa.Column('create_date', sa.DateTime, nullable=False, server_default=sa.func.now())
+    )
+    op.create_index('ix_reservation_idempotency_keys_create_date', 'reservation_idempotency_keys', ['create_date'])
+
+
+def downgrade():
+    """
+    Delete table
+    """
+    op.drop_table('reservation_idempotency_keys')
@@ -0,0 +1,112 @@
+"""reservations monthly partitions
+
+Revision ID: 6488ee377007
+Revises: 39b3a624d6d9
+Create Date: 2026-10-18 15:02:44.918306
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6488ee377007'
+down_revision = '39b3a624d6d9'
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+# Months created after the current one, later months are created by the maintain_partitions command
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    """
+    Rebuild table reservations partitioned by month of create_date (Postgres 11 or later).
+
+    Unique indexes of a partitioned table must include the partition key, so the primary key becomes
+    (id, create_date) and the unique (user_id, event_id) moves to table reservation_pairs, filled by a
+    trigger of the inserts. A duplicated pair still fails the insert with a unique violation.
+    """
+    bind = op.get_bind()
+
+    op.rename_table('reservations', 'reservations_unpartitioned')
+    op.drop_index('ux_reservations_user_id_event_id', 'reservations_unpartitioned')
+    op.drop_index('ix_reservations_event_id_create_date', 'reservations_unpartitioned')
+    op.drop_index('ix_reservations_user_id_create_date', 'reservations_unpartitioned')
+
+    op.execute(
+        "CREATE TABLE reservations ("
+        "id VARCHAR(100) NOT NULL, "
+        "user_id INTEGER NOT NULL, "
+        "event_id INTEGER NOT NULL, "
+        "create_date TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(), "
+        "update_date TIMESTAMP WITHOUT TIME ZONE, "
+        "PRIMARY KEY (id, create_date)"
+        ") PARTITION BY RANGE (create_date)"
+    )
+    op.execute("CREATE TABLE reservations_default PARTITION OF reservations DEFAULT")
+
+    first_day = bind.execute("SELECT min(create_date) FROM reservations_unpartitioned").scalar()
+    current_month = date.today().replace(day=1)
+    month = first_day.date().replace(day=1) if first_day else current_month
+
+    while month <= add_months(current_month, MONTHS_AHEAD):
+        op.execute(
+            "CREATE TABLE reservations_p{0:%Y%m} PARTITION OF reservations FOR VALUES FROM ('{0:%Y-%m-%d}') TO ('{1:%Y-%m-%d}')"
+            .format(month, add_months(month, 1))
+        )
+        month = add_months(month, 1)
+
+    op.create_index('ix_reservations_user_id_create_date', 'reservations', ['user_id', 'create_date'])
+    op.create_index('ix_reservations_event_id_create_date', 'reservations', ['event_id', 'create_date'])
+
+    op.execute("INSERT INTO reservations SELECT id, user_id, event_id, create_date, update_date FROM reservations_unpartitioned")
+    op.drop_table('reservations_unpartitioned')
+
+    op.create_table(
+        'reservation_pairs',
+        sa.Column('user_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('event_id', sa.Integer, primary_key=True, autoincrement=False)
+    )
+    op.execute("INSERT INTO reservation_pairs SELECT user_id, event_id FROM reservations")
+
+    op.execute(
+        "CREATE FUNCTION reservation_pairs_insert() RETURNS trigger AS $$ "
+        "BEGIN "
+        "INSERT INTO reservation_pairs (user_id, event_id) VALUES (NEW.user_id, NEW.event_id); "
+        "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER reservations_pairs_insert AFTER INSERT ON reservations "
+        "FOR EACH ROW EXECUTE PROCEDURE reservation_pairs_insert()"
+    )
+
+
+def downgrade():
+    """
+    Rebuild table reservations without partitions, archived partitions are not restored
+    """
+    op.rename_table('reservations', 'reservations_partitioned')
+
+    op.create_table(
+        'reservations',
+        sa.Column('id', sa.String(100), primary_key=True),
+        sa.Column('user_id', sa.Integer, nullable=False),
+        sa.Column('event_id', sa.Integer, nullable=False),
+        sa.Column('create_date', sa.DateTime, nullable=False, server_default=sa.func.now()),
+        sa.Column('update_date', sa.DateTime, nullable=True)
+    )
+    op.execute("INSERT INTO reservations SELECT id, user_id, event_id, create_date, update_date FROM reservations_partitioned")
+    op.execute("DROP TABLE reservations_partitioned")
+    op.execute("DROP FUNCTION reservation_pairs_insert()")
+    op.drop_table('reservation_pairs')
+
+    op.create_index('ix_reservations_user_id_create_date', 'reservations', ['user_id', 'create_date'])
+    op.create_index('ix_reservations_event_id_create_date', 'reservations', ['event_id', 'create_date'])
+    op.create_index('ux_reservations_user_id_event_id', 'reservations', ['user_id', 'event_id'], unique=True)
@@ -0,0 +1,31 @@
+"""reservation counter versions
+
+Revision ID: a161980c2b9a
+Revises: 6488ee377007
+Create Date: 2026-10-18 15:48:20.613372
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a161980c2b9a'
+down_revision = '6488ee377007'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Add column version to reservation_counters, bumped on every write of the user or event reservations
+    """
+    op.add_column(
+        'reservation_counters',
+        sa.Column('version', sa.Integer, nullable=False, server_default='0')
+    )
+
+
+def downgrade():
+    """
+    Delete column
+    """
+    op.drop_column('reservation_counters', 'version')
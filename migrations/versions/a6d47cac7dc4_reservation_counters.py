@@ -0,0 +1,42 @@
+"""reservation counters
+
+Revision ID: a6d47cac7dc4
+Revises: 3b8f1d2a7c4e
+Create Date: 2026-10-18 13:05:47.530291
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a6d47cac7dc4'
+down_revision = '3b8f1d2a7c4e'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Create table reservation_counters with the current counts by user and by event
+    """
+    op.create_table(
+        'reservation_counters',
+        sa.Column('kind', sa.String(10), primary_key=True),
+        sa.Column('key_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('count', sa.Integer, nullable=False, server_default='0')
+    )
+
+    op.execute(
+        "INSERT INTO reservation_counters (kind, key_id, count) "
+        "SELECT 'user_id', user_id, count(*) FROM reservations GROUP BY user_id"
+    )
+    op.execute(
+        "INSERT INTO reservation_counters (kind, key_id, count) "
+        "SELECT 'event_id', event_id, count(*) FROM reservations GROUP BY event_id"
+    )
+
+
+def downgrade():
+    """
+    Delete table
+    """
+    op.drop_table('reservation_counters')
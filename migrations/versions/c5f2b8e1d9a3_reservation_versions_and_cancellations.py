@@ -0,0 +1,56 @@
+"""reservation versions and cancellations
+
+Revision ID: c5f2b8e1d9a3
+Revises: 28a0c2f96fc4
+Create Date: 2026-10-18 17:12:05.402118
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c5f2b8e1d9a3'
+down_revision = '28a0c2f96fc4'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Add columns version (optimistic locking of updates) and cancelled (soft deletes) to reservations.
+    Updates can change user_id and event_id, so reservation_pairs follows them with a trigger of the updates;
+    a pair already reserved fails the update with a unique violation.
+    """
+    op.add_column('reservations', sa.Column('version', sa.Integer, nullable=False, server_default='1'))
+    op.add_column('reservations', sa.Column('cancelled', sa.Boolean, nullable=False, server_default=sa.false()))
+
+    op.execute(
+        "CREATE FUNCTION reservation_pairs_update() RETURNS trigger AS $$ "
+        "BEGIN "
+        "DELETE FROM reservation_pairs WHERE user_id = OLD.user_id AND event_id = OLD.event_id; "
+        "INSERT INTO reservation_pairs (user_id, event_id) VALUES (NEW.user_id, NEW.event_id); "
+        "RETURN NULL; "
+        "END $$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER reservations_pairs_update AFTER UPDATE OF user_id, event_id ON reservations "
+        "FOR EACH ROW WHEN (OLD.user_id <> NEW.user_id OR OLD.event_id <> NEW.event_id) "
+        "EXECUTE PROCEDURE reservation_pairs_update()"
+    )
+
+
+def downgrade():
+    """
+    Delete trigger and columns, cancelled reservations are deleted
+    """
+    op.execute("DROP TRIGGER reservations_pairs_update ON reservations")
+    op.execute("DROP FUNCTION reservation_pairs_update()")
+
+    op.execute(
+        "DELETE FROM reservation_pairs USING reservations "
+        "WHERE reservations.cancelled AND reservation_pairs.user_id = reservations.user_id "
+        "AND reservation_pairs.event_id = reservations.event_id"
+    )
+    op.execute("DELETE FROM reservations WHERE cancelled")
+
+    op.drop_column('reservations', 'cancelled')
+    op.drop_column('reservations', 'version')
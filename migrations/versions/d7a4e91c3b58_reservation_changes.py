@@ -0,0 +1,42 @@
+"""reservation changes
+
+Revision ID: d7a4e91c3b58
+Revises: c5f2b8e1d9a3
+Create Date: 2026-10-18 18:02:44.615093
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd7a4e91c3b58'
+down_revision = 'c5f2b8e1d9a3'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+def upgrade():
+    """
+    Create table reservation_changes, the outbox of the changes feed. Rows are read in (tx_id, id) order
+    and purged by create_date
+    """
+    op.create_table(
+        'reservation_changes',
+        sa.Column('id', sa.BigInteger, primary_key=True),
+        sa.Column('tx_id', sa.BigInteger),
+        sa.Column('type', sa.String(10), nullable=False),
+        sa.Column('reservation_id', postgresql.UUID, nullable=False),
+        sa.Column('user_id', sa.Integer, nullable=False),
+        sa.Column('event_id', sa.Integer, nullable=False),
+        sa.Column('version', sa.Integer, nullable=False),
+        sa.Column('create_date', sa.DateTime, nullable=False, server_default=sa.func.now())
+    )
+    op.create_index('ix_reservation_changes_tx_id_id', 'reservation_changes', ['tx_id', 'id'])
+    op.create_index('ix_reservation_changes_create_date', 'reservation_changes', ['create_date'])
+
+
+def downgrade():
+    """
+    Delete table
+    """
+    op.drop_table('reservation_changes')
@@ -0,0 +1,50 @@
+"""reservation lookup indexes
+
+Revision ID: eca1500832c1
+Revises: 44567dfc2c69
+Create Date: 2026-10-18 09:12:31.402113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'eca1500832c1'
+down_revision = '44567dfc2c69'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """
+    Rename table reservation to reservations (the name used by the model)
+    and create the indexes used by the user_id / event_id lookups.
+    Retries may have left duplicated (user_id, event_id) rows, the unique index can not be built with them and
+    they are reservations of customers, so the upgrade stops until they are resolved
+    """
+    bind = op.get_bind()
+
+    duplicated = bind.execute(
+        "SELECT coalesce(sum(copies - 1), 0) FROM ("
+        "SELECT count(*) AS copies FROM reservation GROUP BY user_id, event_id HAVING count(*) > 1"
+        ") AS pairs"
+    ).scalar()
+    if duplicated:
+        raise Exception('{0} rows of reservation repeat the (user_id, event_id) of an older one, '
+                        'resolve them before upgrading'.format(duplicated))
+
+    op.rename_table('reservation', 'reservations')
+
+    op.create_index('ix_reservations_user_id_create_date', 'reservations', ['user_id', 'create_date'])
+    op.create_index('ix_reservations_event_id_create_date', 'reservations', ['event_id', 'create_date'])
+    op.create_index('ux_reservations_user_id_event_id', 'reservations', ['user_id', 'event_id'], unique=True)
+
+
+def downgrade():
+    """
+    Delete indexes and restore table name
+    """
+    op.drop_index('ux_reservations_user_id_event_id', 'reservations')
+    op.drop_index('ix_reservations_event_id_create_date', 'reservations')
+    op.drop_index('ix_reservations_user_id_create_date', 'reservations')
+
+    op.rename_table('reservations', 'reservation')
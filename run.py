@@ -1,56 +1,126 @@
 #!flask/bin/python
-import os
-import rollbar
-import rollbar.contrib.flask
+import gzip
 import sys
+from datetime import datetime, timedelta
 
-from flask import got_request_exception
-from flask.ext.script import Server, Manager, Shell
-from flask.ext.migrate import Migrate, MigrateCommand
-from flask.ext.sqlalchemy import SQLAlchemy
+from flask import current_app
+from flask_script import Server, Manager, Shell
 
-from reservationservice.app import app, models, api
+from reservationservice.app import db, get_app
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.export import export_formats
+from reservationservice.app.managers.change import ReservationChangeManager
+from reservationservice.app.managers.counter import ReservationCounterManager
+from reservationservice.app.managers.partition import ReservationPartitionManager
+from reservationservice.app.managers.reservation import ReservationManager
 
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
-SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/reservationservice'
+# Commands run with the default application of the process
+manager = Manager(get_app)
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+def make_shell_context():
+    from reservationservice.app import models
+    return dict(app=current_app._get_current_object(), db=db, models=models)
 
-manager = Manager(app)
 
-def make_shell_context():
-    return dict(app=app, db=db)
+def add_migrate_command():
+    """
+    Add the db command of Flask-Migrate, it imports alembic so it is only added when it runs
+    """
+
+    from flask_migrate import Migrate, MigrateCommand
+
+    Migrate(get_app(), db)
+    manager.add_command('db', MigrateCommand)
 
 
 manager.add_command("shell", Shell(make_context=make_shell_context))
-manager.add_command('db', MigrateCommand)
 manager.add_command("runserver", Server(port=5430, use_debugger=True, use_reloader=True))
 
 
-@app.before_first_request
-def init_rollbar():
-    """init rollbar module"""
+@manager.command
+def purge_idempotency_keys():
+    """Delete the idempotency keys older than RS_IDEMPOTENCY_KEY_TTL_HOURS"""
+
+    older_than = datetime.utcnow() - timedelta(hours=current_app.config['RS_IDEMPOTENCY_KEY_TTL_HOURS'])
+    deleted = ReservationManager().purge_idempotency_keys(older_than)
+    print 'Deleted {0} idempotency keys created before {1}'.format(deleted, older_than)
+
+
+@manager.command
+def purge_reservation_changes():
+    """Delete the changes of the feed older than RS_FEED_RETENTION_HOURS"""
+
+    older_than = datetime.utcnow() - timedelta(hours=current_app.config['RS_FEED_RETENTION_HOURS'])
+    deleted = ReservationChangeManager().purge(older_than)
+    print 'Deleted {0} reservation changes written before {1}'.format(deleted, older_than)
+
+
+@manager.command
+def rebuild_counters():
+    """Recompute the reservation counts by user and by event"""
+
+    rebuilt = ReservationCounterManager().rebuild()
+    print 'Rebuilt {0} user counters and {1} event counters'.format(rebuilt['user_id'], rebuilt['event_id'])
+
+
+@manager.command
+def maintain_partitions():
+    """Create the partitions of the next RS_PARTITION_MONTHS_AHEAD months and archive the ones
+    older than RS_PARTITION_RETENTION_MONTHS"""
+
+    partition_manager = ReservationPartitionManager()
+
+    created = partition_manager.create_partitions(current_app.config['RS_PARTITION_MONTHS_AHEAD'])
+    print 'Created partitions: {0}'.format(', '.join(created) or 'none')
+
+    if current_app.config['RS_PARTITION_RETENTION_MONTHS']:
+        archived = partition_manager.archive_partitions(
+            current_app.config['RS_PARTITION_RETENTION_MONTHS'], current_app.config['RS_PARTITION_ARCHIVE_SCHEMA'])
+        print 'Archived partitions in {0}: {1}'.format(current_app.config['RS_PARTITION_ARCHIVE_SCHEMA'], ', '.join(archived) or 'none')
+
+
+def iso_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
 
-    environment = os.environ.get('ENVIRONMENT')
-    if environment == None or environment == 'Development':
-        return
+@manager.option('-f', '--format', dest='export_format', default='csv', choices=export_formats())
+@manager.option('-o', '--output', dest='output', default=None, help='File to write, standard output by default')
+@manager.option('-u', '--user_id', dest='user_id', type=int, default=None)
+@manager.option('-e', '--event_id', dest='event_id', type=int, default=None)
+@manager.option('--from', dest='create_date_from', type=iso_date, default=None, help='YYYY-MM-DD, included')
+@manager.option('--to', dest='create_date_to', type=iso_date, default=None, help='YYYY-MM-DD, included')
+@manager.option('-z', '--gzip', dest='compress', action='store_true', default=False)
+def export_reservations(export_format, output, user_id, event_id, create_date_from, create_date_to, compress):
+    """Export reservations by filters as csv, ndjson or arrow"""
 
-    rollbar.init(
-        # access token for the demo app: https://rollbar.com/demo
-        app.config['ROLLBAR_API_KEY'],
-        # environment name
-        environment,
-        # server root directory, makes tracebacks prettier
-        root=os.path.dirname(os.path.realpath(__file__)),
-        # flask already sets up logging
-        allow_logging_basic_config=False)
+    filters = dict(
+        (key, value) for key, value in (('user_id', user_id), ('event_id', event_id),
+                                        ('create_date_from', create_date_from), ('create_date_to', create_date_to))
+        if value is not None
+    )
+    stream = open(output, 'wb') if output else sys.stdout
 
-    # send exceptions from `app` to rollbar, using flask's signal system.
-    got_request_exception.connect(rollbar.contrib.flask.report_exception, app)
+    try:
+        if export_format == 'csv' and db.engine.dialect.name == 'postgresql':
+            # COPY TO sends the csv straight from the server, the fastest path
+            target = gzip.GzipFile(fileobj=stream, mode='wb') if compress else stream
+            ReservationManager().copy_csv(filters, target)
+            if compress:
+                target.close()
+        else:
+            chunks = ReservationController().export_reservations(
+                filters, export_format, current_app.config['RS_EXPORT_CHUNK_SIZE'], compress)
+            for chunk in chunks:
+                stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['db']:
+        add_migrate_command()
     manager.run()
@@ -0,0 +1,73 @@
+#!flask/bin/python
+"""
+Cooperative serving mode of the reservation service.
+
+Same /reservation contract than run.py but requests run in gevent greenlets and psycopg2
+waits on the gevent hub, so concurrent requests overlap their Postgres I/O in one process.
+
+Usage: python run_async.py
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+import os
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from reservationservice.app import get_app
+
+# The pool is part of the config the application is built with, its engine and limiters are created from it
+app = get_app({
+    'SQLALCHEMY_POOL_SIZE': int(os.environ.get('RS_ASYNC_DB_POOL_SIZE', 20)),
+    'SQLALCHEMY_POOL_TIMEOUT': int(os.environ.get('RS_ASYNC_DB_POOL_TIMEOUT', 5))
+})
+
+ASYNC_HOST = os.environ.get('RS_ASYNC_HOST', '0.0.0.0')
+ASYNC_PORT = int(os.environ.get('RS_ASYNC_PORT', 5431))
+ASYNC_CONCURRENCY = int(os.environ.get('RS_ASYNC_CONCURRENCY', 200))
+ASYNC_REQUEST_TIMEOUT = float(os.environ.get('RS_ASYNC_REQUEST_TIMEOUT', 30))
+
+
+def timeout_middleware(wsgi_app, seconds):
+    """
+    Answer 503 to requests that take longer than seconds, so a slow db does not pin every greenlet.
+    Only the call of the application is bounded: bodies iterated after it returns (?stream=1, exports) are
+    not. A timeout after the application started its response can not be answered with 503, it is raised
+    so the server drops the connection
+    :param wsgi_app: WSGI application
+    :param seconds: Float, max duration of a request. Ie 30
+    """
+
+    def application(environ, start_response):
+        started = []
+
+        def start_once(status, headers, exc_info=None):
+            started.append(status)
+            return start_response(status, headers, exc_info)
+
+        try:
+            with gevent.Timeout(seconds):
+                return wsgi_app(environ, start_once)
+        except gevent.Timeout:
+            if started:
+                raise
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json'), ('Retry-After', '1')])
+            return ['{"message": "Request timed out"}']
+
+    return application
+
+
+if __name__ == '__main__':
+    server = WSGIServer(
+        (ASYNC_HOST, ASYNC_PORT),
+        timeout_middleware(app, ASYNC_REQUEST_TIMEOUT),
+        spawn=Pool(ASYNC_CONCURRENCY)
+    )
+    print 'Serving on {0}:{1} with {2} greenlets'.format(ASYNC_HOST, ASYNC_PORT, ASYNC_CONCURRENCY)
+    server.serve_forever()
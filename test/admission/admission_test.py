@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from contextlib import nested
+
+from mock.mock import patch
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.admission import CONCURRENCY_LIMITER_EXTENSION, RATE_LIMITER_EXTENSION, ConcurrencyLimiter, \
+    MemoryBucketStore, RateLimiter, RedisBucketStore, client_id
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class FakeRedis(object):
+    """
+    Local stand in of the StrictRedis commands used by RedisBucketStore, with optimistic transactions
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.hashes = {}
+        self.versions = {}
+        self.retries = 0
+        # Functions run before the next EXEC, as if another process wrote at the same time
+        self.interleaved = []
+
+    def time(self):
+        return int(self.now), int(round((self.now - int(self.now)) * 1000000))
+
+    def hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hmset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def expire(self, key, ttl):
+        pass
+
+    def transaction(self, func, *watches, **kwargs):
+        while True:
+            pipeline = FakePipeline(self, watches)
+            value = func(pipeline)
+
+            while self.interleaved:
+                self.interleaved.pop(0)()
+
+            if pipeline.execute():
+                return value
+            self.retries += 1
+
+
+class FakePipeline(object):
+    """
+    Commands run at once until multi, then they are queued until execute
+    """
+
+    def __init__(self, client, watches):
+        self.client = client
+        self.watched = dict((key, client.versions.get(key, 0)) for key in watches)
+        self.commands = None
+
+    def multi(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.commands is None:
+            return command
+        return lambda *args: self.commands.append((command, args))
+
+    def execute(self):
+        if any(self.client.versions.get(key, 0) != version for key, version in self.watched.items()):
+            return False
+
+        for command, args in self.commands:
+            command(*args)
+        return True
+
+
+class BucketStoreTest(unittest.TestCase):
+    """
+    Set of tests for the token buckets of MemoryBucketStore and RedisBucketStore
+    """
+
+    def test_memory_bucket_refills_at_rate(self):
+        """
+        Check if a bucket admits its burst at once and then one request every 1 / rate seconds
+        """
+
+        now = [1000.0]
+        store = MemoryBucketStore(clock=lambda: now[0])
+
+        self.assertEqual([store.consume('client:a', 2, 3) for _ in range(4)], [0, 0, 0, 0.5])
+        self.assertEqual(store.consume('client:b', 2, 3), 0)
+
+        now[0] += 0.25
+        self.assertEqual(store.consume('client:a', 2, 3), 0.25)
+        now[0] += 0.25
+        self.assertEqual(store.consume('client:a', 2, 3), 0)
+
+    def test_redis_bucket_retries_concurrent_writes(self):
+        """
+        Check if a transaction that loses a race with another process is retried and sees its tokens taken
+        """
+
+        client = FakeRedis()
+        store, other_process = RedisBucketStore(client), RedisBucketStore(client)
+
+        self.assertEqual(store.consume('event:45', 1, 2), 0)
+        client.interleaved.append(lambda: other_process.consume('event:45', 1, 2))
+
+        self.assertEqual(store.consume('event:45', 1, 2), 1.0)
+        self.assertEqual(client.retries, 1)
+
+        client.now += 1
+        self.assertEqual(store.consume('event:45', 1, 2), 0)
+
+    def test_rejected_request_takes_no_token(self):
+        """
+        Check if a request rejected by the event bucket keeps the tokens of the client in both stores
+        """
+
+        for store in [MemoryBucketStore(clock=lambda: 1000.0), RedisBucketStore(FakeRedis())]:
+            limiter = RateLimiter(store, 1, 2, 1, 1)
+
+            self.assertIsNone(limiter.check('a', 45))
+            self.assertEqual(limiter.check('a', 45), ('event', 1.0))
+            self.assertEqual(limiter.check('a', 45), ('event', 1.0))
+            self.assertIsNone(limiter.check('a', 46))
+            self.assertEqual(limiter.check('a', 47), ('client', 1.0))
+
+
+class AdmissionTest(BaseTest):
+    """
+    Set of tests for the rate limits and the limit of requests in flight of the API
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def post_reservation(self, client, client_id, event_id):
+        return client.post(
+            '/reservation', data=json.dumps({'user_id': 10, 'event_id': event_id}),
+            content_type='application/json', headers={'X-Api-Key': client_id})
+
+    def test_post_reservation_is_rate_limited_by_client_and_event(self):
+        """
+        Check if a client over its burst gets 429 with Retry-After and an event over its burst rejects every client
+        """
+
+        limiter = RateLimiter(MemoryBucketStore(clock=lambda: 1000.0), 1, 2, 1, 3)
+
+        with nested(patch.dict(app.extensions, {RATE_LIMITER_EXTENSION: limiter}),
+                    patch.dict(app.config, {'RS_RATE_LIMIT_CLIENT_HEADER': 'X-Api-Key'})):
+            client = app.test_client()
+
+            statuses = [self.post_reservation(client, 'a', 15).status_code for _ in range(2)]
+            limited = self.post_reservation(client, 'a', 15)
+
+            self.assertEqual(statuses, [200, 200])
+            self.assertEqual((limited.status_code, limited.headers['Retry-After']), (429, '1'))
+            self.assertIn('client', json.loads(limited.data)['message'])
+
+            self.assertEqual(self.post_reservation(client, 'b', 15).status_code, 200)
+            limited = self.post_reservation(client, 'c', 15)
+            self.assertEqual(limited.status_code, 429)
+            self.assertIn('event', json.loads(limited.data)['message'])
+            self.assertEqual(self.post_reservation(client, 'c', 16).status_code, 200)
+
+    def test_client_is_the_address_added_by_the_proxy(self):
+        """
+        Check if the addresses of X-Forwarded-For sent by the client do not change its bucket
+        """
+
+        with patch.dict(app.config, {'RS_RATE_LIMIT_CLIENT_HEADER': 'X-Forwarded-For'}):
+            with app.test_request_context(headers={'X-Forwarded-For': '1.2.3.4, 10.0.0.7'}):
+                self.assertEqual(client_id(), '10.0.0.7')
+            with app.test_request_context(headers={'X-Forwarded-For': '10.0.0.7'}):
+                self.assertEqual(client_id(), '10.0.0.7')
+
+    def test_overload_is_shed_with_503(self):
+        """
+        Check if requests without a free slot get 503 with Retry-After while the operational endpoints answer
+        """
+
+        limiter = ConcurrencyLimiter(1, timeout=0.01)
+
+        with patch.dict(app.extensions, {CONCURRENCY_LIMITER_EXTENSION: limiter}):
+            client = app.test_client()
+            limiter.acquire()
+
+            overloaded = client.get('/reservation?event_id=15')
+            self.assertEqual((overloaded.status_code, overloaded.headers['Retry-After']), (503, '1'))
+            self.assertEqual(client.get('/metrics').status_code, 200)
+            self.assertEqual(json.loads(client.get('/admin/pool').data)['admission']['rejected'], 1)
+
+            limiter.release()
+            self.assertEqual(client.get('/reservation?event_id=15').status_code, 200)
+            self.assertEqual(limiter.stats()['in_flight'], 0)
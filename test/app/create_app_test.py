@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+import unittest
+
+from reservationservice.app import create_app, get_app
+from reservationservice.app.admission import NullRateLimiter, RateLimiter, get_rate_limiter
+from reservationservice.app.cache import LRUCache, NullCache, get_reservation_cache
+from reservationservice.app.hotindex import get_hot_event_index
+from reservationservice.app.metrics import registry
+
+
+class CreateAppTest(unittest.TestCase):
+    """
+    Set of tests for the application factory
+    """
+
+    def test_create_app_with_config(self):
+        """
+        Check if each application gets its config, the routes of the API and the metrics collectors once
+        """
+
+        default_app = get_app()
+        collectors = list(registry.collectors)
+        app = create_app({'RS_PAGE_SIZE': 7})
+
+        self.assertIsNot(app, default_app)
+        self.assertEqual(app.config['RS_PAGE_SIZE'], 7)
+        self.assertEqual(default_app.config['RS_PAGE_SIZE'], 100)
+        self.assertIn('api.reservation_item', app.view_functions)
+        self.assertEqual(registry.collectors, collectors)
+
+    def test_default_app_config_must_be_set_before_it_is_built(self):
+        """
+        Check if the config of the default application can not be changed once it is built
+        """
+
+        default_app = get_app()
+
+        self.assertIs(get_app({'RS_PAGE_SIZE': default_app.config['RS_PAGE_SIZE']}), default_app)
+        with self.assertRaises(ValueError):
+            get_app({'SQLALCHEMY_POOL_SIZE': default_app.config['SQLALCHEMY_POOL_SIZE'] + 1})
+
+    def test_applications_do_not_share_their_config_objects(self):
+        """
+        Check if the cache, rate limiter and hot index of each application are built from its own config
+        """
+
+        memory_app = create_app({'RS_CACHE_BACKEND': 'memory', 'RS_RATE_LIMIT_BACKEND': 'memory',
+                                 'RS_HOT_INDEX_MAX_LAG_MS': 5000})
+        default_app = create_app()
+
+        with memory_app.app_context():
+            cache, limiter, index = get_reservation_cache(), get_rate_limiter(), get_hot_event_index()
+            self.assertIs(get_reservation_cache(), cache)
+
+        with default_app.app_context():
+            self.assertIsNot(get_reservation_cache(), cache)
+            self.assertIsInstance(get_reservation_cache(), NullCache)
+            self.assertIsInstance(get_rate_limiter(), NullRateLimiter)
+            self.assertEqual(get_hot_event_index().max_lag, 1.0)
+
+        self.assertIsInstance(cache, LRUCache)
+        self.assertIsInstance(limiter, RateLimiter)
+        self.assertEqual(index.max_lag, 5)
+
+    def test_import_does_not_load_optional_integrations(self):
+        """
+        Check if importing the package and building the application leave the commands and integrations unloaded
+        """
+
+        output = subprocess.check_output([
+            sys.executable, '-W', 'ignore', '-c',
+            'import sys; from reservationservice.app import create_app; create_app(); '
+            'print ",".join(name for name in ("flask_script", "flask_login", "flask_migrate", "rollbar", "pyarrow") '
+            'if name in sys.modules)'
+        ])
+
+        self.assertEqual(output.strip(), '')
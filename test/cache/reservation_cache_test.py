@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+
+from mock.mock import patch
+
+from reservationservice.app.cache import LRUCache, RedisCache, cache_key, cache_tags, reservation_tags
+
+
+class FakeRedis(object):
+    """
+    Local stand in of the StrictRedis commands used by RedisCache
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.values.pop(key, None) is not None or self.sets.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.commands]
+
+
+class CacheKeysTest(unittest.TestCase):
+    """
+    Set of tests for the keys and tags of cached reads
+    """
+
+    def test_cache_key_is_normalized(self):
+        """
+        Check if the key does not depend on the order of the filters nor on empty filters
+        """
+
+        self.assertEqual(
+            cache_key('select', {'user_id': 24, 'event_id': 45}),
+            cache_key('select', {'event_id': 45, 'user_id': 24, 'limit': None})
+        )
+
+    def test_reservation_tags_cover_read_tags(self):
+        """
+        Check if writing a reservation invalidates the reads of its user and its event
+        """
+
+        written_tags = set(reservation_tags(24, 45))
+
+        self.assertTrue(set(cache_tags({'user_id': 24})) & written_tags)
+        self.assertTrue(set(cache_tags({'event_id': 45})) & written_tags)
+        self.assertTrue(set(cache_tags({})) & written_tags)
+        self.assertFalse(set(cache_tags({'user_id': 25})) & written_tags)
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    Set of tests for LRUCache
+    """
+
+    def test_get_counts_hits_and_misses(self):
+        cache = LRUCache(max_size=10, ttl=30)
+        cache.set('a', [1], ['user:1'])
+
+        self.assertEqual(cache.get('a'), [1])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats.as_dict()['hits'], 1)
+        self.assertEqual(cache.stats.as_dict()['misses'], 1)
+
+    def test_least_recently_used_key_is_evicted(self):
+        cache = LRUCache(max_size=2, ttl=30)
+        cache.set('a', 1, ['user:1'])
+        cache.set('b', 2, ['user:2'])
+        cache.get('a')
+        cache.set('c', 3, ['user:3'])
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats.as_dict()['evictions'], 1)
+
+    def test_expired_key_is_a_miss(self):
+        cache = LRUCache(max_size=10, ttl=30)
+
+        with patch('reservationservice.app.cache.time.time', return_value=1000):
+            cache.set('a', 1, ['user:1'])
+
+        with patch('reservationservice.app.cache.time.time', return_value=1031):
+            self.assertIsNone(cache.get('a'))
+
+    def test_invalidate_deletes_tagged_keys(self):
+        cache = LRUCache(max_size=10, ttl=30)
+        cache.set('a', 1, ['user:1', 'event:5'])
+        cache.set('b', 2, ['user:2'])
+        cache.invalidate(['event:5'])
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats.as_dict()['invalidations'], 1)
+
+
+class RedisCacheTest(unittest.TestCase):
+    """
+    Set of tests for RedisCache against a local fake of Redis
+    """
+
+    def test_get_returns_set_value(self):
+        cache = RedisCache(FakeRedis(), ttl=30)
+        cache.set('a', [{'user_id': 1}], ['user:1'])
+
+        self.assertEqual(cache.get('a'), [{'user_id': 1}])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats.as_dict()['hits'], 1)
+        self.assertEqual(cache.stats.as_dict()['misses'], 1)
+
+    def test_invalidate_deletes_tagged_keys(self):
+        cache = RedisCache(FakeRedis(), ttl=30)
+        cache.set('a', 1, ['user:1', 'event:5'])
+        cache.set('b', 2, ['user:2'])
+        cache.invalidate(['event:5'])
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats.as_dict()['invalidations'], 1)
+
+    def test_unavailable_redis_does_not_break_writes(self):
+        client = FakeRedis()
+        cache = RedisCache(client, ttl=30)
+        cache.set('a', 1, ['user:1'])
+
+        with patch.object(client, 'smembers', side_effect=IOError('Connection refused')):
+            cache.invalidate(['user:1', 'event:5'])
+
+        self.assertEqual(cache.stats.as_dict()['invalidations'], 0)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from mock.mock import Mock, patch
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.exceptions import EventCapacityNotFoundError
+from reservationservice.app.resources.capacity import capacity_controller
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class GetCapacityTest(BaseTest):
+    """
+    Set of tests for get_capacity in EventCapacityController and GET /event/<event_id>/capacity
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_get_capacity_successful(self):
+        """
+        Check if the capacity of an event is returned and an event without capacity is unlimited
+        """
+
+        with nested(*self.build_patches({})):
+            controller = EventCapacityController()
+            controller.set_capacity(45, 30)
+
+            self.assertEqual(controller.get_capacity(45), {'event_id': 45, 'capacity': 30, 'remaining': 30})
+            with self.assertRaises(EventCapacityNotFoundError):
+                controller.get_capacity(46)
+
+    def test_get_capacity_error(self):
+        """
+        Check if a database error returns None and is not answered as an unlimited event
+        """
+
+        with nested(*self.build_patches({})):
+            controller = EventCapacityController()
+            controller.manager.capacity_query = Mock(side_effect=Exception('connection lost'))
+
+            self.assertIsNone(controller.get_capacity(45))
+
+    def test_get_capacity_answers(self):
+        """
+        Check if an unlimited event is answered with 404 and a database error with 503
+        """
+
+        with nested(*self.build_patches({})):
+            client = app.test_client()
+
+            self.assertEqual(client.get('/event/46/capacity').status_code, 404)
+
+            error = Mock(side_effect=Exception('connection lost'))
+            with patch.object(capacity_controller.manager, 'capacity_query', error):
+                self.assertEqual(client.get('/event/46/capacity').status_code, 503)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import EventSoldOutError
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class SetCapacityTest(BaseTest):
+    """
+    Set of tests for set_capacity in EventCapacityController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_set_capacity_of_an_event_on_sale(self):
+        """
+        Check if the reservations made while the event was unlimited take their seats from the capacity set later
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            controller.create_reservation({'user_id': 10, 'event_id': 45})
+            controller.bulk_create_reservations([{'user_id': 11, 'event_id': 45}])
+
+            capacity = EventCapacityController().set_capacity(45, 3)
+
+            self.assertEqual(capacity['remaining'], 1)
+            controller.create_reservation({'user_id': 12, 'event_id': 45})
+            with self.assertRaises(EventSoldOutError):
+                controller.create_reservation({'user_id': 13, 'event_id': 45})
+
+    def test_set_capacity_keeps_the_etag_of_an_event_without_reservations(self):
+        """
+        Check if the empty counter locked by set_capacity does not change the ETag of the event
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            etag = controller.reservations_etag({'event_id': 45}, 100)
+
+            EventCapacityController().set_capacity(45, 3)
+
+            self.assertEqual(controller.reservations_etag({'event_id': 45}, 100), etag)
+            self.assertEqual(controller.count_reservations('event_id', [45]), [{'event_id': 45, 'count': 0}])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.controllers.change import ReservationChangeController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import EventSoldOutError
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class PollChangesTest(BaseTest):
+    """
+    Set of tests for poll_changes in ReservationChangeController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_changes_are_served_in_order_from_offset(self):
+        """
+        Check if create, update and cancel of a reservation are served in order and consumers resume from an offset
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            changes = ReservationChangeController()
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.update_reservation(reservation['id'], 1, {'event_id': 16})
+            controller.cancel_reservation(reservation['id'], 2)
+
+            data, next_offset = changes.poll_changes(None, 10, 0, 1)
+
+            self.assertEqual([change['type'] for change in data], ['created', 'updated', 'cancelled'])
+            self.assertEqual([change['version'] for change in data], [1, 2, 3])
+            self.assertEqual([change['event_id'] for change in data], [15, 16, 16])
+            self.assertEqual(set(change['reservation_id'] for change in data), set([reservation['id']]))
+            self.assertEqual(next_offset, data[-1]['offset'])
+
+            first, offset = changes.poll_changes(None, 1, 0, 1)
+            self.assertEqual(first, data[:1])
+            self.assertEqual(changes.poll_changes(offset, 10, 0, 1)[0], data[1:])
+            self.assertEqual(changes.poll_changes(next_offset, 10, 0, 1), ([], next_offset))
+
+            with self.assertRaises(ValueError):
+                changes.poll_changes('not an offset', 10, 0, 1)
+
+    def test_bulk_writes_record_a_change_by_reservation(self):
+        """
+        Check if bulk creations and event cancellations record a change of each reservation, and rejected
+        creations record none
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            changes = ReservationChangeController()
+            EventCapacityController().set_capacity(15, 3)
+            controller.bulk_create_reservations([{'user_id': 10, 'event_id': 15}, {'user_id': 11, 'event_id': 15}])
+            controller.create_reservation({'user_id': 12, 'event_id': 15})
+
+            with self.assertRaises(EventSoldOutError):
+                controller.create_reservation({'user_id': 13, 'event_id': 15})
+
+            controller.cancel_event_reservations(15)
+
+            data = changes.poll_changes(None, 10, 0, 1)[0]
+
+            self.assertEqual([change['type'] for change in data], ['created'] * 3 + ['cancelled'] * 3)
+            self.assertEqual(sorted(change['user_id'] for change in data[3:]), [10, 11, 12])
+
+    def test_long_poll_returns_on_commit(self):
+        """
+        Check if a waiting poll returns the change committed by another thread before its next periodic read
+        """
+
+        def reserve():
+            time.sleep(0.3)
+            with app.app_context():
+                ReservationController().create_reservation({'user_id': 10, 'event_id': 15})
+
+        with nested(*self.build_patches({})):
+            changes = ReservationChangeController()
+            reservationservice_db.session.remove()
+
+            writer = threading.Thread(target=reserve)
+            start = time.time()
+            writer.start()
+            data = changes.poll_changes(None, 10, 10, 10)[0]
+            elapsed = time.time() - start
+            writer.join()
+
+            self.assertEqual([change['type'] for change in data], ['created'])
+            self.assertLess(elapsed, 5)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app import hotindex
+from reservationservice.app.controllers.hotindex import HotEventController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.managers.reservation import ReservationManager
+from reservationservice.app.models import Reservation
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class HotEventTest(BaseTest):
+    """
+    Set of tests for the in-memory index of hot events in HotEventController and ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+        app.extensions.pop(hotindex.HOT_EVENT_INDEX_EXTENSION, None)
+
+    def tearDown(self):
+        app.extensions.pop(hotindex.HOT_EVENT_INDEX_EXTENSION, None)
+
+    def test_hot_events_are_answered_from_memory(self):
+        """
+        Check if membership and counts of a loaded event come from the index and other events from the database
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            for user_id, event_id in [(10, 45), (11, 45), (10, 46)]:
+                controller.create_reservation({'user_id': user_id, 'event_id': event_id})
+
+            events = HotEventController().warm_events([45])
+
+            self.assertEqual(events[0]['event_id'], 45)
+            self.assertEqual(events[0]['reservations'], 2)
+            self.assertGreater(events[0]['bytes'], 0)
+
+            # Rows deleted without a change of the feed are only seen by the database reads
+            reservationservice_db.session.execute(Reservation.__table__.delete())
+            reservationservice_db.session.commit()
+
+            self.assertTrue(controller.has_reservation(45, 10))
+            self.assertFalse(controller.has_reservation(45, 12))
+            self.assertFalse(controller.has_reservation(46, 10))
+            self.assertEqual(controller.count_reservations('event_id', [45, 46]),
+                             [{'event_id': 45, 'count': 2}, {'event_id': 46, 'count': 1}])
+
+    def test_index_follows_the_writes(self):
+        """
+        Check if creations, cancellations, updates and writes committed out of the manager reach the index
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            HotEventController().warm_events([45])
+
+            first = controller.create_reservation({'user_id': 12, 'event_id': 45})
+            self.assertTrue(controller.has_reservation(45, 12))
+
+            controller.cancel_reservation(first['id'], 1)
+            self.assertFalse(controller.has_reservation(45, 12))
+
+            second = controller.create_reservation({'user_id': 13, 'event_id': 45})
+            controller.update_reservation(second['id'], 1, {'event_id': 46})
+            self.assertFalse(controller.has_reservation(45, 13))
+            self.assertTrue(controller.has_reservation(46, 13))
+
+            ReservationManager(auto_commit=False).create({'user_id': 14, 'event_id': 45})
+            reservationservice_db.session.commit()
+            self.assertTrue(controller.has_reservation(45, 14))
+
+            self.assertEqual(list(hotindex.get_hot_event_index().events[45]), [14])
+            self.assertEqual(HotEventController().stats()['reservations'], 1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.factories.factories import ReservationFactory
+from reservationservice.app.models import Reservation
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class BulkCreateReservationsTest(BaseTest):
+    """
+    Set of tests for bulk_create_reservations in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_bulk_create_reservations_successful(self):
+        """
+        Check if all reservations of the batch are created
+        """
+
+        with nested(*self.build_patches({})):
+            items = [{'user_id': user_id, 'event_id': 35} for user_id in range(1, 51)]
+
+            response = ReservationController().bulk_create_reservations(items)
+
+            self.assertEqual(len(response['data']), 50)
+            self.assertEqual(response['errors'], [])
+            self.assertEqual(reservationservice_db.session.query(Reservation).filter_by(event_id=35).count(), 50)
+
+    def test_bulk_create_reservations_reports_invalid_items(self):
+        """
+        Check if invalid, duplicated and existing items are reported without aborting the batch
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationFactory.create(user_id=3, event_id=35)
+
+            items = [
+                {'user_id': 1, 'event_id': 35},
+                {'user_id': 'one', 'event_id': 35},
+                {'user_id': 1, 'event_id': 35},
+                {'user_id': 3, 'event_id': 35},
+                {'user_id': 4, 'event_id': 35}
+            ]
+
+            response = ReservationController().bulk_create_reservations(items)
+
+            self.assertEqual(sorted(reservation['user_id'] for reservation in response['data']), [1, 4])
+            self.assertEqual([error['index'] for error in response['errors']], [1, 2, 3])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.cache import LRUCache
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import ReservationNotFoundError
+from reservationservice.app.managers.counter import ReservationCounterManager
+from reservationservice.app.models import Reservation
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class CancelReservationTest(BaseTest):
+    """
+    Set of tests for cancel_reservation, bulk_cancel_reservations and cancel_event_reservations in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_cancel_reservation_is_a_soft_delete(self):
+        """
+        Check if a cancelled reservation is kept but leaves reads, counts and the seats of its event
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            EventCapacityController().set_capacity(15, 1)
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+
+            cancelled = controller.cancel_reservation(reservation['id'], 1)
+
+            self.assertTrue(cancelled['cancelled'])
+            self.assertEqual(cancelled['version'], 2)
+            self.assertIsNotNone(cancelled['update_date'])
+            self.assertEqual(reservationservice_db.session.query(Reservation).count(), 1)
+            self.assertEqual(controller.select_reservation({'event_id': 15}), [])
+            self.assertIsNone(controller.get_reservation(reservation['id']))
+            self.assertEqual(controller.count_reservations('user_id', [10]), [{'user_id': 10, 'count': 0}])
+            self.assertEqual(EventCapacityController().get_capacity(15)['remaining'], 1)
+
+            with self.assertRaises(ReservationNotFoundError):
+                controller.cancel_reservation(reservation['id'], 2)
+
+    def test_reserving_again_reactivates_cancelled_reservation(self):
+        """
+        Check if single and bulk creations of a cancelled pair book it again with the same id
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            first = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            second = controller.create_reservation({'user_id': 11, 'event_id': 15})
+            controller.bulk_cancel_reservations([{'id': first['id'], 'version': 1}, {'id': second['id'], 'version': 1}])
+
+            again = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            response = controller.bulk_create_reservations([{'user_id': 11, 'event_id': 15}])
+
+            self.assertEqual((again['id'], again['version'], again['cancelled']), (first['id'], 3, False))
+            self.assertEqual([item['id'] for item in response['data']], [second['id']])
+            self.assertEqual(controller.count_reservations('event_id', [15]), [{'event_id': 15, 'count': 2}])
+
+    def test_reactivated_reservation_is_not_read_from_the_cache(self):
+        """
+        Check if reserving again a cancelled pair invalidates the cached reads of its id
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            controller.manager._cache = LRUCache(max_size=100, ttl=60)
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.cancel_reservation(reservation['id'], 1)
+            self.assertIsNone(controller.get_reservation(reservation['id']))
+
+            controller.create_reservation({'user_id': 10, 'event_id': 15})
+
+            self.assertEqual(controller.get_reservation(reservation['id'])['id'], reservation['id'])
+
+    def test_cancel_event_reservations_successful(self):
+        """
+        Check if all the reservations of an event are cancelled with their counts and seats
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            EventCapacityController().set_capacity(15, 30)
+            controller.bulk_create_reservations([{'user_id': user_id, 'event_id': 15} for user_id in range(20)])
+            controller.create_reservation({'user_id': 1, 'event_id': 16})
+            controller.create_reservation({'user_id': 2, 'event_id': 15})
+            versions = ReservationCounterManager().get_versions([('user_id', 1), ('user_id', 50)])
+
+            self.assertEqual(controller.cancel_event_reservations(15), {'event_id': 15, 'cancelled': 20})
+
+            self.assertEqual(controller.select_reservation({'event_id': 15}), [])
+            self.assertEqual(
+                controller.count_reservations('user_id', [1, 2]), [{'user_id': 1, 'count': 1}, {'user_id': 2, 'count': 0}])
+            self.assertEqual(controller.count_reservations('event_id', [15]), [{'event_id': 15, 'count': 0}])
+            self.assertEqual(EventCapacityController().get_capacity(15)['remaining'], 30)
+            self.assertGreater(ReservationCounterManager().get_versions([('user_id', 1)])[('user_id', 1)],
+                               versions[('user_id', 1)])
+            self.assertEqual(controller.cancel_event_reservations(15), {'event_id': 15, 'cancelled': 0})
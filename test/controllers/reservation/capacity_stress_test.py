@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import EventSoldOutError
+from reservationservice.app.models import Reservation
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class CapacityStressTest(BaseTest):
+    """
+    Set of tests for concurrent create_reservation calls against one event with limited capacity
+    """
+
+    event_id = 45
+    capacity = 50
+    threads = 20
+    reservations_by_thread = 5
+    max_seconds = 60
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def reserve(self, thread_number, results):
+        """
+        Create reservations of different users for the event in a thread with its own db session
+        """
+
+        with app.app_context():
+            controller = ReservationController()
+
+            for number in xrange(self.reservations_by_thread):
+                user_id = thread_number * self.reservations_by_thread + number
+                try:
+                    reservation = controller.create_reservation({'user_id': user_id, 'event_id': self.event_id})
+                    results.append('created' if reservation else 'error')
+                except EventSoldOutError:
+                    results.append('sold_out')
+
+    def test_concurrent_reservations_never_overbook(self):
+        """
+        Check if many threads reserving the same event never go over its capacity and finish in time
+        """
+
+        with nested(*self.build_patches({})):
+            EventCapacityController().set_capacity(self.event_id, self.capacity)
+            reservationservice_db.session.remove()
+
+            results = []
+            threads = [threading.Thread(target=self.reserve, args=(number, results)) for number in xrange(self.threads)]
+
+            start = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(self.max_seconds)
+            elapsed = time.time() - start
+
+            self.assertFalse(any(thread.is_alive() for thread in threads))
+            self.assertLess(elapsed, self.max_seconds)
+            self.assertEqual(len(results), self.threads * self.reservations_by_thread)
+            self.assertEqual(results.count('error'), 0)
+            self.assertEqual(results.count('created'), self.capacity)
+
+            reservations = reservationservice_db.session.query(Reservation).filter_by(event_id=self.event_id).count()
+            self.assertEqual(reservations, self.capacity)
+            self.assertEqual(EventCapacityController().get_capacity(self.event_id)['remaining'], 0)
+
+    def test_sold_out_event_rejects_bulk_items(self):
+        """
+        Check if bulk creation only creates the reservations that fit the remaining capacity
+        """
+
+        with nested(*self.build_patches({})):
+            EventCapacityController().set_capacity(self.event_id, 2)
+            items = [{'user_id': user_id, 'event_id': self.event_id} for user_id in xrange(4)]
+
+            response = ReservationController().bulk_create_reservations(items)
+
+            self.assertEqual([reservation['user_id'] for reservation in response['data']], [0, 1])
+            self.assertEqual(response['errors'], [
+                {'index': 2, 'message': 'event is sold out'}, {'index': 3, 'message': 'event is sold out'}
+            ])
+            self.assertEqual(EventCapacityController().get_capacity(self.event_id)['remaining'], 0)
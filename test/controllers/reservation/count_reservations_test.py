@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.factories.factories import ReservationFactory
+from reservationservice.app.managers.counter import ReservationCounterManager
+from reservationservice.app.models import ReservationCounter
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class CountReservationsTest(BaseTest):
+    """
+    Set of tests for count_reservations in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_counts_follow_created_reservations(self):
+        """
+        Check if single and bulk creations update the event and user counts
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.bulk_create_reservations([{'user_id': 11, 'event_id': 15}, {'user_id': 10, 'event_id': 16}])
+
+            self.assertEqual(
+                controller.count_reservations('event_id', [15, 16, 17]),
+                [{'event_id': 15, 'count': 2}, {'event_id': 16, 'count': 1}, {'event_id': 17, 'count': 0}]
+            )
+            self.assertEqual(controller.count_reservations('user_id', [10]), [{'user_id': 10, 'count': 2}])
+
+    def test_rebuild_counts_successful(self):
+        """
+        Check if rebuild recomputes counts from reservations
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationFactory.create(user_id=10, event_id=15)
+            ReservationFactory.create(user_id=11, event_id=15)
+            ReservationFactory.create(user_id=11, event_id=16)
+
+            ReservationCounterManager().rebuild()
+
+            self.assertEqual(
+                ReservationController().count_reservations('event_id', [15, 16]),
+                [{'event_id': 15, 'count': 2}, {'event_id': 16, 'count': 1}]
+            )
+            self.assertEqual(ReservationController().count_reservations('user_id', [11]), [{'user_id': 11, 'count': 2}])
+
+    def test_rebuild_fixes_drifted_counts_and_bumps_versions(self):
+        """
+        Check if rebuild corrects existing counters in place with a newer version
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationController().create_reservation({'user_id': 10, 'event_id': 15})
+            reservationservice_db.session.query(ReservationCounter)\
+                .filter_by(kind='event_id', key_id=15)\
+                .update({'count': 7})
+            reservationservice_db.session.commit()
+
+            versions = ReservationCounterManager().get_versions([('event_id', 15)])
+            ReservationCounterManager().rebuild()
+
+            self.assertEqual(
+                ReservationController().count_reservations('event_id', [15]), [{'event_id': 15, 'count': 1}])
+            self.assertGreater(
+                ReservationCounterManager().get_versions([('event_id', 15)])[('event_id', 15)], versions[('event_id', 15)])
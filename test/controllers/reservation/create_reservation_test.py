@@ -9,6 +9,7 @@ from general.util.test_helper import BaseTest
 
 from reservationservice.app.controllers.reservation import ReservationController
 from reservationservice.app.factories.factories import ReservationFactory
+from reservationservice.app.models import Reservation
 from reservationservice.default_config import basedir as reservation_basedir
 from reservationservice.app import db as reservationservice_db
 from reservationservice.app import app
@@ -43,3 +44,41 @@ class CreateReservationTest(BaseTest):
 
             self.assertEqual(response['user_id'], self.reservation['user_id'])
             self.assertEqual(response['event_id'], self.reservation['event_id'])
+
+    def test_create_reservation_replayed_idempotency_key(self):
+        """
+        Check if a retry with the same Idempotency-Key returns the original reservation without writing again
+        """
+
+        with nested(*self.build_patches({})):
+            first_response = ReservationController().create_reservation(self.reservation, 'retry-key')
+            second_response = ReservationController().create_reservation({'user_id': 21, 'event_id': 35}, 'retry-key')
+
+            self.assertEqual(second_response['id'], first_response['id'])
+            self.assertEqual(reservationservice_db.session.query(Reservation).count(), 1)
+
+    def test_create_reservation_existing_user_and_event(self):
+        """
+        Check if creating an existing (user_id, event_id) reservation returns it without a duplicate
+        """
+
+        with nested(*self.build_patches({})):
+            existing = ReservationFactory.create(**self.reservation)
+
+            response = ReservationController().create_reservation(self.reservation)
+
+            self.assertEqual(response['id'], existing.id)
+            self.assertEqual(reservationservice_db.session.query(Reservation).count(), 1)
+
+    def test_create_reservation_error(self):
+        """
+        Check if a reservation not written returns None instead of an empty item
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            controller.manager.create = Mock(return_value=None)
+
+            response = controller.create_reservation(self.reservation)
+
+            self.assertIsNone(response)
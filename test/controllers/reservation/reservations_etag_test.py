@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.cache import LRUCache
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class ReservationsEtagTest(BaseTest):
+    """
+    Set of tests for reservations_etag in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_etag_changes_only_with_writes_of_the_filters(self):
+        """
+        Check if the ETag of a user changes when the user reserves and not when other users do
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            controller.create_reservation({'user_id': 10, 'event_id': 15})
+
+            etag = controller.reservations_etag({'user_id': 10}, 100)
+            self.assertEqual(controller.reservations_etag({'user_id': 10}, 100), etag)
+
+            controller.create_reservation({'user_id': 11, 'event_id': 15})
+            self.assertEqual(controller.reservations_etag({'user_id': 10}, 100), etag)
+            self.assertNotEqual(controller.reservations_etag({'event_id': 15}, 100), etag)
+
+            controller.bulk_create_reservations([{'user_id': 10, 'event_id': 16}])
+            self.assertNotEqual(controller.reservations_etag({'user_id': 10}, 100), etag)
+
+    def test_etag_depends_on_page(self):
+        """
+        Check if pages of the same filters have different ETags and reads without user or event have none
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+
+            self.assertNotEqual(
+                controller.reservations_etag({'user_id': 10}, 100),
+                controller.reservations_etag({'user_id': 10}, 10)
+            )
+            self.assertIsNone(controller.reservations_etag({}, 100))
+
+    def test_page_sent_with_etag_is_as_new_as_the_etag(self):
+        """
+        Check if a page read with the versions of its ETag is cached by them, so an unchanged user is served from
+        the cache and a write of another process that the cache missed gets a new page
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            cache = controller.manager._cache = LRUCache(max_size=100, ttl=60)
+            other_process = ReservationController()
+            other_process.manager._cache = LRUCache(max_size=100, ttl=60)
+
+            controller.create_reservation({'user_id': 10, 'event_id': 15})
+            self.assertEqual(len(controller.select_reservation_page({'user_id': 10}, 100)[0]), 1)
+            versions = controller.counter_versions({'user_id': 10})
+            self.assertEqual(len(controller.select_reservation_page({'user_id': 10}, 100, versions=versions)[0]), 1)
+
+            hits = cache.stats.hits
+            self.assertEqual(len(controller.select_reservation_page({'user_id': 10}, 100, versions=versions)[0]), 1)
+            self.assertEqual(cache.stats.hits, hits + 1)
+
+            other_process.create_reservation({'user_id': 10, 'event_id': 16})
+            new_versions = controller.counter_versions({'user_id': 10})
+
+            self.assertNotEqual(new_versions, versions)
+            self.assertEqual(len(controller.select_reservation_page({'user_id': 10}, 100)[0]), 1)
+            self.assertEqual(
+                len(controller.select_reservation_page({'user_id': 10}, 100, versions=new_versions)[0]), 2)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from contextlib import nested
+from datetime import date, datetime
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.factories.factories import ReservationFactory
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class SelectReservationPageTest(BaseTest):
+    """
+    Set of tests for select_reservation_page and stream_reservations in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def create_reservations(self):
+        ReservationFactory.create(user_id=10, event_id=15)
+        ReservationFactory.create(user_id=11, event_id=15)
+        ReservationFactory.create(user_id=12, event_id=15)
+        ReservationFactory.create(user_id=13, event_id=15)
+        ReservationFactory.create(user_id=14, event_id=15)
+        ReservationFactory.create(user_id=10, event_id=16)
+
+    def test_get_reservations_pages_successful(self):
+        """
+        Check if all reservations are returned once across the pages
+        """
+
+        with nested(*self.build_patches({})):
+            self.create_reservations()
+
+            first_page, cursor = ReservationController().select_reservation_page({'event_id': 15}, 2)
+            second_page, cursor = ReservationController().select_reservation_page({'event_id': 15}, 2, cursor)
+            third_page, cursor = ReservationController().select_reservation_page({'event_id': 15}, 2, cursor)
+
+            self.assertEqual(len(first_page), 2)
+            self.assertEqual(len(second_page), 2)
+            self.assertEqual(len(third_page), 1)
+            self.assertIsNone(cursor)
+
+            user_ids = [reservation['user_id'] for reservation in first_page + second_page + third_page]
+            self.assertEqual(sorted(user_ids), [10, 11, 12, 13, 14])
+
+    def test_get_reservations_page_invalid_cursor(self):
+        """
+        Check if a malformed cursor is rejected
+        """
+
+        with nested(*self.build_patches({})):
+            self.create_reservations()
+
+            with self.assertRaises(ValueError):
+                ReservationController().select_reservation_page({'event_id': 15}, 2, 'not-a-cursor')
+
+    def test_stream_reservations_successful(self):
+        """
+        Check if streamed chunks build the whole json document
+        """
+
+        with nested(*self.build_patches({})):
+            self.create_reservations()
+
+            chunks = ReservationController().stream_reservations({'event_id': 15}, 2)
+            response = json.loads(''.join(chunks))
+
+            self.assertEqual(len(response['data']), 5)
+            for reservation in response['data']:
+                self.assertEqual(reservation['event_id'], 15)
+
+    def test_get_reservations_page_by_date_range(self):
+        """
+        Check if from and to filter by create_date including both days
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationFactory.create(user_id=10, event_id=15, create_date=datetime(2017, 3, 31))
+            ReservationFactory.create(user_id=11, event_id=15, create_date=datetime(2017, 4, 1))
+            ReservationFactory.create(user_id=12, event_id=15, create_date=datetime(2017, 4, 30))
+            ReservationFactory.create(user_id=13, event_id=15, create_date=datetime(2017, 5, 1))
+
+            filters = {'event_id': 15, 'create_date_from': date(2017, 4, 1), 'create_date_to': date(2017, 4, 30)}
+            page, cursor = ReservationController().select_reservation_page(filters, 10)
+
+            self.assertEqual([reservation['user_id'] for reservation in page], [11, 12])
+            self.assertIsNone(cursor)
+
+    def test_get_reservations_pages_of_the_same_day(self):
+        """
+        Check if pages of reservations created the same day at different times never repeat a reservation
+        """
+
+        with nested(*self.build_patches({})):
+            for user_id in xrange(10, 15):
+                ReservationFactory.create(
+                    user_id=user_id, event_id=15, create_date=datetime(2017, 4, 1, user_id, 30, 15, user_id * 1000))
+
+            user_ids, cursor = [], None
+            for _ in xrange(5):
+                page, cursor = ReservationController().select_reservation_page({'event_id': 15}, 2, cursor)
+                user_ids.extend(reservation['user_id'] for reservation in page)
+                if cursor is None:
+                    break
+
+            self.assertEqual(user_ids, [10, 11, 12, 13, 14])
+            self.assertIsNone(cursor)
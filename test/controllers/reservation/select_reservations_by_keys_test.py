@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.factories.factories import ReservationFactory
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class SelectReservationsByKeysTest(BaseTest):
+    """
+    Set of tests for select_reservations_by_keys in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def create_reservations(self):
+        ReservationFactory.create(user_id=10, event_id=15)
+        ReservationFactory.create(user_id=10, event_id=16)
+        ReservationFactory.create(user_id=11, event_id=15)
+        ReservationFactory.create(user_id=12, event_id=17)
+        ReservationFactory.create(user_id=13, event_id=15)
+
+    def test_get_reservations_of_users_for_event_successful(self):
+        """
+        Check if reservations of an event are grouped by the requested users
+        """
+
+        with nested(*self.build_patches({})):
+            self.create_reservations()
+
+            response = ReservationController().select_reservations_by_keys(
+                user_ids=[10, 11, 12, 14], event_ids=[15], group_by='user_id', chunk_size=2)
+
+            self.assertEqual(sorted(response.keys()), ['10', '11', '12', '14'])
+            self.assertEqual([reservation['event_id'] for reservation in response['10']], [15])
+            self.assertEqual(len(response['11']), 1)
+            self.assertEqual(response['12'], [])
+            self.assertEqual(response['14'], [])
+
+    def test_get_reservations_of_events_successful(self):
+        """
+        Check if reservations are grouped by event
+        """
+
+        with nested(*self.build_patches({})):
+            self.create_reservations()
+
+            response = ReservationController().select_reservations_by_keys(event_ids=[15, 17], group_by='event_id')
+
+            self.assertEqual(sorted(reservation['user_id'] for reservation in response['15']), [10, 11, 13])
+            self.assertEqual([reservation['user_id'] for reservation in response['17']], [12])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from contextlib import nested
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.controllers.reservation import ReservationController
+from reservationservice.app.exceptions import (
+    EventSoldOutError, ReservationExistsError, ReservationNotFoundError, ReservationVersionError
+)
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+
+
+class UpdateReservationTest(BaseTest):
+    """
+    Set of tests for update_reservation and bulk_update_reservations in ReservationController
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+
+    def test_update_reservation_successful(self):
+        """
+        Check if the event changes with a new version, update_date and counts
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            self.assertEqual(reservation['version'], 1)
+            self.assertIsNone(reservation['update_date'])
+
+            updated = controller.update_reservation(reservation['id'], 1, {'event_id': 16})
+
+            self.assertEqual((updated['id'], updated['event_id'], updated['version']), (reservation['id'], 16, 2))
+            self.assertIsNotNone(updated['update_date'])
+            self.assertEqual(
+                controller.count_reservations('event_id', [15, 16]),
+                [{'event_id': 15, 'count': 0}, {'event_id': 16, 'count': 1}]
+            )
+            self.assertEqual(controller.get_reservation(reservation['id'])['event_id'], 16)
+
+    def test_update_reservation_with_stale_version_fails(self):
+        """
+        Check if an update sent with a version already changed is rejected without writing
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.update_reservation(reservation['id'], 1, {'event_id': 16})
+
+            with self.assertRaises(ReservationVersionError) as context:
+                controller.update_reservation(reservation['id'], 1, {'event_id': 17})
+
+            self.assertEqual(context.exception.version, 2)
+            self.assertEqual(controller.get_reservation(reservation['id'])['event_id'], 16)
+
+            with self.assertRaises(ReservationNotFoundError):
+                controller.update_reservation('not-an-id', 1, {'event_id': 17})
+
+    def test_update_reservation_conflicts(self):
+        """
+        Check if an update to a reserved pair or to a sold out event is rejected and keeps the seats
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            EventCapacityController().set_capacity(16, 1)
+            reservation = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            controller.create_reservation({'user_id': 11, 'event_id': 16})
+            controller.create_reservation({'user_id': 10, 'event_id': 17})
+
+            with self.assertRaises(EventSoldOutError):
+                controller.update_reservation(reservation['id'], 1, {'event_id': 16})
+            with self.assertRaises(ReservationExistsError):
+                controller.update_reservation(reservation['id'], 1, {'event_id': 17})
+
+            self.assertEqual(EventCapacityController().get_capacity(16)['remaining'], 0)
+            self.assertEqual(controller.get_reservation(reservation['id'])['version'], 1)
+
+    def test_bulk_update_reservations_reports_rejected_items(self):
+        """
+        Check if valid items are updated and invalid or stale ones are reported by index
+        """
+
+        with nested(*self.build_patches({})):
+            controller = ReservationController()
+            first = controller.create_reservation({'user_id': 10, 'event_id': 15})
+            second = controller.create_reservation({'user_id': 11, 'event_id': 15})
+
+            response = controller.bulk_update_reservations([
+                {'id': first['id'], 'version': 1, 'event_id': 16},
+                {'id': second['id'], 'version': 5, 'event_id': 16},
+                {'id': second['id'], 'event_id': 16}
+            ])
+
+            self.assertEqual([(item['id'], item['version']) for item in response['data']], [(first['id'], 2)])
+            self.assertEqual([error['index'] for error in response['errors']], [1, 2])
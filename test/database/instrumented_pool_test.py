@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sqlite3
+import unittest
+
+from sqlalchemy import event
+
+from reservationservice.app.database import InstrumentedQueuePool, ping_connection
+
+
+class InstrumentedQueuePoolTest(unittest.TestCase):
+    """
+    Set of tests for InstrumentedQueuePool
+    """
+
+    def build_pool(self):
+        return InstrumentedQueuePool(
+            lambda: sqlite3.connect(':memory:', check_same_thread=False), pool_size=2, max_overflow=1, timeout=0.1
+        )
+
+    def test_stats_count_checked_out_connections(self):
+        pool = self.build_pool()
+        first = pool.connect()
+        second = pool.connect()
+
+        stats = pool.stats()
+        self.assertEqual(stats['checked_out'], 2)
+        self.assertEqual(stats['checkouts'], 2)
+
+        first.close()
+        second.close()
+        self.assertEqual(pool.stats()['checked_out'], 0)
+
+    def test_stats_count_timeouts(self):
+        pool = self.build_pool()
+        connections = [pool.connect() for _ in range(3)]
+
+        with self.assertRaises(Exception):
+            pool.connect()
+
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['overflow'], 1)
+        self.assertGreater(stats['wait_time_max'], 0)
+
+        for connection in connections:
+            connection.close()
+
+    def test_pre_ping_checks_connections(self):
+        pool = self.build_pool()
+        event.listen(pool, 'checkout', ping_connection)
+
+        connection = pool.connect()
+        self.assertEqual(connection.cursor().execute('SELECT 1').fetchone()[0], 1)
+        connection.close()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import json
+import unittest
+import zlib
+from datetime import date, datetime
+
+from reservationservice.app.export import export_rows
+from reservationservice.app.models import ReservationRow
+
+
+class ExportRowsTest(unittest.TestCase):
+    """
+    Set of tests for export_rows
+    """
+
+    rows = [
+        ReservationRow('2h-34-jh-34', 34, 45, date(2019, 4, 1)),
+        ReservationRow('2h-34-jh-35', 35, 45, datetime(2019, 4, 2, 10, 30)),
+        ReservationRow('2h-34-"jh"', 36, 46, date(2019, 4, 3))
+    ]
+
+    def test_export_ndjson(self):
+        """
+        Check if each reservation is one json line with the day of create_date
+        """
+
+        chunks = list(export_rows(iter(self.rows), 'ndjson', 2))
+        lines = ''.join(chunks).splitlines()
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': '2h-34-jh-34', 'user_id': 34, 'event_id': 45, 'create_date': '2019-04-01'},
+            {'id': '2h-34-jh-35', 'user_id': 35, 'event_id': 45, 'create_date': '2019-04-02'},
+            {'id': '2h-34-"jh"', 'user_id': 36, 'event_id': 46, 'create_date': '2019-04-03'}
+        ])
+
+    def test_export_csv(self):
+        """
+        Check if the csv has a header and one record by reservation, and only the header without rows
+        """
+
+        records = list(csv.reader(''.join(export_rows(iter(self.rows), 'csv', 2)).splitlines()))
+
+        self.assertEqual(records[0], ['id', 'user_id', 'event_id', 'create_date'])
+        self.assertEqual(records[3], ['2h-34-"jh"', '36', '46', '2019-04-03'])
+        self.assertEqual(''.join(export_rows(iter([]), 'csv', 2)), 'id,user_id,event_id,create_date\r\n')
+
+    def test_export_gzip(self):
+        """
+        Check if the gzipped chunks decompress to the plain export
+        """
+
+        plain = ''.join(export_rows(iter(self.rows), 'ndjson', 1))
+        compressed = ''.join(export_rows(iter(self.rows), 'ndjson', 1, compress=True))
+
+        self.assertEqual(compressed[:2], '\x1f\x8b')
+        self.assertEqual(zlib.decompress(compressed, 16 + zlib.MAX_WBITS), plain)
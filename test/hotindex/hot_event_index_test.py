@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from collections import namedtuple
+
+from reservationservice.app.hotindex import HotEventIndex
+
+Change = namedtuple('Change', ['type', 'user_id', 'event_id'])
+
+
+class HotEventIndexTest(unittest.TestCase):
+    """
+    Set of tests for the sorted arrays of user ids of HotEventIndex
+    """
+
+    def test_membership_and_counts_of_hot_events(self):
+        """
+        Check if adds and removes keep the users sorted and distinct, and events not loaded are ignored
+        """
+
+        index = HotEventIndex()
+        index.load(45, [10, 20, 30])
+
+        index.add(45, 25)
+        index.add(45, 25)
+        index.add(45, 5)
+        index.remove(45, 20)
+        index.remove(45, 21)
+        index.add(46, 10)
+
+        self.assertEqual(list(index.events[45]), [5, 10, 25, 30])
+        self.assertTrue(index.contains(45, 25))
+        self.assertFalse(index.contains(45, 20))
+        self.assertIsNone(index.contains(46, 10))
+        self.assertEqual(index.count(45), 4)
+        self.assertIsNone(index.count(46))
+
+        index.drop(45)
+        self.assertEqual(index.hot_events(), [])
+
+    def test_apply_changes_of_the_feed(self):
+        """
+        Check if changes are applied in order with the offset and updates ask for a new load
+        """
+
+        index = HotEventIndex()
+        index.load(45, [10])
+
+        updated = index.apply(
+            [Change('created', 11, 45), Change('cancelled', 10, 45), Change('created', 12, 46)], (0, 3))
+
+        self.assertFalse(updated)
+        self.assertEqual(list(index.events[45]), [11])
+        self.assertEqual(index.offset, (0, 3))
+        self.assertTrue(index.apply([Change('updated', 11, 46)], (0, 4)))
+
+    def test_stats_and_refresh_lag(self):
+        """
+        Check if memory is reported by event and the feed is read again after the max lag or an expire
+        """
+
+        now = [100.0]
+        index = HotEventIndex(max_lag=1, clock=lambda: now[0])
+        index.load(45, xrange(1000))
+        index.load(46, [])
+
+        stats = index.stats()
+
+        self.assertEqual([event['event_id'] for event in stats['events']], [45, 46])
+        self.assertEqual(stats['reservations'], 1000)
+        self.assertGreaterEqual(stats['events'][0]['bytes'], 4000)
+        self.assertEqual(stats['bytes'], sum(event['bytes'] for event in stats['events']))
+
+        index.mark_refreshed()
+        self.assertFalse(index.needs_refresh())
+        now[0] += 1
+        self.assertTrue(index.needs_refresh())
+        index.mark_refreshed()
+        index.expire()
+        self.assertTrue(index.needs_refresh())
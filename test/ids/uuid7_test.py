@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import unittest
+import uuid
+
+from mock.mock import patch
+
+from reservationservice.app.ids import GUID, is_valid_id, uuid7, uuid7_timestamp
+
+
+class Uuid7Test(unittest.TestCase):
+    """
+    Set of tests for uuid7 and GUID
+    """
+
+    def test_uuid7_version_and_time(self):
+        """
+        Check if ids are version 7 RFC 4122 UUIDs carrying the time they were generated
+        """
+
+        before = time.time()
+        value = uuid7()
+
+        self.assertEqual(uuid.UUID(value).version, 7)
+        self.assertEqual(uuid.UUID(value).variant, uuid.RFC_4122)
+        self.assertAlmostEqual(uuid7_timestamp(value), before, delta=1)
+        self.assertEqual(value, str(uuid.UUID(value)))
+
+    def test_uuid7_ordered_in_the_same_millisecond(self):
+        """
+        Check if ids sort in generation order even when the clock does not move or moves back
+        """
+
+        with patch('reservationservice.app.ids.time.time', side_effect=[2000.0] * 5000 + [1999.0] * 10):
+            values = [uuid7() for _ in xrange(5010)]
+
+        self.assertEqual(sorted(values), values)
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_guid_normalizes_ids(self):
+        """
+        Check if ids are bound in canonical form and invalid ids are rejected
+        """
+
+        value = uuid7()
+
+        self.assertEqual(GUID().process_bind_param(value.upper().replace('-', ''), None), value)
+        self.assertTrue(is_valid_id(value))
+        self.assertFalse(is_valid_id('2h-34-jh-34'))
+        self.assertFalse(is_valid_id(None))
+        with self.assertRaises(ValueError):
+            GUID().process_bind_param('2h-34-jh-34', None)
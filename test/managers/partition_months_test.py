@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from datetime import date
+
+from reservationservice.app.managers.partition import add_months, month_start, partition_month, partition_name
+
+
+class PartitionMonthsTest(unittest.TestCase):
+    """
+    Set of tests for the month helpers of the reservations partitions
+    """
+
+    def test_add_months_across_years(self):
+        """
+        Check if months are added and subtracted across year boundaries
+        """
+
+        self.assertEqual(add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(add_months(month_start(date(2026, 10, 18)), 0), date(2026, 10, 1))
+
+    def test_partition_name_round_trip(self):
+        """
+        Check if the month of a partition is read back from its name and other tables are ignored
+        """
+
+        self.assertEqual(partition_name(date(2026, 10, 1)), 'reservations_p202610')
+        self.assertEqual(partition_month('reservations_p202610'), date(2026, 10, 1))
+        self.assertIsNone(partition_month('reservations_default'))
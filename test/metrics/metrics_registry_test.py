@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+
+from reservationservice.app.metrics import MetricsRegistry
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    """
+    Set of tests for MetricsRegistry exposition
+    """
+
+    def test_render_histogram(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency', ('endpoint',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, endpoint='reservation')
+        histogram.observe(0.5, endpoint='reservation')
+
+        lines = registry.render().splitlines()
+
+        self.assertIn('# TYPE latency_seconds histogram', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="reservation",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="reservation",le="1.0"} 2', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="reservation",le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_count{endpoint="reservation"} 2', lines)
+        self.assertIn('latency_seconds_sum{endpoint="reservation"} 0.55', lines)
+
+    def test_render_counter_and_collector(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('errors_total', 'Errors', ('operation',))
+        counter.inc(operation='create')
+        counter.inc(operation='create')
+        registry.add_collector(lambda: [('pool_size', 'gauge', 'Pool size', [({}, 10)])])
+
+        lines = registry.render().splitlines()
+
+        self.assertIn('errors_total{operation="create"} 2', lines)
+        self.assertIn('pool_size 10', lines)
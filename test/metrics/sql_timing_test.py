@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+
+from flask import g
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from reservationservice.app.metrics import start_request
+from reservationservice.app import app
+
+
+class SqlTimingTest(unittest.TestCase):
+    """
+    Set of tests for the SQL queries and time recorded by request
+    """
+
+    def test_failed_statement_leaves_no_state(self):
+        """
+        Check if a statement raising an error is not counted and does not leave its start on the connection
+        """
+
+        with app.test_request_context():
+            # Engines of the process are timed by the listeners registered with the application
+            connection = create_engine('sqlite://').connect()
+            start_request()
+
+            with self.assertRaises(OperationalError):
+                connection.execute('SELECT * FROM missing_table')
+            connection.execute('SELECT 1')
+
+            self.assertEqual(g.sql_queries, 1)
+            self.assertNotIn('rs_query_start', connection.info)
+            connection.close()
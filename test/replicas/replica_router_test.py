@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from contextlib import nested
+from datetime import datetime
+
+from flask import Response
+from sqlalchemy import create_engine
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.cache import NullCache
+from reservationservice.app.managers.reservation import ReservationManager
+from reservationservice.app.models import Reservation, ReservationCounter
+from reservationservice.app.replicas import READ_PRIMARY_COOKIE, Replica, ReplicaRouter, set_read_primary_cookie
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class ReplicaRouterTest(BaseTest):
+    """
+    Set of tests for the reads of ReservationManager routed by ReplicaRouter
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+        cls.directory = tempfile.mkdtemp()
+        cls.addCleanup(shutil.rmtree, cls.directory)
+
+    def build_replica(self, name, user_id):
+        """
+        Build a replica stand-in with one reservation of user_id in event 45
+        """
+
+        engine = create_engine('sqlite:///{0}'.format(os.path.join(self.directory, name + '.db')))
+        reservationservice_db.metadata.create_all(engine)
+        engine.execute(Reservation.__table__.insert().values(
+            id='00000000-0000-7000-8000-{0:012d}'.format(user_id), user_id=user_id, event_id=45,
+            create_date=datetime(2019, 4, 1)))
+        return Replica(name, engine)
+
+    def build_manager(self, replicas, selection='round_robin'):
+        return ReservationManager(cache=NullCache(), replicas=ReplicaRouter(replicas, selection))
+
+    def select_users(self, manager):
+        return [reservation.user_id for reservation in manager.select({'event_id': 45})]
+
+    def test_round_robin_alternates_replicas(self):
+        """
+        Check if consecutive reads go to each replica by turns and writes to the primary
+        """
+
+        with nested(*self.build_patches({})):
+            manager = self.build_manager([self.build_replica('first', 1), self.build_replica('second', 2)])
+
+            self.assertEqual(
+                [self.select_users(manager) for _ in range(4)], [[1], [2], [1], [2]])
+            self.assertEqual(manager.get({'user_id': 1}).user_id, 1)
+
+            manager.create({'user_id': 3, 'event_id': 45})
+            self.assertEqual(reservationservice_db.session.query(Reservation.user_id).all(), [(3,)])
+
+    def test_least_loaded_avoids_busy_replica(self):
+        """
+        Check if least_loaded chooses the replica with less reads in flight
+        """
+
+        with nested(*self.build_patches({})):
+            busy, idle = self.build_replica('busy', 1), self.build_replica('idle', 2)
+            manager = self.build_manager([busy, idle], 'least_loaded')
+            busy.in_flight = 3
+
+            self.assertEqual([self.select_users(manager) for _ in range(3)], [[2], [2], [2]])
+
+    def test_client_reads_its_writes_from_primary(self):
+        """
+        Check if a client that writes reads from the primary in the request and while its cookie lasts
+        """
+
+        with nested(*self.build_patches({})):
+            manager = self.build_manager([self.build_replica('first', 1)])
+            manager.create({'user_id': 3, 'event_id': 45})
+
+            self.assertEqual(self.select_users(manager), [3])
+
+            cookie = set_read_primary_cookie(Response()).headers['Set-Cookie']
+            self.assertTrue(cookie.startswith(READ_PRIMARY_COOKIE + '='))
+
+            with app.app_context(), app.test_request_context(headers={'Cookie': cookie.split(';')[0]}):
+                self.assertEqual(self.select_users(manager), [3])
+
+            with app.app_context(), app.test_request_context():
+                self.assertEqual(self.select_users(manager), [1])
+
+    def test_failed_replica_falls_back_to_primary(self):
+        """
+        Check if a replica that can not be read is skipped and the read is served by the primary
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationManager().create({'user_id': 3, 'event_id': 45})
+            broken = Replica('broken', create_engine('sqlite:///{0}'.format(os.path.join(self.directory, 'missing', 'x.db'))))
+
+            with app.app_context(), app.test_request_context():
+                manager = self.build_manager([broken, self.build_replica('second', 2)])
+
+                self.assertEqual(self.select_users(manager), [3])
+                self.assertEqual(broken.failures, 1)
+                self.assertEqual([self.select_users(manager) for _ in range(2)], [[2], [2]])
+                self.assertEqual([row.user_id for row in manager.stream({'event_id': 45}, 10, projection=True)], [2])
+
+    def test_page_of_an_etag_is_read_from_a_replica_that_has_its_versions(self):
+        """
+        Check if a page sent with an ETag is read from the replica when it has the counter versions of the ETag
+        and from the primary when it lags behind them
+        """
+
+        with nested(*self.build_patches({})):
+            ReservationManager().create({'user_id': 1, 'event_id': 45})
+            primary_id = reservationservice_db.session.query(Reservation.id).scalar()
+            replica = self.build_replica('first', 1)
+            manager = self.build_manager([replica])
+            versions = {('user_id', 1): 1}
+
+            with app.app_context(), app.test_request_context():
+                reservations, _ = manager.select_page({'user_id': 1}, 10, versions=versions)
+                self.assertEqual([reservation.id for reservation in reservations], [primary_id])
+
+                replica.engine.execute(ReservationCounter.__table__.insert().values(
+                    kind='user_id', key_id=1, count=1, version=1))
+
+                reservations, _ = manager.select_page({'user_id': 1}, 10, versions=versions)
+                self.assertEqual(
+                    [reservation.id for reservation in reservations], ['00000000-0000-7000-8000-000000000001'])
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import nested
+from datetime import datetime
+
+from general.util.test_helper import BaseTest
+
+from reservationservice.app.controllers.capacity import EventCapacityController
+from reservationservice.app.models import Reservation
+from reservationservice.app.writebehind import WriteBehindJournal, WriteBehindQueue
+from reservationservice.default_config import basedir as reservation_basedir
+from reservationservice.app import db as reservationservice_db
+from reservationservice.app import app
+
+
+class WriteBehindQueueTest(BaseTest):
+    """
+    Set of tests for WriteBehindQueue
+    """
+
+    def setUp(cls):
+        application_databases = {
+            'reservationservice': {
+                'base_directory': reservation_basedir,
+                'db_instance': reservationservice_db
+            }
+        }
+
+        cls.set_up_db(application_databases, create_files=False)
+        cls.directory = tempfile.mkdtemp()
+        cls.addCleanup(shutil.rmtree, cls.directory)
+
+    def build_queue(self):
+        queue = WriteBehindQueue(app, self.directory, batch_size=10, flush_interval=0.01, retry_interval=0.01)
+        queue.start()
+        self.addCleanup(queue.stop, 10)
+        return queue
+
+    def test_accepted_reservations_are_written_in_batches(self):
+        """
+        Check if accepted reservations are committed with the ids assigned when they were accepted
+        """
+
+        with nested(*self.build_patches({})):
+            queue = self.build_queue()
+            rows = [queue.submit({'user_id': user_id, 'event_id': 45}) for user_id in xrange(25)]
+            duplicated = queue.submit({'user_id': 0, 'event_id': 45})
+
+            self.assertTrue(queue.flush(10))
+
+            stored_ids = set(reservation_id for reservation_id, in reservationservice_db.session.query(Reservation.id))
+            self.assertEqual(stored_ids, set(row['id'] for row in rows))
+            self.assertEqual(queue.status(rows[0]['id']), {'id': rows[0]['id'], 'status': 'committed'})
+            self.assertEqual(
+                queue.status(duplicated['id']),
+                {'id': duplicated['id'], 'status': 'rejected', 'message': 'reservation already exists'}
+            )
+
+    def test_sold_out_reservations_are_rejected(self):
+        """
+        Check if reservations beyond the capacity of the event get the rejected status
+        """
+
+        with nested(*self.build_patches({})):
+            EventCapacityController().set_capacity(45, 1)
+            reservationservice_db.session.remove()
+            queue = self.build_queue()
+            first = queue.submit({'user_id': 1, 'event_id': 45})
+            second = queue.submit({'user_id': 2, 'event_id': 45})
+
+            self.assertTrue(queue.flush(10))
+
+            self.assertEqual(queue.status(first['id'])['status'], 'committed')
+            self.assertEqual(queue.status(second['id'])['message'], 'event is sold out')
+
+    def test_journal_of_crashed_process_is_replayed(self):
+        """
+        Check if the reservations accepted and not written by a crashed process are written on start
+        """
+
+        with nested(*self.build_patches({})):
+            accepted = [
+                {'id': '00000000-0000-7000-8000-000000000001', 'user_id': 1, 'event_id': 45, 'create_date': datetime(2019, 4, 1)},
+                {'id': '00000000-0000-7000-8000-000000000002', 'user_id': 2, 'event_id': 45, 'create_date': datetime(2019, 4, 1, 10, 30, 15, 250)}
+            ]
+            with open(os.path.join(self.directory, 'journal-1.log'), 'w') as journal:
+                journal.write('{"accepted": {"id": "00000000-0000-7000-8000-000000000001", "user_id": 1, "event_id": 45, "create_date": "2019-04-01"}}\n')
+                journal.write('{"accepted": {"id": "00000000-0000-7000-8000-000000000002", "user_id": 2, "event_id": 45, "create_date": "2019-04-01T10:30:15.000250"}}\n')
+                journal.write('{"accepted": {"id": "00000000-0000-7000-8000-000000000003", "user_id": 3, "event_id": 45, "create_date": "2019-04-01"}}\n')
+                journal.write('{"done": ["00000000-0000-7000-8000-000000000003"]}\n')
+                journal.write('{"accepted": {"id": "00000000-0000')
+
+            queue = self.build_queue()
+            self.assertTrue(queue.flush(10))
+
+            reservations = reservationservice_db.session.query(Reservation).order_by(Reservation.id).all()
+            self.assertEqual(
+                [(reservation.id, reservation.user_id, reservation.create_date) for reservation in reservations],
+                [(row['id'], row['user_id'], row['create_date']) for row in accepted]
+            )
+            self.assertFalse(os.path.exists(os.path.join(self.directory, 'journal-1.log')))
+
+            with open(queue.journal.path) as journal:
+                self.assertEqual(WriteBehindJournal.parse(journal), {})
+
+    def test_reservation_accepted_during_compaction_is_kept(self):
+        """
+        Check if a reservation accepted while the journal is rewritten is saved in the new journal
+        """
+
+        with nested(*self.build_patches({})):
+            queue = WriteBehindQueue(app, self.directory, compact_records=1)
+            queue.journal.open()
+            self.addCleanup(queue.journal.close)
+
+            written = queue.submit({'user_id': 1, 'event_id': 45})
+            queued = queue.submit({'user_id': 2, 'event_id': 45})
+            accepted = []
+            rewrite = queue.journal.rewrite
+
+            def rewrite_while_submitting(rows):
+                submitter = threading.Thread(target=lambda: accepted.append(queue.submit({'user_id': 3, 'event_id': 45})))
+                submitter.start()
+                time.sleep(0.2)
+                rewrite(rows)
+                self.submitter = submitter
+
+            queue.journal.rewrite = rewrite_while_submitting
+            self.assertEqual(queue.write([written]), [])
+            self.submitter.join(10)
+
+            with open(queue.journal.path) as journal:
+                self.assertEqual(list(WriteBehindJournal.parse(journal)), [queued['id'], accepted[0]['id']])
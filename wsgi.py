@@ -0,0 +1,13 @@
+#!flask/bin/python
+"""
+WSGI entry point of the service for process managers that spawn workers on demand.
+
+Importing it builds the application and nothing else: no command line, migrations, shell or rollbar
+(rollbar is imported before the first request when ENVIRONMENT is set).
+
+Usage: gunicorn -w 4 -b 0.0.0.0:5430 reservationservice.wsgi:app
+"""
+
+from reservationservice.app import get_app
+
+app = get_app()